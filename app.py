@@ -1,22 +1,21 @@
 # app.py
 
-from flask import Flask, request, redirect, session, url_for
+from flask import Flask, request, redirect, session, url_for, has_request_context
 import requests
 import os
 import time
+import uuid
+import hashlib
+import tempfile
 from datetime import datetime, timedelta
 import json
 import re
-from fpdf import FPDF
 from werkzeug.utils import secure_filename
-from pdf2docx import Converter
 import fitz  # PyMuPDF
 import pytz
-from docx import Document
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.mongodb import MongoDBJobStore
 from dateutil import parser as date_parser
-import pandas as pd
 from werkzeug.middleware.proxy_fix import ProxyFix
 from pymongo import MongoClient
 from urllib.parse import urlparse
@@ -24,33 +23,47 @@ import pickle
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 import mimetypes
-from googleapiclient.discovery import build
 
 
 from currency import convert_currency
 from grok_ai import (
     route_user_intent,
-    generate_full_daily_briefing,
-    ai_reply,
+    ai_reply_stream,
+    get_grok_metrics,
+    configure_response_cache,
     correct_grammar_with_grok,
     analyze_email_subject,
     edit_email_body,
     write_email_body_with_grok,
-    analyze_document_context,
     get_contextual_ai_response,
     is_document_followup_question
 )
 from email_sender import send_email
-from services import get_daily_quote, get_on_this_day_in_history, get_raw_weather_data, get_indian_festival_today
 from google_calendar_integration import get_google_auth_flow, create_google_calendar_event
 from google_drive import upload_file_to_drive, search_files_in_drive, analyze_drive_file_content
-from google_sheets import append_expense_to_sheet, get_sheet_link
+from google_sheets import append_expenses_to_sheet, get_sheet_link
 from youtube_search import search_youtube_for_video
+from google_services import get_service, get_service_metrics
+from google_resources import GoogleResourceCache, EXPENSE_SHEET
+from expense_buffer import ExpenseBuffer
+from expense_store import ExpenseStore
+from expense_export import export_expenses
+from expense_analytics import ExpenseAnalytics, resolve_period, format_expense_summary
 from meeting_scheduler import find_common_free_time, create_meeting_event
-from reminders import schedule_reminder, get_all_reminders, delete_reminder
-from messaging import send_message, send_template_message, send_interactive_menu, send_conversion_menu, send_reminders_list, send_delete_confirmation, send_google_drive_menu, send_meeting_proposal
+from reminders import ReminderIndex, schedule_reminder, get_all_reminders, delete_reminder
+from messaging import graph_session, GRAPH_BASE_URL, GRAPH_TIMEOUT, TEXT_MESSAGE_LIMIT, send_message, send_template_message, send_interactive_menu, send_conversion_menu, send_reminders_list, send_delete_confirmation, send_google_drive_menu, send_meeting_proposal
 from document_processor import get_text_from_file
+from document_index import DocumentIndex
+from document_store import DocumentStore
+from conversions import pdf_to_docx, text_to_pdf, text_to_docx
+from conversion_pool import ConversionPool, ConversionRejected
 from weather import get_weather
+from webhook_queue import WebhookQueue, is_valid_webhook_payload
+from message_dedup import MessageDeduplicator
+from sender_lanes import SenderLaneDispatcher
+from broadcast import BroadcastEngine, format_broadcast_report, RESUME_POLL_SECONDS
+from briefing import get_briefing_content, personalize_briefing, ensure_briefing_cache_indexes
+from process_pool import start_process_pool
 
 
 app = Flask(__name__)
@@ -67,18 +80,49 @@ ADMIN_SECRET_KEY = os.environ.get("ADMIN_SECRET_KEY")
 MONGO_URI = os.environ.get("MONGO_URI")
 DEV_PHONE_NUMBER = os.environ.get("DEV_PHONE_NUMBER")
 GOOGLE_REDIRECT_URI = os.environ.get("GOOGLE_REDIRECT_URI")
+WEBHOOK_MODE = os.environ.get("WEBHOOK_MODE", "inline")  # "inline" or "queue"
+WEBHOOK_QUEUE_WORKERS = int(os.environ.get("WEBHOOK_QUEUE_WORKERS", 4))
+WEBHOOK_SENDER_LANES = int(os.environ.get("WEBHOOK_SENDER_LANES", 8))
+BROADCAST_RATE_PER_SECOND = float(os.environ.get("BROADCAST_RATE_PER_SECOND", 20))
+BROADCAST_CONCURRENCY = int(os.environ.get("BROADCAST_CONCURRENCY", 10))
+CONVERSION_WORKERS = int(os.environ.get("CONVERSION_WORKERS", 2))
+CONVERSION_MAX_QUEUED = int(os.environ.get("CONVERSION_MAX_QUEUED", 20))
+CONVERSION_TIME_LIMIT = int(os.environ.get("CONVERSION_TIME_LIMIT", 120))
+CONVERSION_MEMORY_LIMIT_MB = int(os.environ.get("CONVERSION_MEMORY_LIMIT_MB", 1024))
+MAX_MEDIA_BYTES = int(os.environ.get("MAX_MEDIA_MB", 100)) * 1024 * 1024  # WhatsApp's own limit for documents is 100 MB
+MEDIA_CHUNK_BYTES = 256 * 1024
+EXPENSE_FLUSH_SECONDS = int(os.environ.get("EXPENSE_FLUSH_SECONDS", 5))
 
 
 # --- DATABASE & SCHEDULER ---
+# Document workers are forked before the Mongo client and scheduler start their threads (see process_pool.py).
+start_process_pool()
 client = MongoClient(MONGO_URI)
 db = client.ai_buddy_db
 users_collection = db.users
 jobs_collection = db.scheduled_jobs
+webhook_queue = WebhookQueue(db.webhook_queue)
+message_deduplicator = MessageDeduplicator(db.processed_messages)
+message_statuses_collection = db.message_statuses
+message_statuses_collection.create_index("updated_at", expireAfterSeconds=7 * 24 * 60 * 60)
+sender_lanes = SenderLaneDispatcher(WEBHOOK_SENDER_LANES)
+briefing_cache_collection = db.briefing_cache
+ensure_briefing_cache_indexes(briefing_cache_collection)
+configure_response_cache(db.grok_response_cache)
+document_store = DocumentStore(db.documents)
+google_resources = GoogleResourceCache(users_collection, db.google_resource_locks)
+expense_store = ExpenseStore(db.expenses)
+expense_analytics = ExpenseAnalytics(db.expense_rollups)
+expense_buffer = ExpenseBuffer(db.expense_buffer, window_seconds=EXPENSE_FLUSH_SECONDS)
+conversion_pool = ConversionPool(workers=CONVERSION_WORKERS, max_queued=CONVERSION_MAX_QUEUED, time_limit=CONVERSION_TIME_LIMIT, memory_limit_mb=CONVERSION_MEMORY_LIMIT_MB)
+broadcast_engine = BroadcastEngine(db.broadcast_jobs, db.broadcast_deliveries, rate_per_second=BROADCAST_RATE_PER_SECOND, concurrency=BROADCAST_CONCURRENCY)
 
 jobstores = {
     'default': MongoDBJobStore(client=client, database="ai_buddy_db", collection="scheduled_jobs")
 }
 scheduler = BackgroundScheduler(jobstores=jobstores, timezone=pytz.timezone('Asia/Kolkata'))
+reminder_index = ReminderIndex(db.reminder_index)
+reminder_index.attach(scheduler)
 scheduler.start()
 
 
@@ -106,18 +150,16 @@ def get_all_users_from_db():
     return users_collection.find({}, {"_id": 1, "name": 1, "is_google_connected": 1, "location": 1})
 
 def delete_all_users_from_db():
+    expense_store.delete_all()
+    expense_analytics.delete_all()
     return users_collection.delete_many({})
 
 def delete_user_by_id(user_id):
-    """Deletes a single user and their reminders by their phone number ID."""
+    """Deletes a single user, their expenses and their reminders by their phone number ID."""
     delete_result = users_collection.delete_one({"_id": user_id})
-    
-    jobs_deleted_count = 0
-    for job in scheduler.get_jobs():
-        if job.id.startswith(f"reminder_{user_id}"):
-            scheduler.remove_job(job.id)
-            jobs_deleted_count += 1
-            
+    expense_store.delete_user(user_id)
+    expense_analytics.delete_user(user_id)
+    jobs_deleted_count = reminder_index.delete_user(user_id, scheduler)
     return delete_result.deleted_count > 0, jobs_deleted_count
 
 def delete_all_scheduled_jobs_from_db():
@@ -131,6 +173,14 @@ def save_credentials_to_db(sender_number, credentials):
     pickled_creds = pickle.dumps(credentials)
     create_or_update_user_in_db(sender_number, {"google_credentials": pickled_creds, "is_google_connected": True})
 
+def mark_sheet_expenses_untracked(query):
+    """
+    Records today as the date expense rollups start for matching users without one. Expenses
+    already in a Google Sheet before that are not in the rollups, and summaries say so.
+    """
+    today = datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y-%m-%d')
+    users_collection.update_many({**query, "expense_rollups_since": {"$exists": False}}, {"$set": {"expense_rollups_since": today}})
+
 def get_credentials_from_db(sender_number):
     user_data = get_user_from_db(sender_number)
     if not user_data or "google_credentials" not in user_data:
@@ -146,7 +196,7 @@ def get_credentials_from_db(sender_number):
 def get_user_email_from_google(credentials):
     """Fetches the user's primary email address from their Google profile."""
     try:
-        service = build('oauth2', 'v2', credentials=credentials)
+        service = get_service('oauth2', 'v2', credentials)
         user_info = service.userinfo().get().execute()
         return user_info.get('email')
     except Exception as e:
@@ -157,7 +207,12 @@ def send_google_auth_link(sender_number):
     """Generates and sends the Google authentication link to a user."""
     if GOOGLE_REDIRECT_URI:
         try:
-            base_url = request.url_root
+            if has_request_context():
+                base_url = request.url_root
+            else:
+                # Queue workers and scheduler jobs run outside a request, so derive the host from the OAuth redirect.
+                parsed_uri = urlparse(GOOGLE_REDIRECT_URI)
+                base_url = f"{parsed_uri.scheme}://{parsed_uri.netloc}/"
             auth_link = f"{base_url}google-auth?state={sender_number}"
             auth_message = (
                 "To connect or re-connect your Google Account for features like calendar events and email, "
@@ -191,6 +246,9 @@ def google_auth_callback():
     flow.fetch_token(authorization_response=request.url)
     credentials = flow.credentials
     save_credentials_to_db(sender_number, credentials)
+    # The user may have connected a different account, whose folder and sheet are not the cached ones.
+    google_resources.clear(sender_number)
+    mark_sheet_expenses_untracked({"_id": sender_number})   # An existing sheet may be found and reused
     
     email = get_user_email_from_google(credentials)
     if email:
@@ -205,7 +263,7 @@ def trigger_daily_briefing():
     secret = request.args.get('secret')
     if not ADMIN_SECRET_KEY or secret != ADMIN_SECRET_KEY:
         return "Unauthorized: Invalid or missing secret key.", 401
-    send_daily_briefing()
+    send_daily_briefing(job_id=f"daily_briefing_manual_{int(time.time())}")
     return "✅ Daily briefing has been sent to all users.", 200
 
 @app.route('/notify-update')
@@ -219,6 +277,14 @@ def trigger_update_notification():
     scheduler.add_job(func=send_update_notification_to_all_users, trigger='date', run_date=datetime.now(pytz.timezone('Asia/Kolkata')) + timedelta(seconds=2), args=[features])
     return f"✅ Success! Update notification scheduled for: '{features}'", 200
 
+@app.route('/metrics')
+def metrics():
+    secret = request.args.get('secret')
+    if not ADMIN_SECRET_KEY or secret != ADMIN_SECRET_KEY:
+        return "Unauthorized: Invalid or missing secret key.", 401
+    return {"sender_lanes": sender_lanes.get_metrics(), "grok": get_grok_metrics(), "conversions": conversion_pool.get_metrics(),
+            "google_services": get_service_metrics(), "expense_buffer": {"pending": expense_buffer.pending_count()}}, 200
+
 @app.route('/webhook', methods=['GET'])
 def verify():
     mode = request.args.get("hub.mode")
@@ -228,13 +294,19 @@ def verify():
     return "Verification failed", 403
 
 def download_media_from_whatsapp(media_id, message_payload):
+    """
+    Streams a WhatsApp media file to a new, uniquely named file in uploads/, hashing it on the way.
+    Returns (file_path, original_filename, mime_type, sha256), or four Nones on failure.
+    """
+    file_path = None
     try:
-        url = f"https://graph.facebook.com/v19.0/{media_id}/"
-        headers = {"Authorization": f"Bearer {ACCESS_TOKEN}"}
-        response = requests.get(url, headers=headers)
+        url = f"{GRAPH_BASE_URL}/{media_id}/"
+        response = graph_session.get(url, timeout=GRAPH_TIMEOUT)
         response.raise_for_status()
         media_info = response.json()
         media_url = media_info['url']
+        if int(media_info.get('file_size') or 0) > MAX_MEDIA_BYTES:
+            raise ValueError(f"file is {media_info['file_size']} bytes, over the {MAX_MEDIA_BYTES}-byte limit")
         
         message_type = message_payload.get("type")
         original_filename = f"media_{media_id}"
@@ -245,30 +317,87 @@ def download_media_from_whatsapp(media_id, message_payload):
             ext = mimetypes.guess_extension(media_info.get('mime_type', '')) or '.jpg'
             original_filename = f"whatsapp_image_{media_id}{ext}"
 
-        download_response = requests.get(media_url, headers=headers)
-        download_response.raise_for_status()
+        with graph_session.get(media_url, timeout=60, stream=True) as download_response:
+            download_response.raise_for_status()
+            if int(download_response.headers.get("Content-Length") or 0) > MAX_MEDIA_BYTES:
+                raise ValueError(f"Content-Length is over the {MAX_MEDIA_BYTES}-byte limit")
+
+            # A unique name per download, so two users sending "resume.pdf" don't overwrite each other.
+            stem, ext = os.path.splitext(secure_filename(original_filename) or secure_filename(media_id) or "media")
+            fd, file_path = tempfile.mkstemp(dir="uploads", prefix=f"{stem}_", suffix=ext)
+            digest = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, "wb") as f:
+                for chunk in download_response.iter_content(chunk_size=MEDIA_CHUNK_BYTES):
+                    size += len(chunk)
+                    if size > MAX_MEDIA_BYTES:
+                        raise ValueError(f"download passed the {MAX_MEDIA_BYTES}-byte limit")
+                    digest.update(chunk)
+                    f.write(chunk)
         
-        temp_filename = secure_filename(original_filename)
-        if not temp_filename:
-            temp_filename = secure_filename(media_id) 
-            
-        file_path = os.path.join("uploads", temp_filename)
-        with open(file_path, "wb") as f: f.write(download_response.content)
+        return file_path, original_filename, media_info.get('mime_type'), digest.hexdigest()
         
-        return file_path, original_filename, media_info.get('mime_type')
-        
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, ValueError, OSError) as e:
         print(f"❌ Error downloading media: {e}")
-        return None, None, None
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+        return None, None, None, None
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if data is None:
+        return "Bad Request", 400
+
+    if WEBHOOK_MODE == "queue":
+        # Only validate and persist here; the queue workers do the actual processing.
+        if not is_valid_webhook_payload(data):
+            print("⚠️ Ignoring webhook payload that is not a WhatsApp delivery.")
+            return "OK", 200
+        webhook_queue.enqueue(data)
+        return "OK", 200
+
+    process_webhook_payload(data)
+    return "OK", 200
+
+def process_webhook_payload(data):
+    """Processes every message and status callback in a (possibly batched) webhook delivery."""
     print("\n🚀 Received message:", json.dumps(data, indent=2))
+    messages_by_sender = {}
     try:
-        entry = data.get("entry", [])[0].get("changes", [])[0].get("value", {})
-        if "messages" not in entry or not entry["messages"]: return "OK", 200
-        message = entry["messages"][0]
+        for entry in data.get("entry", []):
+            for change in entry.get("changes", []):
+                value = change.get("value", {})
+                for status in value.get("statuses", []):
+                    handle_status_update(status)
+                for message in value.get("messages", []):
+                    sender_number = message.get("from")
+                    if sender_number:
+                        messages_by_sender.setdefault(sender_number, []).append(message)
+    except Exception as e:
+        print(f"❌ Malformed webhook payload: {e}")
+        return
+
+    # Each sender's messages go to that sender's lane in timestamp order, so they never race on the
+    # session document, even against other deliveries being processed at the same time.
+    futures = []
+    for sender_number, messages in messages_by_sender.items():
+        for message in sorted(messages, key=lambda m: int(m.get("timestamp", 0))):
+            futures.append(sender_lanes.dispatch(sender_number, process_incoming_message, message))
+    errors = []
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            errors.append(e)
+    if errors:
+        raise errors[0]
+
+def process_incoming_message(message):
+    try:
+        if message_deduplicator.is_duplicate(message.get("id")):
+            print(f"🔁 Skipping duplicate delivery of message {message.get('id')}")
+            return
         sender_number = message["from"]
         session_data = get_user_session(sender_number)
         msg_type = message.get("type")
@@ -293,7 +422,26 @@ def webhook():
 
     except Exception as e:
         print(f"❌ Unhandled Error: {e}")
-    return "OK", 200
+        message_deduplicator.release(message.get("id"))
+        if WEBHOOK_MODE == "queue":
+            raise  # The queue retries the payload, or parks it as "failed" after MAX_ATTEMPTS
+
+def handle_status_update(status):
+    """Records delivery status callbacks (sent, delivered, read, failed) for outgoing messages."""
+    try:
+        status_name = status.get("status")
+        update = {
+            "recipient_id": status.get("recipient_id"),
+            "last_status": status_name,
+            f"statuses.{status_name}": status.get("timestamp"),
+            "updated_at": datetime.now(pytz.utc)
+        }
+        if status_name == "failed":
+            update["errors"] = status.get("errors", [])
+            print(f"⚠️ Message {status.get('id')} to {status.get('recipient_id')} failed: {status.get('errors')}")
+        message_statuses_collection.update_one({"_id": status.get("id")}, {"$set": update}, upsert=True)
+    except Exception as e:
+        print(f"Error recording message status: {e}")
 
 # === MESSAGE HANDLERS ===
 def handle_document_message(message, sender_number, session_data, message_type):
@@ -318,9 +466,9 @@ def handle_document_message(message, sender_number, session_data, message_type):
                 set_user_session(sender_number, None)
                 return
 
-            downloaded_path, original_filename, mime_type = download_media_from_whatsapp(media_id, message)
+            downloaded_path, original_filename, mime_type, _ = download_media_from_whatsapp(media_id, message)
             if downloaded_path:
-                upload_status = upload_file_to_drive(creds, downloaded_path, original_filename, mime_type)
+                upload_status = upload_file_to_drive(creds, downloaded_path, original_filename, mime_type, sender_number, google_resources)
                 send_message(sender_number, upload_status)
             else:
                 send_message(sender_number, "❌ Sorry, I couldn't download your file to upload it.")
@@ -336,9 +484,9 @@ def handle_document_message(message, sender_number, session_data, message_type):
                 set_user_session(sender_number, None)
                 return
 
-            downloaded_path, original_filename, mime_type = download_media_from_whatsapp(media_id, message)
+            downloaded_path, original_filename, mime_type, _ = download_media_from_whatsapp(media_id, message)
             if downloaded_path:
-                upload_status = upload_file_to_drive(creds, downloaded_path, original_filename, mime_type)
+                upload_status = upload_file_to_drive(creds, downloaded_path, original_filename, mime_type, sender_number, google_resources)
                 send_message(sender_number, upload_status)
             else:
                 send_message(sender_number, "❌ Sorry, I couldn't download your file to upload it. Please try again.")
@@ -347,7 +495,7 @@ def handle_document_message(message, sender_number, session_data, message_type):
             return
 
         if simple_state == "awaiting_email_attachment":
-            downloaded_path, _, _ = download_media_from_whatsapp(media_id, message)
+            downloaded_path, _, _, _ = download_media_from_whatsapp(media_id, message)
             if downloaded_path:
                 if "attachment_paths" not in session_data:
                     session_data["attachment_paths"] = []
@@ -361,46 +509,40 @@ def handle_document_message(message, sender_number, session_data, message_type):
             return
 
         if simple_state in ["awaiting_pdf_to_text", "awaiting_pdf_to_docx"]:
-            downloaded_path, _, mime_type = download_media_from_whatsapp(media_id, message)
+            downloaded_path, _, mime_type, _ = download_media_from_whatsapp(media_id, message)
             if not downloaded_path:
                 send_message(sender_number, "❌ Sorry, I couldn't download your file. Please try again.")
                 return
             
             if simple_state == "awaiting_pdf_to_text":
-                extracted_text = get_text_from_file(downloaded_path, mime_type)
+                # Only one message's worth of text can be sent back, so stop reading once we have it.
+                extracted_text = get_text_from_file(downloaded_path, mime_type, max_chars=TEXT_MESSAGE_LIMIT)
                 response = extracted_text if extracted_text else "Could not find any readable text in the PDF."
                 send_message(sender_number, response)
             elif simple_state == "awaiting_pdf_to_docx":
-                output_docx_path = downloaded_path + ".docx"
-                cv = Converter(downloaded_path)
-                cv.convert(output_docx_path, start=0, end=None)
-                cv.close()
-                send_file_to_user(sender_number, output_docx_path, "application/vnd.openxmlformats-officedocument.wordprocessingml.document", "📄 Here is your converted Word file.")
-                if os.path.exists(output_docx_path): os.remove(output_docx_path)
+                # The conversion job owns the downloaded file from here on and deletes it when done.
+                input_path, downloaded_path = downloaded_path, None
+                start_conversion(sender_number, "pdf_to_docx", input_path, cleanup_path=input_path)
             set_user_session(sender_number, None)
             return
 
         send_message(sender_number, "📄 Got your file! Analyzing it with AI...")
-        downloaded_path, _, mime_type = download_media_from_whatsapp(media_id, message)
+        downloaded_path, _, mime_type, file_hash = download_media_from_whatsapp(media_id, message)
         if not downloaded_path:
             send_message(sender_number, "❌ Sorry, I couldn't download your file. Please try again.")
             return
             
-        extracted_text = get_text_from_file(downloaded_path, mime_type)
-        if not extracted_text:
-            send_message(sender_number, "❌ I couldn't find any readable text in that file.")
-            return
-
-        analysis = analyze_document_context(extracted_text)
-        if not analysis:
-            send_message(sender_number, "🤔 I analyzed the document, but I'm not sure what to do with it.")
+        analysis = document_store.ingest_file(downloaded_path, mime_type, document_id=file_hash)
+        if analysis.get("error"):
+            send_message(sender_number, analysis["error"])
             set_user_session(sender_number, None)
             return
             
         doc_type = analysis.get("doc_type")
         data = analysis.get("data", {})
 
-        new_session = {"state": "awaiting_document_question", "document_text": extracted_text, "doc_type": doc_type, "data": data}
+        # The session only references the stored document, so it stays small.
+        new_session = {"state": "awaiting_document_question", "document_id": analysis["document_id"], "doc_type": doc_type, "data": data}
         set_user_session(sender_number, new_session)
 
         if doc_type == "resume":
@@ -453,7 +595,7 @@ def handle_text_message(user_text, sender_number, session_data):
     
     if user_text.startswith("delete_reminder_"):
         job_id_to_delete = user_text.split("delete_reminder_")[1]
-        reminders = get_all_reminders(sender_number, scheduler)
+        reminders = get_all_reminders(sender_number, reminder_index)
         task_to_delete = next((rem['task'] for rem in reminders if rem['id'] == job_id_to_delete), "this reminder")
         send_delete_confirmation(sender_number, job_id_to_delete, task_to_delete)
         return
@@ -577,7 +719,7 @@ def handle_text_message(user_text, sender_number, session_data):
             return
         
         elif user_text.lower() == ".reminders":
-            reminders = get_all_reminders(sender_number, scheduler)
+            reminders = get_all_reminders(sender_number, reminder_index)
             send_reminders_list(sender_number, reminders)
             return
 
@@ -616,7 +758,7 @@ def handle_text_message(user_text, sender_number, session_data):
             send_message(sender_number, f"📄 Analyzing '*{user_text}*' from your Google Drive. This may take a moment...")
             creds = get_credentials_from_db(sender_number)
             if creds:
-                analysis_result = analyze_drive_file_content(creds, user_text)
+                analysis_result = analyze_drive_file_content(creds, user_text, document_store)
                 error = analysis_result.get("error")
                 if error:
                     send_message(sender_number, error)
@@ -624,7 +766,7 @@ def handle_text_message(user_text, sender_number, session_data):
                 else:
                     new_session = {
                         "state": "awaiting_document_question",
-                        "document_text": analysis_result.get("document_text"),
+                        "document_id": analysis_result.get("document_id"),
                         "doc_type": analysis_result.get("doc_type"),
                         "data": analysis_result.get("data", {})
                     }
@@ -673,9 +815,16 @@ def handle_text_message(user_text, sender_number, session_data):
             if not is_document_followup_question(user_text):
                 set_user_session(sender_number, None)
             else:
-                doc_text = session_data.get("document_text")
+                if session_data.get("document_id"):
+                    document_index = document_store.get_index(session_data["document_id"])
+                else:  # Sessions started before documents moved to the document store
+                    document_index = DocumentIndex.from_text(session_data.get("document_text") or "")
+                if document_index is None:
+                    send_message(sender_number, "⌛ I no longer have that document. Please upload it again to ask about it.")
+                    set_user_session(sender_number, None)
+                    return
                 send_message(sender_number, "🤖 Thinking...")
-                response = get_contextual_ai_response(doc_text, user_text)
+                response = get_contextual_ai_response(document_index.context_for(user_text), user_text)
                 send_message(sender_number, response)
                 send_message(sender_number, "_You can ask another question, or type `menu` to exit._")
                 return
@@ -691,24 +840,21 @@ def handle_text_message(user_text, sender_number, session_data):
                 user_data = get_user_from_db(sender_number)
                 send_welcome_message(sender_number, user_data.get("name", "User"))
             else:
-                response_text = ai_reply(user_text)
-                send_message(sender_number, response_text)
+                # Long answers arrive as several messages, each sent as soon as the model has written it.
+                for chunk in ai_reply_stream(user_text):
+                    send_message(sender_number, chunk)
             return
         elif current_state == "awaiting_text_to_pdf":
-            pdf_path = convert_text_to_pdf(user_text)
-            send_file_to_user(sender_number, pdf_path, "application/pdf", "📄 Here is your converted PDF file.")
-            if os.path.exists(pdf_path): os.remove(pdf_path)
+            start_conversion(sender_number, "text_to_pdf", user_text)
             set_user_session(sender_number, None)
             return
         elif current_state == "awaiting_text_to_word":
-            docx_path = convert_text_to_word(user_text)
-            send_file_to_user(sender_number, docx_path, "application/vnd.openxmlformats-officedocument.wordprocessingml.document", "📄 Here is your converted Word file.")
-            if os.path.exists(docx_path): os.remove(docx_path)
+            start_conversion(sender_number, "text_to_docx", user_text)
             set_user_session(sender_number, None)
             return
         elif current_state == "awaiting_name":
             name = user_text.split()[0].title()
-            create_or_update_user_in_db(sender_number, {"name": name, "expenses": [], "is_google_connected": False, "location": None})
+            create_or_update_user_in_db(sender_number, {"name": name, "is_google_connected": False, "location": None})
             set_user_session(sender_number, "awaiting_location")
             send_message(sender_number, f"✅ Got it! I’ll remember you as *{name}*.")
             time.sleep(1)
@@ -879,7 +1025,7 @@ def handle_text_message(user_text, sender_number, session_data):
             send_message(sender_number, "⚠️ To use Google Drive features, you must first connect your Google account.")
         return
     elif user_text == "reminders_check":
-        reminders = get_all_reminders(sender_number, scheduler)
+        reminders = get_all_reminders(sender_number, reminder_index)
         send_reminders_list(sender_number, reminders)
         return
     elif user_text == "conv_pdf_to_text":
@@ -995,14 +1141,14 @@ def process_natural_language_request(user_text, sender_number):
         filename = entities.get("filename")
         if filename:
             send_message(sender_number, f"📄 Analyzing '*{filename}*' from your Drive. This might take a moment...")
-            analysis_result = analyze_drive_file_content(creds, filename)
+            analysis_result = analyze_drive_file_content(creds, filename, document_store)
             error = analysis_result.get("error")
             if error:
                 response_text = error
             else:
                 new_session = {
                     "state": "awaiting_document_question",
-                    "document_text": analysis_result.get("document_text"),
+                    "document_id": analysis_result.get("document_id"),
                     "doc_type": analysis_result.get("doc_type"),
                     "data": analysis_result.get("data", {})
                 }
@@ -1045,7 +1191,7 @@ def process_natural_language_request(user_text, sender_number):
             "🗓️ *Productivity*\n"
             "• *Set Reminders*: Set one-time or recurring reminders.\n"
             "• *AI Email Assistant*: I can help you write and send professional emails.\n"
-            "• *Expense Tracker*: Log your expenses to a live Google Sheet.\n\n"
+            "• *Expense Tracker*: Log your expenses to a live Google Sheet and ask how much you've spent.\n\n"
             "📁 *File & Document Management*\n"
             "• *File Conversion*: Convert between PDF, Word, and Text.\n"
             "• *Google Drive*: Upload, search, and analyze files in your Drive.\n\n"
@@ -1077,21 +1223,35 @@ def process_natural_language_request(user_text, sender_number):
             response_text = "Sorry, I couldn't understand that as an expense."
 
     elif intent == "export_expenses":
+        options = entities if isinstance(entities, dict) else {}
+        start, end, period = parse_expense_date_range(options.get("start_date"), options.get("end_date"))
         send_message(sender_number, "📊 Generating your expense report...")
-        user_data = get_user_from_db(sender_number)
-        file_path = export_expenses_to_excel(sender_number, user_data)
+        file_path, mime_type, row_count = export_expenses(expense_store, sender_number, options.get("format"), start, end)
         if file_path:
-            send_file_to_user(sender_number, file_path, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "Here is your expense report.")
-            os.remove(file_path)
+            try:
+                send_file_to_user(sender_number, file_path, mime_type, f"Here is your expense report{period} ({row_count} expense(s)).")
+            finally:
+                os.remove(file_path)
         else:
-            send_message(sender_number, "You have no expenses to export yet.")
+            send_message(sender_number, f"You have no expenses{period}." if period else "You have no expenses to export yet.")
         return 
 
+    elif intent == "get_expense_summary":
+        options = entities if isinstance(entities, dict) else {}
+        start, end = resolve_period(options.get("start_date"), options.get("end_date"))
+        term = options.get("category") or options.get("item")
+        place = options.get("place")
+        summary = expense_analytics.summarize(sender_number, start, end, term=term, place=place)
+        response_text = format_expense_summary(summary, start, end, term=term, place=place)
+        since = (users_collection.find_one({"_id": sender_number}, {"expense_rollups_since": 1}) or {}).get("expense_rollups_since")
+        if since and start.isoformat() < since:
+            response_text += f"\n\nℹ️ Expenses logged to your Google Sheet before {since} aren't included in this total."
+
     elif intent == "get_expense_sheet":
-        response_text = get_sheet_link(creds, sender_number)
+        response_text = get_sheet_link(creds, sender_number, google_resources)
 
     elif intent == "get_reminders":
-        reminders = get_all_reminders(sender_number, scheduler)
+        reminders = get_all_reminders(sender_number, reminder_index)
         send_reminders_list(sender_number, reminders)
         return
 
@@ -1107,7 +1267,9 @@ def process_natural_language_request(user_text, sender_number):
         response_text = get_weather(location)
         
     elif intent == "general_query":
-        response_text = ai_reply(user_text)
+        for chunk in ai_reply_stream(user_text):
+            send_message(sender_number, chunk)
+        return
 
     else:
         response_text = "🤔 I'm not sure how to handle that. Please try rephrasing, or type *menu*."
@@ -1137,33 +1299,63 @@ def send_welcome_message(to, name):
     send_interactive_menu(to, name)
 
 def send_file_to_user(to, file_path, mime_type, caption="Here is your file."):
-    url = f"https://graph.facebook.com/v19.0/{PHONE_NUMBER_ID}/media"
-    headers = {"Authorization": f"Bearer {ACCESS_TOKEN}"}
+    url = f"{GRAPH_BASE_URL}/{PHONE_NUMBER_ID}/media"
     with open(file_path, "rb") as f:
         files = {'file': (os.path.basename(file_path), f, mime_type)}
         data = {"messaging_product": "whatsapp"}
-        upload_response = requests.post(url, headers=headers, files=files, data=data)
+        upload_response = graph_session.post(url, files=files, data=data, timeout=60)
     if upload_response.status_code != 200:
         print(f"Error uploading file: {upload_response.text}"); return
     media_id = upload_response.json().get("id")
     if not media_id: return
-    message_url = f"https://graph.facebook.com/v19.0/{PHONE_NUMBER_ID}/messages"
+    message_url = f"{GRAPH_BASE_URL}/{PHONE_NUMBER_ID}/messages"
     payload = {"messaging_product": "whatsapp", "to": to, "type": "document", "document": {"id": media_id, "caption": caption}}
-    requests.post(message_url, headers={"Authorization": f"Bearer {ACCESS_TOKEN}", "Content-Type": "application/json"}, json=payload)
-
-def convert_text_to_pdf(text):
-    pdf = FPDF(); pdf.add_page(); pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.set_font("Arial", size=12)
-    pdf.multi_cell(0, 10, text.encode('latin-1', 'replace').decode('latin-1'))
-    filename = secure_filename(f"converted_{int(time.time())}.pdf")
-    file_path = os.path.join("uploads", filename)
-    pdf.output(file_path); return file_path
-
-def convert_text_to_word(text):
-    doc = Document(); doc.add_paragraph(text)
-    filename = secure_filename(f"converted_{int(time.time())}.docx")
-    file_path = os.path.join("uploads", filename)
-    doc.save(file_path); return file_path
+    graph_session.post(message_url, json=payload, timeout=GRAPH_TIMEOUT)
+
+# --- DOCUMENT CONVERSIONS ---
+DOCX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+CONVERSIONS = {
+    "pdf_to_docx": (pdf_to_docx, ".docx", DOCX_MIME_TYPE, "📄 Here is your converted Word file."),
+    "text_to_pdf": (text_to_pdf, ".pdf", "application/pdf", "📄 Here is your converted PDF file."),
+    "text_to_docx": (text_to_docx, ".docx", DOCX_MIME_TYPE, "📄 Here is your converted Word file."),
+}
+
+def start_conversion(sender_number, kind, source, cleanup_path=None):
+    """Queues a conversion in the conversion pool; the result is sent to the user when it's ready."""
+    func, extension, mime_type, caption = CONVERSIONS[kind]
+    output_path = os.path.join("uploads", f"converted_{uuid.uuid4().hex}{extension}")
+
+    def cleanup():
+        for path in (output_path, cleanup_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def on_done(error):
+        try:
+            if error:
+                send_message(sender_number, f"❌ Sorry, I couldn't convert that: {error}.")
+            else:
+                send_file_to_user(sender_number, output_path, mime_type, caption)
+        finally:
+            cleanup()
+
+    def on_progress(seconds):
+        send_message(sender_number, f"⚙️ Still converting... ({seconds}s so far)")
+
+    try:
+        jobs_ahead = conversion_pool.submit(sender_number, func, (source, output_path), on_done, on_progress)
+    except ConversionRejected as e:
+        cleanup()
+        if str(e) == "user_limit":
+            send_message(sender_number, "⏳ You already have conversions in progress. I'll send those first; please try again once they arrive.")
+        else:
+            send_message(sender_number, "⏳ I'm handling a lot of conversions right now. Please try again in a few minutes.")
+        return
+
+    if jobs_ahead:
+        send_message(sender_number, f"🕒 Your conversion is queued behind {jobs_ahead} other job(s). I'll send the file as soon as it's ready.")
+    else:
+        send_message(sender_number, "⚙️ Converting your file... I'll send it as soon as it's ready.")
 
 def log_expense(sender_number, amount, item, place=None, timestamp_str=None):
     creds = get_credentials_from_db(sender_number)
@@ -1178,60 +1370,97 @@ def log_expense(sender_number, amount, item, place=None, timestamp_str=None):
         expense_time = tz.localize(expense_time)
 
     expense_data = {"cost": amount, "item": item, "place": place or "N/A", "timestamp": expense_time}
+    expense_analytics.record(sender_number, [expense_data])
 
     if creds:
-        return append_expense_to_sheet(creds, sender_number, expense_data)
-    else:
+        # Written to the sheet in the background, batched with anything else logged in the next few seconds.
         expense_data["timestamp"] = expense_time.isoformat()
-        users_collection.update_one({"_id": sender_number}, {"$push": {"expenses": expense_data}}, upsert=True)
+        expense_buffer.add(sender_number, expense_data)
+        log_message = f"✅ Logged: *₹{amount:.2f}* for *{item.title()}*. Adding it to your Google Sheet."
+        sheet = google_resources.peek(sender_number, EXPENSE_SHEET)
+        if sheet and sheet.get("url"):
+            log_message += f"\n\n🔗 View Sheet: {sheet['url']}"
+        return log_message
+    else:
+        expense_store.add(sender_number, [expense_data])
         log_message = f"✅ Logged locally: *₹{amount:.2f}* for *{item.title()}*"
         if place and place != "N/A": log_message += f" at *{place.title()}*"
         log_message += "\n\n💡 Connect your Google Account to log expenses to a live Google Sheet!"
         return log_message
 
-def export_expenses_to_excel(sender_number, user_data):
-    user_expenses = user_data.get("expenses", []) if user_data else []
-    if not user_expenses: return None
-    df = pd.DataFrame(user_expenses)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['Date'] = df['timestamp'].dt.strftime('%Y-%m-%d')
-    df['Time'] = df['timestamp'].dt.strftime('%I:%M %p')
-    df = df[['Date', 'Time', 'item', 'place', 'cost']]
-    df.rename(columns={'item': 'Item', 'place': 'Place', 'cost': 'Cost (₹)'}, inplace=True)
-    file_path = os.path.join("uploads", f"expenses_{sender_number}.xlsx")
-    df.to_excel(file_path, index=False, engine='openpyxl')
-    return file_path
+def flush_buffered_expenses(sender_number, expenses):
+    """Expense buffer flush: writes a user's buffered expenses to their sheet in one append."""
+    creds = get_credentials_from_db(sender_number)
+    if not creds:
+        # Disconnected since logging them; keep them locally like any other offline expense.
+        expense_store.add(sender_number, expenses)
+        return
+    rows = [dict(expense, timestamp=datetime.fromisoformat(expense["timestamp"])) for expense in expenses]
+    append_expenses_to_sheet(creds, sender_number, rows, google_resources)
+
+def on_expense_flush_failed(sender_number, expenses):
+    expense_store.add(sender_number, expenses)
+    send_message(sender_number, f"⚠️ I couldn't add {len(expenses)} expense(s) to your Google Sheet, so I saved them locally instead. They're still included when you export your expenses.")
+
+def parse_expense_date_range(start_date, end_date):
+    """
+    Turns the router's optional 'YYYY-MM-DD' start/end dates (end inclusive) into
+    (start, end, description) for an expense query; unparseable dates are ignored.
+    """
+    tz = pytz.timezone('Asia/Kolkata')
+    def to_day(value):
+        try:
+            return tz.localize(datetime.strptime(str(value)[:10], '%Y-%m-%d')) if value else None
+        except ValueError:
+            return None
+    start, last_day = to_day(start_date), to_day(end_date)
+    end = tz.localize(datetime.combine(last_day.date() + timedelta(days=1), datetime.min.time())) if last_day else None
+    if start and last_day:
+        period = f" from {start.strftime('%d %b %Y')} to {last_day.strftime('%d %b %Y')}"
+    elif start:
+        period = f" since {start.strftime('%d %b %Y')}"
+    elif last_day:
+        period = f" up to {last_day.strftime('%d %b %Y')}"
+    else:
+        period = ""
+    return start, end, period
 
 # === UPDATED DAILY BRIEFING FUNCTIONS ===
-def send_daily_briefing():
+def build_briefing_components(briefing_content, quote, author):
+    return [
+        {"type": "header", "parameters": [{"type": "text", "text": briefing_content.get("greeting", "Good Morning!")}]},
+        {"type": "body", "parameters": [
+            {"type": "text", "text": quote},
+            {"type": "text", "text": author},
+            {"type": "text", "text": briefing_content.get("detailed_history", "N/A")},
+            {"type": "text", "text": briefing_content.get("detailed_weather", "N/A")}
+        ]}
+    ]
+
+def report_broadcast_to_developer(report):
+    if report and DEV_PHONE_NUMBER:
+        send_message(DEV_PHONE_NUMBER, format_broadcast_report(report))
+
+def send_daily_briefing(job_id=None):
     print(f"--- Running Daily Briefing Job at {datetime.now()} ---")
     all_users = list(get_all_users_from_db())
     if not all_users:
         print("No users found. Skipping job."); return
 
-    festival = get_indian_festival_today()
-    quote, author = get_daily_quote()
-    history_events = get_on_this_day_in_history()
-    
+    # Fetch and write everything shared (per day and per city) up front; per-user work is just templating.
+    content = get_briefing_content(briefing_cache_collection, {user.get("location") or "Vijayawada" for user in all_users})
+    quote, author = content["shared"]["quote"], content["shared"]["author"]
+
+    def send_briefing_to_user(user):
+        user_name, user_location = user.get("name", "there"), user.get("location") or "Vijayawada"
+        briefing_content = personalize_briefing(content, user_name, user_location)
+        return send_template_message(user["_id"], "daily_briefing_v3", build_briefing_components(briefing_content, quote, author),
+                                     raise_errors=True)
+
+    today = datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y-%m-%d')
     print(f"Found {len(all_users)} user(s) to send briefing to.")
-    for user in all_users:
-        user_id, user_name, user_location = user["_id"], user.get("name", "there"), user.get("location", "Vijayawada")
-        weather_data = get_raw_weather_data(city=user_location)
-        
-        briefing_content = generate_full_daily_briefing(user_name, festival, quote, author, history_events, weather_data)
-        
-        components = [
-            {"type": "header", "parameters": [{"type": "text", "text": briefing_content.get("greeting", "Good Morning!")}]},
-            {"type": "body", "parameters": [
-                {"type": "text", "text": quote},
-                {"type": "text", "text": author},
-                {"type": "text", "text": briefing_content.get("detailed_history", "N/A")},
-                {"type": "text", "text": briefing_content.get("detailed_weather", "N/A")}
-            ]}
-        ]
-        
-        send_template_message(user_id, "daily_briefing_v3", components)
-        time.sleep(1)
+    report = broadcast_engine.run(job_id or f"daily_briefing_{today}", all_users, send_briefing_to_user, kind="daily_briefing", params={"date": today})
+    report_broadcast_to_developer(report)
     print("--- Daily Briefing Job Finished ---")
 
 def send_test_briefing(developer_number):
@@ -1240,26 +1469,15 @@ def send_test_briefing(developer_number):
     if not user:
         send_message(developer_number, "Could not send test briefing. Your user profile was not found in the database."); return
 
-    festival, (quote, author), history_events = get_indian_festival_today(), get_daily_quote(), get_on_this_day_in_history()
-    user_name, user_location = user.get("name", "Developer"), user.get("location", "Vijayawada")
-    weather_data = get_raw_weather_data(city=user_location)
+    user_name, user_location = user.get("name", "Developer"), user.get("location") or "Vijayawada"
+    content = get_briefing_content(briefing_cache_collection, [user_location])
+    quote, author = content["shared"]["quote"], content["shared"]["author"]
 
-    briefing_content = generate_full_daily_briefing(user_name, festival, quote, author, history_events, weather_data)
-    
-    components = [
-        {"type": "header", "parameters": [{"type": "text", "text": briefing_content.get("greeting", "Good Morning!")}]},
-        {"type": "body", "parameters": [
-            {"type": "text", "text": quote},
-            {"type": "text", "text": author},
-            {"type": "text", "text": briefing_content.get("detailed_history", "N/A")},
-            {"type": "text", "text": briefing_content.get("detailed_weather", "N/A")}
-        ]}
-    ]
-    
-    send_template_message(developer_number, "daily_briefing_v3", components)
+    briefing_content = personalize_briefing(content, user_name, user_location)
+    send_template_message(developer_number, "daily_briefing_v3", build_briefing_components(briefing_content, quote, author))
     print("--- Test Briefing Finished ---")
 
-def send_update_notification_to_all_users(feature_list):
+def send_update_notification_to_all_users(feature_list, job_id=None):
     if not ADMIN_SECRET_KEY:
         print("ADMIN_SECRET_KEY is not set. Cannot send notifications."); return
     print("--- Sending update notifications to all users ---")
@@ -1269,11 +1487,59 @@ def send_update_notification_to_all_users(feature_list):
 
     components = [{"type": "body", "parameters": [{"type": "text", "text": feature_list}]}]
     print(f"Found {len(all_users)} user(s). Preparing to send update templates...")
-    for user in all_users:
-        send_template_message(user["_id"], "bot_update_notification", components)
-        time.sleep(1)
+    job_id = job_id or f"update_notification_{int(time.time())}"
+    report = broadcast_engine.run(job_id, all_users, lambda user: send_template_message(user["_id"], "bot_update_notification", components, raise_errors=True),
+                                  kind="update_notification", params={"feature_list": feature_list})
+    report_broadcast_to_developer(report)
     print("--- Finished sending update notifications ---")
 
+def migrate_embedded_expenses():
+    """
+    Moves expenses still stored on user documents (from before the expenses collection) into it,
+    and adds them to the expense rollups.
+    """
+    migrated = expense_store.migrate_embedded(users_collection)
+    if migrated:
+        print(f"Migrated {migrated} embedded expense(s) to the expenses collection.")
+    rolled_up = expense_analytics.backfill(expense_store.collection)
+    if rolled_up:
+        print(f"Added {rolled_up} migrated expense(s) to the expense rollups.")
+    # Expenses written straight to Google Sheets before the rollups existed are not backfilled.
+    mark_sheet_expenses_untracked({"is_google_connected": True})
+
+def sync_reminder_index():
+    """Indexes reminders scheduled before the reminder index existed, and drops entries for jobs that are gone."""
+    indexed = reminder_index.sync(scheduler)
+    print(f"Reminder index synced: {indexed} reminder(s).")
+
+def resume_interrupted_broadcasts():
+    """
+    Picks up broadcasts that were cut off by a restart or crash; delivered recipients are skipped.
+    Runs every RESUME_POLL_SECONDS, since a dead owner's lease can still be valid for a while after a restart.
+    """
+    today = datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y-%m-%d')
+    for job in broadcast_engine.get_interrupted_jobs():
+        params = job.get("params", {})
+        if job.get("kind") == "daily_briefing" and params.get("date") == today:
+            print(f"Resuming interrupted broadcast '{job['_id']}'...")
+            send_daily_briefing(job_id=job["_id"])
+        elif job.get("kind") == "update_notification":
+            print(f"Resuming interrupted broadcast '{job['_id']}'...")
+            send_update_notification_to_all_users(params.get("feature_list"), job_id=job["_id"])
+        else:
+            broadcast_engine.abandon(job["_id"], "interrupted and no longer current")
+
+if WEBHOOK_MODE == "queue":
+    webhook_queue.start_workers(process_webhook_payload, WEBHOOK_QUEUE_WORKERS)
+
+expense_buffer.start(flush_buffered_expenses, on_expense_flush_failed)
+
+# Synced before the app serves its first request, so reminders scheduled before the index existed are listed
+# right away. It needs the started scheduler: until then get_jobs() doesn't read the job store.
+sync_reminder_index()
+scheduler.add_job(func=migrate_embedded_expenses, trigger='date', run_date=datetime.now(pytz.timezone('Asia/Kolkata')) + timedelta(seconds=10), id='migrate_expenses_job', replace_existing=True)
+scheduler.add_job(func=resume_interrupted_broadcasts, trigger='interval', seconds=RESUME_POLL_SECONDS, id='resume_broadcasts_job', replace_existing=True)
+
 if __name__ == '__main__':
     if not scheduler.get_job('daily_briefing_job'):
         scheduler.add_job(func=send_daily_briefing, trigger='cron', hour=8, minute=0, id='daily_briefing_job', replace_existing=True)
@@ -0,0 +1,104 @@
+# bench_drive_download.py
+"""
+Peak-memory benchmark for Drive downloads.
+
+Usage: python benchmarks/bench_drive_download.py [--size-mb 200] [--chunk-mb 8]
+
+Serves a synthetic file of the given size through the real MediaIoBaseDownload code path
+(no network or credentials needed) and records the peak RSS of two strategies, each in its
+own process: the old BytesIO-then-copy download, and download_request_to_file, which
+streams straight to disk.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import httplib2  # noqa: E402
+from googleapiclient.http import HttpRequest, MediaIoBaseDownload  # noqa: E402
+
+PATTERN = bytes(range(256)) * 4096  # 1 MB of filler, reused for every range
+
+
+class SyntheticDriveHttp:
+    """Answers ranged media GETs like Drive does, generating content instead of storing it."""
+
+    def __init__(self, size):
+        self.size = size
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        start, end = (int(x) for x in headers["range"].split("=")[1].split("-"))
+        end = min(end, self.size - 1)
+        length = end - start + 1
+        content = (PATTERN * (length // len(PATTERN) + 1))[:length]
+        response = httplib2.Response({"status": 206, "content-range": f"bytes {start}-{end}/{self.size}"})
+        return response, content
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # ru_maxrss is in KB on Linux
+
+
+def _legacy_download(request, file_name):
+    fh = io.BytesIO()
+    downloader = MediaIoBaseDownload(fh, request)
+    done = False
+    while done is False:
+        _, done = downloader.next_chunk()
+    fh.seek(0)
+    path = os.path.join(ROOT, "uploads", file_name)
+    with open(path, "wb") as f:
+        f.write(fh.read())
+    return path
+
+
+def run_one(mode, size, chunk_bytes):
+    from google_drive import download_request_to_file
+
+    request = HttpRequest(SyntheticDriveHttp(size), lambda resp, content: content, "https://www.googleapis.com/drive/v3/files/bench?alt=media")
+    baseline = _peak_rss_mb()
+    started = time.perf_counter()
+    if mode == "legacy":
+        path = _legacy_download(request, "bench_legacy.bin")
+    else:
+        path, _ = download_request_to_file(request, "bench_stream.bin", chunk_size=chunk_bytes)
+    elapsed = time.perf_counter() - started
+    written = os.path.getsize(path)
+    os.remove(path)
+    print(json.dumps({"mode": mode, "bytes": written, "seconds": round(elapsed, 2),
+                      "baseline_rss_mb": round(baseline, 1), "peak_rss_mb": round(_peak_rss_mb(), 1)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument("--chunk-mb", type=int, default=8)
+    parser.add_argument("--mode", choices=["legacy", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    size, chunk_bytes = args.size_mb * 1024 * 1024, args.chunk_mb * 1024 * 1024
+
+    if args.mode:
+        run_one(args.mode, size, chunk_bytes)
+        return
+
+    os.makedirs(os.path.join(ROOT, "uploads"), exist_ok=True)
+    print(f"Downloading a synthetic {args.size_mb} MB Drive file ({args.chunk_mb} MB chunks for streaming):")
+    for mode in ("legacy", "stream"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--size-mb", str(args.size_mb), "--chunk-mb", str(args.chunk_mb)],
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(output)
+        growth = result["peak_rss_mb"] - result["baseline_rss_mb"]
+        print(f"  {mode:<7} peak RSS {result['peak_rss_mb']:>7.1f} MB (+{growth:.1f} MB over baseline), {result['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
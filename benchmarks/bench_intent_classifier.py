@@ -0,0 +1,88 @@
+# bench_intent_classifier.py
+"""
+Offline accuracy and latency benchmark for the local intent classifier.
+
+Usage: python benchmarks/bench_intent_classifier.py [--corpus PATH] [--repeat N]
+
+Each corpus line is {"text", "intent", "entities"?}. A message the classifier escalates
+(returns None) counts against coverage, not accuracy; a local answer with the wrong
+intent or wrong entities is an error. The corpus must be held out: lines that repeat a
+training example are skipped and reported. Exits non-zero if precision or p95 latency
+miss their targets.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_classifier import TRAINING_EXAMPLES, _normalize, classify_intent_locally  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_corpus.jsonl")
+
+
+def _entities_match(expected, actual):
+    if expected is None:
+        return True
+    if isinstance(actual, list):
+        actual = actual[0] if actual else {}
+    return all(actual.get(key) == value for key, value in expected.items())
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=50, help="Timed passes over the corpus.")
+    parser.add_argument("--min-precision", type=float, default=0.97)
+    parser.add_argument("--max-p95-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    training_texts = {_normalize(text) for text, _ in TRAINING_EXAMPLES}
+    leaked = [row["text"] for row in corpus if _normalize(row["text"]) in training_texts]
+    corpus = [row for row in corpus if _normalize(row["text"]) not in training_texts]
+
+    handled, correct, errors = 0, 0, []
+    for row in corpus:
+        result = classify_intent_locally(row["text"])
+        if result is None:
+            continue
+        handled += 1
+        if result["intent"] == row["intent"] and _entities_match(row.get("entities"), result["entities"]):
+            correct += 1
+        else:
+            errors.append((row["text"], row["intent"], result["intent"], result["entities"]))
+
+    latencies = []
+    for _ in range(args.repeat):
+        for row in corpus:
+            started = time.perf_counter()
+            classify_intent_locally(row["text"])
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    precision = correct / handled if handled else 0.0
+    p95 = _percentile(latencies, 95)
+    print(f"Corpus:     {len(corpus)} messages ({args.corpus})")
+    if leaked:
+        print(f"Skipped:    {len(leaked)} message(s) that repeat a training example: {leaked}")
+    print(f"Coverage:   {handled}/{len(corpus)} handled locally ({handled / len(corpus):.1%}), rest escalated to Grok")
+    print(f"Precision:  {correct}/{handled} correct when handled locally ({precision:.1%})")
+    print(f"Latency:    p50 {_percentile(latencies, 50):.3f} ms, p95 {p95:.3f} ms, max {max(latencies):.3f} ms, mean {statistics.mean(latencies):.3f} ms")
+    for text, expected, got, entities in errors:
+        print(f"  MISS: {text!r}: expected {expected}, got {got} {entities}")
+
+    if precision < args.min_precision or p95 > args.max_p95_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# briefing.py
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import pytz
+
+from services import get_daily_quote, get_on_this_day_in_history, get_raw_weather_data, get_indian_festival_today
+from grok_ai import generate_briefing_shared_sections, generate_city_weather_forecast
+
+# --- Configuration ---
+PREFETCH_CONCURRENCY = 8
+DEFAULT_CITY = "Vijayawada"
+CACHE_TTL_SECONDS = 3 * 24 * 60 * 60
+
+# Shown when a fetch or generation fails. Never cached, so the next briefing run tries again.
+SHARED_FALLBACK = {
+    "festival": None,
+    "quote": "The best way to predict the future is to create it.",
+    "author": "Peter Drucker",
+    "history_events": [{"text": "Could not retrieve a historical fact for today."}]
+}
+SECTIONS_FALLBACK = {
+    "greeting": "☀️ Good Morning",
+    "quote_explanation": "Could not generate explanation.",
+    "detailed_history": "Could not generate historical fact."
+}
+WEATHER_TEXT_FALLBACK = "Could not generate weather forecast."
+
+_memory_cache = {}
+_in_flight = {}     # (date, part, city) -> Future for a fetch or generation under way
+_cache_lock = threading.Lock()   # Guards the two dicts above; never held during network I/O
+
+
+def city_key(city):
+    """Normalizes a city name so 'pune', ' Pune ' and 'PUNE' share one cache entry (and one Mongo field)."""
+    return (city or DEFAULT_CITY).strip().lower().replace(".", "").replace("$", "")
+
+
+def _today():
+    return datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y-%m-%d')
+
+
+def _once(key, func):
+    """Runs func() for `key`, or, if another thread already is, waits for and returns its result."""
+    with _cache_lock:
+        future = _in_flight.get(key)
+        owner = future is None
+        if owner:
+            future = _in_flight[key] = Future()
+    if owner:
+        try:
+            future.set_result(func())
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with _cache_lock:
+                _in_flight.pop(key, None)
+    return future.result()
+
+
+def _day_cache(cache_collection, date_key):
+    """Returns the in-memory cache for a day, loading it from Mongo the first time."""
+    with _cache_lock:
+        data = _memory_cache.get(date_key)
+    if data is not None:
+        return data
+    stored = cache_collection.find_one({"_id": date_key}) or {}
+    with _cache_lock:
+        if date_key not in _memory_cache:
+            _memory_cache.clear()
+            _memory_cache[date_key] = {
+                "shared": stored.get("shared"),
+                "weather": stored.get("weather", {}),
+                "sections": stored.get("sections"),
+                "weather_text": stored.get("weather_text", {})
+            }
+        return _memory_cache[date_key]
+
+
+def _save(cache_collection, date_key, data, part, key, value):
+    """Stores one fetched or generated value in memory and in Mongo."""
+    with _cache_lock:
+        if key is None:
+            data[part] = value
+        else:
+            data[part][key] = value
+    field = part if key is None else f"{part}.{key}"
+    cache_collection.update_one(
+        {"_id": date_key},
+        {"$set": {field: value}, "$setOnInsert": {"created_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+
+def _fetch_shared_content(executor):
+    """Returns the day's festival, quote and history, with None for any part whose fetch failed."""
+    festival_future = executor.submit(get_indian_festival_today)
+    quote_future = executor.submit(get_daily_quote)
+    history_future = executor.submit(get_on_this_day_in_history)
+    quote, author = quote_future.result()
+    return {
+        "festival": festival_future.result(),
+        "quote": quote,
+        "author": author,
+        "history_events": history_future.result()
+    }
+
+
+def get_briefing_data(cache_collection, locations, date_key=None):
+    """
+    Returns the day's shared briefing content plus raw weather for every requested city.
+
+    Shared content (festival, quote, history) is fetched once per day and each distinct
+    city's weather once per day, concurrently. Results are kept in memory and in Mongo,
+    so a resumed broadcast or a later test briefing reuses exactly the same content.
+    Failed fetches are not cached: this caller gets fallback content (marked "degraded")
+    and the next caller tries again.
+    """
+    date_key = date_key or _today()
+    data = _day_cache(cache_collection, date_key)
+    missing_cities = {city_key(city): (city or DEFAULT_CITY).strip() for city in locations}
+    missing_cities = {key: name for key, name in missing_cities.items() if key not in data["weather"]}
+    shared = data["shared"]
+    if shared is not None and not missing_cities:
+        return data
+
+    def fetch_weather(key, name):
+        weather = get_raw_weather_data(city=name)
+        if weather is not None:
+            _save(cache_collection, date_key, data, "weather", key, weather)
+        return weather
+
+    def fetch_shared(executor):
+        content = _fetch_shared_content(executor)
+        if all(value is not None for value in content.values()):
+            _save(cache_collection, date_key, data, "shared", None, content)
+        return content
+
+    with ThreadPoolExecutor(max_workers=PREFETCH_CONCURRENCY, thread_name_prefix="briefing-prefetch") as executor:
+        weather_futures = [executor.submit(_once, (date_key, "weather", key), lambda key=key, name=name: fetch_weather(key, name))
+                           for key, name in missing_cities.items()]
+        if shared is None:
+            shared = _once((date_key, "shared", None), lambda: fetch_shared(executor))
+        for future in weather_futures:
+            future.result()
+
+    print(f"Briefing prefetch for {date_key}: fetched {len(missing_cities)} city forecast(s).")
+    if any(value is None for value in shared.values()):
+        filled = {name: SHARED_FALLBACK[name] if value is None else value for name, value in shared.items()}
+        return {**data, "shared": filled, "degraded": True}
+    return data
+
+
+def get_briefing_content(cache_collection, locations, date_key=None):
+    """
+    Returns the day's raw briefing data plus its AI-written text.
+
+    The shared sections are generated once per day and the weather text once per city,
+    so the number of LLM calls grows with the number of distinct cities, not users.
+    Text written from fallback data, and placeholders for failed generations, are only
+    returned to this caller, never cached.
+    """
+    date_key = date_key or _today()
+    data = get_briefing_data(cache_collection, locations, date_key)
+    degraded = data.get("degraded", False)
+    missing_cities = {city_key(city) for city in locations} - set(data["weather_text"])
+    sections = data["sections"]
+    if sections is not None and not missing_cities:
+        return data
+
+    def write_weather_text(key):
+        weather = data["weather"].get(key)
+        weather_text = generate_city_weather_forecast((weather or {}).get("name") or key.title(), weather)
+        # Only keep text written from real data; cities without weather get retried next time.
+        if weather_text is not None and weather is not None:
+            _save(cache_collection, date_key, data, "weather_text", key, weather_text)
+        return weather_text
+
+    def write_sections():
+        shared = data["shared"]
+        result = generate_briefing_shared_sections(shared["festival"], shared["quote"], shared["author"], shared["history_events"])
+        if result is not None and not degraded:
+            _save(cache_collection, date_key, data, "sections", None, result)
+        return result
+
+    fallback_text = {}
+    with ThreadPoolExecutor(max_workers=PREFETCH_CONCURRENCY, thread_name_prefix="briefing-generate") as executor:
+        text_futures = {key: executor.submit(_once, (date_key, "weather_text", key), lambda key=key: write_weather_text(key))
+                        for key in missing_cities}
+        if sections is None:
+            # Sections written from fallback content are this caller's alone, so they aren't shared in flight either.
+            sections = write_sections() if degraded else _once((date_key, "sections", None), write_sections)
+        for key, future in text_futures.items():
+            if future.result() is None:
+                fallback_text[key] = WEATHER_TEXT_FALLBACK
+
+    print(f"Briefing generation for {date_key}: wrote weather text for {len(missing_cities)} city(ies).")
+    if degraded or data["sections"] is None or fallback_text:
+        # Fill the gaps for this caller only, leaving the cached data untouched.
+        return {**data, "sections": sections or SECTIONS_FALLBACK,
+                "weather_text": {**data["weather_text"], **fallback_text}}
+    return data
+
+
+def personalize_briefing(content, user_name, city):
+    """Fills in the per-user parts of the briefing locally, without another AI call."""
+    sections = content["sections"]
+    return {
+        "greeting": f"{sections['greeting'].rstrip('!., ')}, {user_name}!",
+        "quote_explanation": sections["quote_explanation"],
+        "detailed_history": sections["detailed_history"],
+        "detailed_weather": content["weather_text"].get(city_key(city), "Weather data is currently unavailable.")
+    }
+
+
+def ensure_briefing_cache_indexes(cache_collection):
+    cache_collection.create_index("created_at", expireAfterSeconds=CACHE_TTL_SECONDS)
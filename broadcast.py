@@ -0,0 +1,193 @@
+# broadcast.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import requests
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# --- Configuration ---
+DEFAULT_RATE_PER_SECOND = 20    # Keep below the messages-per-second limit of the WhatsApp messaging tier
+DEFAULT_CONCURRENCY = 10
+DEFAULT_MAX_RETRIES = 3
+LEASE_SECONDS = 120             # A job whose owner stops renewing this lease can be resumed by another worker
+RESUME_POLL_SECONDS = LEASE_SECONDS / 3   # How often callers should look for jobs whose lease ran out
+PROGRESS_EVERY = 100
+
+
+def is_retryable(error):
+    """
+    Only rate limiting (429) and failures to connect are worth another attempt. Other 4xx
+    responses (a rejected template, an invalid number) will fail again, and a read timeout or
+    5xx after the request was sent may already have delivered the message.
+    """
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is not None and error.response.status_code == 429
+    return isinstance(error, requests.exceptions.ConnectionError)
+
+
+def _is_permanent(error):
+    return (isinstance(error, requests.exceptions.HTTPError) and error.response is not None
+            and 400 <= error.response.status_code < 500 and error.response.status_code != 429)
+
+
+class TokenBucket:
+    """A thread-safe token bucket; `acquire()` blocks until a token is available."""
+
+    def __init__(self, rate_per_second, capacity=None):
+        self.rate = float(rate_per_second)
+        self.capacity = float(capacity or rate_per_second)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class BroadcastEngine:
+    """
+    Sends one message per recipient with bounded concurrency and a global rate limit.
+
+    Every delivery is checkpointed in Mongo, so a job that is interrupted (restart, crash)
+    can be started again with the same job ID and will only contact the remaining recipients.
+    """
+
+    def __init__(self, jobs_collection, deliveries_collection, rate_per_second=DEFAULT_RATE_PER_SECOND,
+                 concurrency=DEFAULT_CONCURRENCY, max_retries=DEFAULT_MAX_RETRIES):
+        self.jobs = jobs_collection
+        self.deliveries = deliveries_collection
+        self.rate_per_second = rate_per_second
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.deliveries.create_index([("job_id", ASCENDING), ("status", ASCENDING)])
+        self.jobs.create_index([("status", ASCENDING), ("lease_until", ASCENDING)])
+
+    def _claim_job(self, job_id, kind, params, total):
+        """Takes ownership of a job. Returns the job document, or None if it is finished or owned elsewhere."""
+        now = datetime.now(timezone.utc)
+        try:
+            return self.jobs.find_one_and_update(
+                {"_id": job_id, "status": {"$ne": "completed"}, "$or": [{"lease_until": {"$lt": now}}, {"lease_until": {"$exists": False}}]},
+                {
+                    "$set": {"status": "running", "lease_until": now + timedelta(seconds=LEASE_SECONDS), "total": total},
+                    "$setOnInsert": {"kind": kind, "params": params or {}, "started_at": now}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return None
+
+    def _renew_lease(self, job_id, stop_event):
+        while not stop_event.wait(LEASE_SECONDS / 3):
+            self.jobs.update_one({"_id": job_id}, {"$set": {"lease_until": datetime.now(timezone.utc) + timedelta(seconds=LEASE_SECONDS)}})
+
+    def get_interrupted_jobs(self):
+        """Returns jobs that were running when their owner stopped renewing the lease."""
+        return list(self.jobs.find({"status": "running", "lease_until": {"$lt": datetime.now(timezone.utc)}}))
+
+    def abandon(self, job_id, reason):
+        """Marks an interrupted job that can no longer be resumed (e.g. yesterday's briefing) as finished."""
+        self.jobs.update_one({"_id": job_id, "status": "running"},
+                             {"$set": {"status": "abandoned", "finished_at": datetime.now(timezone.utc), "error": reason}})
+
+    def run(self, job_id, recipients, send_func, kind=None, params=None):
+        """
+        Delivers to every recipient (a dict with an "_id") by calling `send_func(recipient)`,
+        which must return True on success and should raise the request's exception on failure;
+        only errors that `is_retryable` accepts are retried. Returns the final delivery report,
+        or None if the job is already complete or being run by another worker.
+        """
+        job = self._claim_job(job_id, kind, params, len(recipients))
+        if not job:
+            existing = self.jobs.find_one({"_id": job_id})
+            if existing and existing.get("status") == "completed":
+                print(f"Broadcast '{job_id}' has already completed. Skipping.")
+            else:
+                print(f"Broadcast '{job_id}' is already running in another worker. Skipping.")
+            return None
+
+        already_sent = {d["recipient"] for d in self.deliveries.find({"job_id": job_id, "status": "sent"}, {"recipient": 1})}
+        # Recipients the API rejected outright (e.g. an invalid number) would only be rejected again.
+        rejected = {d["recipient"] for d in self.deliveries.find({"job_id": job_id, "status": "failed", "permanent": True}, {"recipient": 1})}
+        pending = [r for r in recipients if r["_id"] not in already_sent and r["_id"] not in rejected]
+        if already_sent:
+            print(f"Resuming broadcast '{job_id}': {len(already_sent)} already delivered, {len(pending)} remaining.")
+
+        bucket = TokenBucket(self.rate_per_second)
+        counts = {"sent": 0, "failed": 0}
+        counts_lock = threading.Lock()
+        started = time.monotonic()
+
+        def deliver(recipient):
+            recipient_id = recipient["_id"]
+            error, permanent = None, False
+            for attempt in range(self.max_retries + 1):
+                bucket.acquire()
+                try:
+                    if send_func(recipient):
+                        error = None
+                        break
+                    error = "send returned failure"
+                    break
+                except Exception as e:
+                    error, permanent = str(e), _is_permanent(e)
+                    if not is_retryable(e):
+                        break
+                if attempt < self.max_retries:
+                    time.sleep(min(2 ** attempt, 30))
+            status = "failed" if error else "sent"
+            self.deliveries.update_one(
+                {"_id": f"{job_id}:{recipient_id}"},
+                {"$set": {"job_id": job_id, "recipient": recipient_id, "status": status, "attempts": attempt + 1,
+                          "error": error, "permanent": permanent, "updated_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+            with counts_lock:
+                counts[status] += 1
+                done = counts["sent"] + counts["failed"]
+            if done % PROGRESS_EVERY == 0:
+                print(f"Broadcast '{job_id}': {done}/{len(pending)} processed.")
+
+        stop_event = threading.Event()
+        threading.Thread(target=self._renew_lease, args=(job_id, stop_event), daemon=True).start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="broadcast") as executor:
+                list(executor.map(deliver, pending))
+        finally:
+            stop_event.set()
+
+        report = {
+            "job_id": job_id,
+            "total_recipients": len(recipients),
+            "previously_sent": len(already_sent),
+            "previously_rejected": len(rejected),
+            "sent": counts["sent"],
+            "failed": counts["failed"],
+            "duration_seconds": round(time.monotonic() - started, 1)
+        }
+        self.jobs.update_one({"_id": job_id}, {"$set": {"status": "completed", "finished_at": datetime.now(timezone.utc), "report": report}})
+        print(f"Broadcast '{job_id}' finished: {report}")
+        return report
+
+
+def format_broadcast_report(report):
+    return (
+        f"📣 *Broadcast Report*: `{report['job_id']}`\n\n"
+        f"Recipients: *{report['total_recipients']}*\n"
+        f"✅ Sent: *{report['sent'] + report['previously_sent']}*\n"
+        f"❌ Failed: *{report['failed'] + report.get('previously_rejected', 0)}*\n"
+        f"⏱️ Took {report['duration_seconds']}s"
+    )
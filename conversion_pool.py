@@ -0,0 +1,144 @@
+# conversion_pool.py
+import multiprocessing
+import os
+import queue
+import resource
+import signal
+import threading
+import time
+from collections import Counter
+
+# --- Configuration ---
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUED = 20          # Jobs waiting or running; beyond this new jobs are turned away
+DEFAULT_MAX_PER_USER = 2
+DEFAULT_TIME_LIMIT = 120         # Seconds before a conversion is killed
+DEFAULT_MEMORY_LIMIT_MB = 1024   # Address-space limit per conversion process; 0 disables it
+PROGRESS_INTERVAL = 20           # Seconds between "still working" updates
+
+# Forked, not spawned, for the same reason as process_pool.py.
+_context = multiprocessing.get_context("fork")
+
+
+class ConversionRejected(Exception):
+    """Raised by ConversionPool.submit when the queue (or the user's share of it) is full."""
+
+
+def _run_job(conn, func, args, memory_limit_bytes):
+    """Runs in the child process. Sends None on success, or an error description."""
+    # Own process group, so a timeout also kills any workers the converter started.
+    os.setpgrp()
+    if memory_limit_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+    try:
+        func(*args)
+        conn.send(None)
+    except MemoryError:
+        conn.send("the file needs more memory than I'm allowed to use")
+    except Exception as e:
+        conn.send(str(e) or e.__class__.__name__)
+    finally:
+        conn.close()
+
+
+class ConversionPool:
+    """
+    Runs conversions in separate processes, at most `workers` at a time.
+
+    Each job gets its own process with a wall-clock time limit and a memory limit, so a
+    pathological file can't stall or exhaust the server. Jobs wait in a bounded queue;
+    `submit` rejects new work when the queue or the user's share of it is full.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_queued=DEFAULT_MAX_QUEUED, max_per_user=DEFAULT_MAX_PER_USER,
+                 time_limit=DEFAULT_TIME_LIMIT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+        self.max_queued = max_queued
+        self.max_per_user = max_per_user
+        self.time_limit = time_limit
+        self.memory_limit_bytes = memory_limit_mb * 1024 * 1024
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.outstanding = Counter()   # owner -> jobs queued or running
+        self.stats = Counter()
+        for i in range(workers):
+            threading.Thread(target=self._worker_loop, name=f"conversion-{i}", daemon=True).start()
+
+    def submit(self, owner, func, args, on_done, on_progress=None):
+        """
+        Queues `func(*args)`. `on_done(error)` is called with None on success or an error
+        description; `on_progress(seconds)` is called periodically while it runs.
+        Returns the number of jobs ahead of this one.
+        """
+        with self.lock:
+            total = sum(self.outstanding.values())
+            if total >= self.max_queued:
+                self.stats["rejected"] += 1
+                raise ConversionRejected("queue_full")
+            if self.outstanding[owner] >= self.max_per_user:
+                self.stats["rejected"] += 1
+                raise ConversionRejected("user_limit")
+            self.outstanding[owner] += 1
+            self.stats["submitted"] += 1
+        self.jobs.put((owner, func, args, on_done, on_progress))
+        return total
+
+    def _worker_loop(self):
+        while True:
+            owner, func, args, on_done, on_progress = self.jobs.get()
+            try:
+                error = self._run(func, args, on_progress)
+                with self.lock:
+                    self.stats["failed" if error else "completed"] += 1
+                on_done(error)
+            except Exception as e:
+                print(f"Conversion worker error: {e}")
+            finally:
+                with self.lock:
+                    self.outstanding[owner] -= 1
+                    if self.outstanding[owner] <= 0:
+                        del self.outstanding[owner]
+                self.jobs.task_done()
+
+    def _run(self, func, args, on_progress):
+        receiver, sender = _context.Pipe(duplex=False)
+        # Not a daemon: pdf2docx's multi-processing mode needs to start its own workers.
+        process = _context.Process(target=_run_job, args=(sender, func, args, self.memory_limit_bytes))
+        started = time.monotonic()
+        process.start()
+        sender.close()
+        next_progress = started + PROGRESS_INTERVAL
+        try:
+            while True:
+                if receiver.poll(1):
+                    try:
+                        return receiver.recv()
+                    except EOFError:
+                        return "the conversion process stopped unexpectedly"
+                if not process.is_alive() and not receiver.poll():
+                    return "the conversion process stopped unexpectedly"
+                now = time.monotonic()
+                if now - started >= self.time_limit:
+                    self._kill(process)
+                    with self.lock:
+                        self.stats["timed_out"] += 1
+                    return f"it took longer than {self.time_limit} seconds"
+                if on_progress and now >= next_progress:
+                    next_progress += PROGRESS_INTERVAL
+                    try:
+                        on_progress(int(now - started))
+                    except Exception as e:
+                        print(f"Conversion progress callback error: {e}")
+        finally:
+            receiver.close()
+            process.join(5)
+
+    @staticmethod
+    def _kill(process):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            process.kill()
+
+    def get_metrics(self):
+        with self.lock:
+            return dict(self.stats, outstanding=sum(self.outstanding.values()), users=len(self.outstanding))
@@ -0,0 +1,40 @@
+# conversions.py
+"""
+Document conversions. These are CPU- and memory-heavy, so they are run through
+ConversionPool (conversion_pool.py), never on a webhook or message-handling thread.
+"""
+import os
+
+import fitz  # PyMuPDF
+from docx import Document
+from fpdf import FPDF
+from pdf2docx import Converter
+
+# --- Configuration ---
+LARGE_PDF_PAGES = int(os.environ.get("CONVERSION_LARGE_PDF_PAGES", 20))  # From this size pdf2docx uses several processes
+PDF_CONVERSION_PROCESSES = int(os.environ.get("CONVERSION_PDF_PROCESSES", min(4, os.cpu_count() or 1)))
+
+
+def pdf_to_docx(input_path, output_path):
+    with fitz.open(input_path) as doc:
+        page_count = doc.page_count
+    cv = Converter(input_path)
+    try:
+        if page_count >= LARGE_PDF_PAGES and PDF_CONVERSION_PROCESSES > 1:
+            cv.convert(output_path, start=0, end=None, multi_processing=True, cpu_count=PDF_CONVERSION_PROCESSES)
+        else:
+            cv.convert(output_path, start=0, end=None)
+    finally:
+        cv.close()
+
+
+def text_to_pdf(text, output_path):
+    pdf = FPDF(); pdf.add_page(); pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.set_font("Arial", size=12)
+    pdf.multi_cell(0, 10, text.encode('latin-1', 'replace').decode('latin-1'))
+    pdf.output(output_path)
+
+
+def text_to_docx(text, output_path):
+    doc = Document(); doc.add_paragraph(text)
+    doc.save(output_path)
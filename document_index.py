@@ -0,0 +1,133 @@
+# document_index.py
+"""
+Splits extracted document text into chunks and ranks them against a question with BM25,
+so follow-up questions only send the relevant parts of a document to the model.
+"""
+import math
+import re
+from collections import Counter
+
+# --- Configuration ---
+CHUNK_CHARS = 1200
+CHUNK_OVERLAP_CHARS = 150
+DEFAULT_TOP_K = 4
+CONTEXT_CHAR_BUDGET = 6000   # Documents shorter than this are sent whole; nothing to gain from retrieval
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i", "in",
+    "is", "it", "its", "me", "my", "of", "on", "or", "please", "tell", "that", "the", "this", "to", "was",
+    "what", "when", "where", "which", "who", "why", "will", "with", "you", "your", "about", "give", "document"
+}
+
+
+def tokenize(text):
+    return [token for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in STOPWORDS]
+
+
+def split_into_chunks(text, chunk_chars=CHUNK_CHARS, overlap_chars=CHUNK_OVERLAP_CHARS):
+    """Splits text into roughly `chunk_chars`-sized chunks, breaking at paragraphs or sentences where possible."""
+    text = re.sub(r"[ \t]+", " ", text).strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            window = text[start:end]
+            split_at = max(window.rfind("\n\n"), window.rfind(". "), window.rfind("\n"))
+            if split_at > chunk_chars // 2:
+                end = start + split_at + 1
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        # Carry a little of the previous chunk over so an answer split across a boundary is still found.
+        start = max(end - overlap_chars, start + 1)
+        space = text.find(" ", start, end)
+        if space != -1:
+            start = space + 1
+    return chunks
+
+
+class DocumentIndex:
+    """A BM25 index over a document's chunks. Serializes to a plain dict for storage in Mongo."""
+
+    def __init__(self, chunks, term_freqs=None):
+        self.chunks = chunks
+        self.term_freqs = term_freqs or [dict(Counter(tokenize(chunk))) for chunk in chunks]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freqs = Counter()
+        for tf in self.term_freqs:
+            doc_freqs.update(tf.keys())
+        n = len(chunks)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freqs.items()}
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(split_into_chunks(text))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["chunks"], data.get("term_freqs"))
+
+    def to_dict(self):
+        return {"chunks": self.chunks, "term_freqs": self.term_freqs}
+
+    @property
+    def total_chars(self):
+        return sum(len(chunk) for chunk in self.chunks)
+
+    def score(self, question):
+        terms = set(tokenize(question))
+        scores = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (self.avg_length or 1))
+                    score += self.idf[term] * freq * (BM25_K1 + 1) / (freq + norm)
+            scores.append(score)
+        return scores
+
+    def search(self, question, k=DEFAULT_TOP_K):
+        """Returns the indexes of the `k` best-matching chunks (only chunks that match at all)."""
+        scores = self.score(question)
+        ranked = sorted((i for i, s in enumerate(scores) if s > 0), key=lambda i: scores[i], reverse=True)
+        return ranked[:k]
+
+    def head(self, max_chars=CONTEXT_CHAR_BUDGET):
+        """The opening chunks of the document, up to `max_chars`."""
+        return self._join(self._fit(range(len(self.chunks)), max_chars))
+
+    def context_for(self, question, k=DEFAULT_TOP_K, max_chars=CONTEXT_CHAR_BUDGET):
+        """
+        Returns the document text to send with a question: the whole document if it is
+        short, otherwise the top-k chunks in document order. Questions with no matching
+        terms ("summarize it") get chunks spread evenly across the document instead.
+        """
+        if self.total_chars <= max_chars:
+            return self._join(range(len(self.chunks)))
+        selected = self.search(question, k)
+        if not selected:
+            step = max(1, len(self.chunks) // k)
+            selected = list(range(0, len(self.chunks), step))
+        return self._join(sorted(self._fit(selected, max_chars)))
+
+    def _fit(self, indexes, max_chars):
+        chosen, used = [], 0
+        for i in indexes:
+            if chosen and used + len(self.chunks[i]) > max_chars:
+                break
+            chosen.append(i)
+            used += len(self.chunks[i])
+        return chosen
+
+    def _join(self, indexes):
+        indexes = list(indexes)
+        if len(indexes) == len(self.chunks):
+            return "\n\n".join(self.chunks)
+        return "\n\n".join(f"[Excerpt {i + 1} of {len(self.chunks)}]\n{self.chunks[i]}" for i in indexes)
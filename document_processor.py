@@ -1,16 +1,87 @@
 # document_processor.py
 
+import os
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+
 import fitz  # PyMuPDF for PDFs
 import docx  # python-docx for Word documents
-import pytesseract
-from pdf2image import convert_from_path
 
-def extract_text_from_pdf(file_path):
+from ocr import ocr_file
+from process_pool import get_process_pool, reset_process_pool
+
+# --- Configuration ---
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", 40))  # Smaller PDFs are faster to read in-process
+PDF_PAGES_PER_TASK = 16
+PDF_TASKS_AHEAD = 4  # Page ranges extracted ahead of the consumer; bounds memory on huge files
+SCANNED_PDF_MAX_CHARS = 100  # PDFs with less embedded text than this are treated as scans and OCR'd
+
+def _extract_page_range(file_path, start, end):
+    """Process-pool task: returns the text of pages [start, end)."""
+    with fitz.open(file_path) as doc:
+        return [doc[i].get_text() for i in range(start, end)]
+
+def _iter_pdf_pages_serial(file_path, page_limit, first_page=0):
+    with fitz.open(file_path) as doc:
+        for i in range(first_page, page_limit):
+            yield i + 1, doc[i].get_text()
+
+def _iter_pdf_pages_parallel(file_path, page_limit):
+    ranges = deque((start, min(start + PDF_PAGES_PER_TASK, page_limit)) for start in range(0, page_limit, PDF_PAGES_PER_TASK))
+    pending = deque()
+    pages_done = 0
+    try:
+        pool = get_process_pool()
+        while ranges or pending:
+            while ranges and len(pending) < PDF_TASKS_AHEAD:
+                start, end = ranges.popleft()
+                pending.append((start, pool.submit(_extract_page_range, file_path, start, end)))
+            start, future = pending.popleft()
+            for offset, text in enumerate(future.result()):
+                pages_done = start + offset + 1
+                yield pages_done, text
+    except BrokenProcessPool:
+        print("PDF extraction pool failed; continuing in-process.")
+        reset_process_pool()
+        pending.clear()
+        yield from _iter_pdf_pages_serial(file_path, page_limit, first_page=pages_done)
+    finally:
+        # Stops outstanding work if the caller stopped early.
+        for _, future in pending:
+            future.cancel()
+
+def iter_pdf_pages(file_path, max_pages=None, max_chars=None):
+    """
+    Yields (page_number, text) for each page of a PDF, in order, as soon as it is extracted.
+
+    Stops once `max_pages` pages or `max_chars` characters have been produced. Large PDFs
+    are split into page ranges that are extracted across the process pool, a few ranges
+    ahead of the consumer, so the first pages are available immediately.
+    """
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count
+    page_limit = min(page_count, max_pages) if max_pages else page_count
+
+    if page_limit < PDF_PARALLEL_MIN_PAGES:
+        pages = _iter_pdf_pages_serial(file_path, page_limit)
+    else:
+        pages = _iter_pdf_pages_parallel(file_path, page_limit)
+
+    total_chars = 0
+    try:
+        for page_number, text in pages:
+            yield page_number, text
+            total_chars += len(text)
+            if max_chars and total_chars >= max_chars:
+                return
+    finally:
+        pages.close()
+
+def extract_text_from_pdf(file_path, max_pages=None, max_chars=None):
     """Extracts text from a PDF file."""
     try:
-        with fitz.open(file_path) as doc:
-            text = "".join(page.get_text() for page in doc)
-        return text.strip()
+        text = "".join(text for _, text in iter_pdf_pages(file_path, max_pages, max_chars))
+        return text[:max_chars].strip() if max_chars else text.strip()
     except Exception as e:
         print(f"Error extracting PDF text: {e}")
         return ""
@@ -24,28 +95,29 @@ def extract_text_from_docx(file_path):
         print(f"Error extracting DOCX text: {e}")
         return ""
 
-def extract_text_from_image(file_path):
-    """Extracts text from an image file using OCR."""
+def extract_text_with_ocr(file_path, max_pages=None, max_chars=None):
+    """Extracts text from an image or a scanned PDF using OCR."""
     try:
-        images = convert_from_path(file_path)
-        text = ""
-        for image in images:
-            text += pytesseract.image_to_string(image) + "\n"
-        return text.strip()
+        return ocr_file(file_path, max_pages=max_pages, max_chars=max_chars).strip()
     except Exception as e:
-        print(f"Error extracting image text (OCR): {e}")
+        print(f"Error extracting text with OCR: {e}")
         return ""
 
-def get_text_from_file(file_path, mime_type):
+def get_text_from_file(file_path, mime_type, max_pages=None, max_chars=None):
     """
     Dispatcher function to extract text based on the file's MIME type.
+    `max_pages` and `max_chars` stop PDF extraction early once enough text has been read.
     """
     if mime_type == 'application/pdf':
-        return extract_text_from_pdf(file_path)
+        text = extract_text_from_pdf(file_path, max_pages, max_chars)
+        if len(text) < SCANNED_PDF_MAX_CHARS:
+            # Little or no text layer: a scan. OCR keeps any text-layer pages and only reads the rest.
+            return extract_text_with_ocr(file_path, max_pages, max_chars) or text
+        return text
     elif mime_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
         return extract_text_from_docx(file_path)
     elif mime_type.startswith('image/'):
-        return extract_text_from_image(file_path)
+        return extract_text_with_ocr(file_path, max_chars=max_chars)
     else:
         print(f"Unsupported file type for text extraction: {mime_type}")
         return None
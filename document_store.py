@@ -0,0 +1,111 @@
+# document_store.py
+import hashlib
+import json
+import os
+import zlib
+from datetime import datetime, timezone
+
+from bson.binary import Binary
+
+from document_index import DocumentIndex
+from document_processor import get_text_from_file
+from grok_ai import analyze_document_context
+
+# --- Configuration ---
+RETENTION_SECONDS = 30 * 24 * 60 * 60   # Documents nobody has used for this long are removed
+HASH_BLOCK_SIZE = 1024 * 1024
+MAX_DOCUMENT_PAGES = int(os.environ.get("MAX_DOCUMENT_PAGES", 500))
+MAX_DOCUMENT_CHARS = int(os.environ.get("MAX_DOCUMENT_CHARS", 2_000_000))  # Keeps the compressed entry well under Mongo's 16 MB limit
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _compress(value):
+    return Binary(zlib.compress(value.encode("utf-8")))
+
+
+def _decompress(value):
+    return zlib.decompress(value).decode("utf-8")
+
+
+class DocumentStore:
+    """
+    Extracted documents, stored once and addressed by the SHA-256 of the original file.
+
+    Each entry holds the compressed text, its compressed BM25 index and the document
+    analysis, so sessions only need to keep the document ID, and uploading the same
+    file again (by anyone) skips extraction and analysis entirely.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.collection.create_index("last_used_at", expireAfterSeconds=RETENTION_SECONDS)
+
+    def ingest_file(self, file_path, mime_type, document_id=None):
+        """
+        Returns {"document_id", "doc_type", "data", "error"} for a downloaded file,
+        extracting and analyzing it only if this exact file has not been seen before.
+        """
+        document_id = document_id or file_sha256(file_path)
+        existing = self.collection.find_one_and_update(
+            {"_id": document_id},
+            {"$set": {"last_used_at": datetime.now(timezone.utc)}},
+            projection={"doc_type": 1, "data": 1}
+        )
+        if existing:
+            print(f"Document {document_id[:12]} already processed; reusing stored text and analysis.")
+            return {"document_id": document_id, "doc_type": existing.get("doc_type"), "data": existing.get("data", {}), "error": None}
+
+        extracted_text = get_text_from_file(file_path, mime_type, max_pages=MAX_DOCUMENT_PAGES, max_chars=MAX_DOCUMENT_CHARS)
+        if not extracted_text:
+            return {"error": "❌ I couldn't find any readable text in that file."}
+
+        # Index the document once; the type check only needs its opening, and questions get the relevant chunks.
+        document_index = DocumentIndex.from_text(extracted_text)
+        analysis = analyze_document_context(document_index.head())
+        if not analysis:
+            return {"error": "🤔 I analyzed the document, but I'm not sure what to do with it."}
+
+        now = datetime.now(timezone.utc)
+        try:
+            self.collection.update_one(
+                {"_id": document_id},
+                {
+                    "$set": {"last_used_at": now},
+                    "$setOnInsert": {
+                        "mime_type": mime_type,
+                        "text_chars": len(extracted_text),
+                        "text": _compress(extracted_text),
+                        "index": _compress(json.dumps(document_index.to_dict())),
+                        "doc_type": analysis.get("doc_type"),
+                        "data": analysis.get("data", {}),
+                        "created_at": now
+                    }
+                },
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Error storing document {document_id[:12]}: {e}")
+            return {"error": "❌ Sorry, that document is too large for me to keep in memory."}
+        return {"document_id": document_id, "doc_type": analysis.get("doc_type"), "data": analysis.get("data", {}), "error": None}
+
+    def get_index(self, document_id):
+        """Loads a document's BM25 index, or returns None if the document has expired."""
+        doc = self.collection.find_one_and_update(
+            {"_id": document_id},
+            {"$set": {"last_used_at": datetime.now(timezone.utc)}},
+            projection={"index": 1}
+        )
+        if not doc:
+            return None
+        return DocumentIndex.from_dict(json.loads(_decompress(doc["index"])))
+
+    def get_text(self, document_id):
+        doc = self.collection.find_one({"_id": document_id}, {"text": 1})
+        return _decompress(doc["text"]) if doc else None
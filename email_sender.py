@@ -3,7 +3,7 @@ import os
 import base64
 from email.message import EmailMessage
 import mimetypes
-from googleapiclient.discovery import build
+from google_services import get_service
 
 def create_message(sender, to, subject, body, attachment_paths=None):
     """Creates an email message object."""
@@ -34,7 +34,7 @@ def send_email(credentials, recipient_emails, subject, body, attachment_paths=No
     """
     try:
         # From email_sender.py
-        service = build('gmail', 'v1', credentials=credentials, cache_discovery=False)
+        service = get_service('gmail', 'v1', credentials)
         
         # Get the user's own email address to use as the 'From' field
         user_email = service.users().getProfile(userId='me').execute().get('emailAddress')
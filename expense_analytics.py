@@ -0,0 +1,257 @@
+# expense_analytics.py
+import re
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+import pytz
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from expense_store import parse_timestamp
+
+# --- Configuration ---
+LOCAL_TIMEZONE = pytz.timezone('Asia/Kolkata')
+BACKFILL_BATCH_SIZE = 500
+BACKFILL_CLAIM_SECONDS = 300   # A batch claimed this long ago by a run that hasn't finished is taken over
+TOP_CATEGORIES = 3
+
+CATEGORY_KEYWORDS = {
+    "food": ["food", "pizza", "burger", "lunch", "dinner", "breakfast", "snack", "snacks", "chai", "tea", "coffee", "restaurant",
+             "biryani", "meal", "cafe", "swiggy", "zomato", "juice", "sweets", "dosa", "ice cream"],
+    "groceries": ["grocery", "groceries", "vegetables", "fruits", "milk", "bread", "eggs", "dmart", "bigbasket", "blinkit", "zepto"],
+    "transport": ["transport", "auto", "cab", "taxi", "uber", "ola", "bus", "metro", "train", "petrol", "diesel", "fuel", "parking",
+                  "toll", "flight", "rapido"],
+    "bills": ["bill", "bills", "electricity", "rent", "recharge", "wifi", "internet", "broadband", "gas", "water", "emi", "insurance"],
+    "shopping": ["shopping", "shirt", "shoes", "clothes", "dress", "jeans", "amazon", "flipkart", "myntra", "gift", "watch", "phone"],
+    "entertainment": ["entertainment", "movie", "movies", "netflix", "spotify", "concert", "game", "games", "ticket", "party"],
+    "health": ["health", "medicine", "medicines", "doctor", "pharmacy", "hospital", "gym", "clinic", "tablets"],
+}
+_KEYWORD_CATEGORIES = {keyword: category for category, keywords in CATEGORY_KEYWORDS.items() for keyword in keywords}
+
+
+def _key(value):
+    """Normalizes an item/place name into a Mongo-safe field name."""
+    value = re.sub(r"[.$]", "", str(value or "").strip().lower())
+    return re.sub(r"\s+", " ", value) or "other"
+
+
+def categorize(item):
+    item = _key(item)
+    if item in _KEYWORD_CATEGORIES:
+        return _KEYWORD_CATEGORIES[item]
+    for word in reversed(item.split()):   # "veg pizza" -> "pizza"
+        if word in _KEYWORD_CATEGORIES:
+            return _KEYWORD_CATEGORIES[word]
+    return "other"
+
+
+def _periods(day):
+    """The (granularity, period key) rollups a local calendar day belongs to."""
+    iso_year, iso_week, _ = day.isocalendar()
+    return [("day", day.isoformat()), ("week", f"{iso_year}-W{iso_week:02d}"), ("month", day.strftime("%Y-%m"))]
+
+
+def _next_month(day):
+    return date(day.year + (day.month == 12), day.month % 12 + 1, 1)
+
+
+def split_range(start, end):
+    """
+    Covers the local dates start <= day < end with as few rollups as possible: whole months,
+    then whole ISO weeks, then single days. Returns [(granularity, period key)].
+    """
+    periods, day = [], start
+    while day < end:
+        if day.day == 1 and _next_month(day) <= end:
+            periods.append(("month", day.strftime("%Y-%m")))
+            day = _next_month(day)
+        elif day.weekday() == 0 and day + timedelta(days=7) <= end:
+            iso_year, iso_week, _ = day.isocalendar()
+            periods.append(("week", f"{iso_year}-W{iso_week:02d}"))
+            day += timedelta(days=7)
+        else:
+            periods.append(("day", day.isoformat()))
+            day += timedelta(days=1)
+    return periods
+
+
+class ExpenseAnalytics:
+    """
+    Per-user daily, weekly and monthly expense rollups, kept up to date incrementally.
+
+    Each rollup document holds the period's total and count, broken down by category, item
+    and place, and by category and item per place (so "food at dmart" can be answered). `record` applies an expense to its three rollups with $inc upserts, and a
+    summary for any date range reads the handful of rollups that cover it (see
+    `split_range`) rather than the expenses themselves.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.collection.create_index([("user_id", ASCENDING), ("granularity", ASCENDING), ("period", ASCENDING)])
+
+    @staticmethod
+    def _rollup_id(user_id, granularity, period):
+        return f"{user_id}:{granularity}:{period}"
+
+    def _increments(self, user_id, expenses):
+        """Sums expenses into {rollup_id: (user_id, granularity, period, {field: amount})}."""
+        rollups = {}
+        for expense in expenses:
+            cost = float(expense.get("cost") or 0)
+            day = parse_timestamp(expense["timestamp"]).astimezone(LOCAL_TIMEZONE).date()
+            category, item = categorize(expense.get("item")), _key(expense.get("item"))
+            fields = {
+                "total": cost, "count": 1,
+                f"by_category.{category}.total": cost,
+                f"by_category.{category}.count": 1,
+                f"by_item.{item}.total": cost,
+                f"by_item.{item}.count": 1,
+            }
+            place = expense.get("place")
+            if place and place != "N/A":
+                place = _key(place)
+                for prefix in (f"by_place.{place}", f"by_category_place.{category}.{place}", f"by_item_place.{item}.{place}"):
+                    fields[f"{prefix}.total"] = cost
+                    fields[f"{prefix}.count"] = 1
+            for granularity, period in _periods(day):
+                rollup_id = self._rollup_id(user_id, granularity, period)
+                entry = rollups.setdefault(rollup_id, (user_id, granularity, period, defaultdict(int)))
+                for field, amount in fields.items():
+                    entry[3][field] += amount
+        return rollups
+
+    def record(self, user_id, expenses, batch=None):
+        """
+        Adds expense dicts ({"cost", "item", "place", "timestamp"}) to the user's rollups.
+        With `batch` (a backfill token), a rollup that has already applied that batch is left alone.
+        """
+        operations = []
+        for rollup_id, (uid, granularity, period, increments) in self._increments(user_id, expenses).items():
+            query = {"_id": rollup_id}
+            update = {"$inc": dict(increments), "$setOnInsert": {"user_id": uid, "granularity": granularity, "period": period}}
+            if batch:
+                query["backfills"] = {"$ne": batch}
+                update["$push"] = {"backfills": batch}
+            operations.append(UpdateOne(query, update, upsert=True))
+        if not operations:
+            return
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # A rollup that already applied this batch doesn't match, so its upsert hits the existing _id.
+            if not batch or any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+
+    def summarize(self, user_id, start, end, term=None, place=None):
+        """
+        Totals the user's expenses for local dates start <= day < end, optionally narrowed to
+        `term` (a category name such as "food", otherwise an item) and/or a place.
+        Returns {"total", "count", "categories": [(name, total), ...]}.
+        """
+        ids = [self._rollup_id(user_id, granularity, period) for granularity, period in split_range(start, end)]
+        total, count, categories = 0.0, 0, defaultdict(float)
+        breakdown = "by_category" if term and _key(term) in CATEGORY_KEYWORDS else "by_item"
+        for rollup in self.collection.find({"_id": {"$in": ids}}):
+            if term and place:
+                entry = rollup.get(f"{breakdown}_place", {}).get(_key(term), {}).get(_key(place), {})
+            elif term:
+                entry = rollup.get(breakdown, {}).get(_key(term), {})
+            elif place:
+                entry = rollup.get("by_place", {}).get(_key(place), {})
+            else:
+                entry = rollup
+            total += entry.get("total", 0)
+            count += int(entry.get("count", 0))
+            for name, values in rollup.get("by_category", {}).items():
+                categories[name] += values.get("total", 0)
+        top = sorted(categories.items(), key=lambda pair: pair[1], reverse=True)[:TOP_CATEGORIES]
+        return {"total": round(total, 2), "count": count, "categories": [(name, round(value, 2)) for name, value in top if value]}
+
+    def delete_user(self, user_id):
+        return self.collection.delete_many({"user_id": user_id})
+
+    def delete_all(self):
+        return self.collection.delete_many({})
+
+    def backfill(self, expenses_collection):
+        """
+        Adds expenses not yet counted (those migrated from user documents, which carry
+        rolled_up: False) to the rollups. Returns the number of expenses added.
+
+        Each batch is claimed first by replacing the flag with a batch token, so concurrent
+        runs take different expenses. A batch left claimed by a run that died is taken over
+        with the same token, and rollups skip a token they have already applied, so no
+        expense is counted twice.
+        """
+        added = 0
+        while True:
+            token = self._claim_backfill_batch(expenses_collection)
+            if token is None:
+                return added
+            batch = list(expenses_collection.find({"rolled_up": token}))
+            by_user = defaultdict(list)
+            for expense in batch:
+                by_user[expense["user_id"]].append(expense)
+            for user_id, expenses in by_user.items():
+                self.record(user_id, expenses, batch=token)
+            expenses_collection.update_many({"rolled_up": token}, {"$unset": {"rolled_up": "", "rolled_up_claimed_at": ""}})
+            added += len(batch)
+
+    @staticmethod
+    def _claim_backfill_batch(expenses_collection):
+        """Returns the token of a newly claimed (or taken over) batch, or None when nothing is left."""
+        now = datetime.now(timezone.utc)
+        expired = now - timedelta(seconds=BACKFILL_CLAIM_SECONDS)
+        abandoned = expenses_collection.find_one({"rolled_up": {"$type": "string"}, "rolled_up_claimed_at": {"$lt": expired}},
+                                                 {"rolled_up": 1})
+        if abandoned:
+            token = abandoned["rolled_up"]
+            result = expenses_collection.update_many({"rolled_up": token, "rolled_up_claimed_at": {"$lt": expired}},
+                                                     {"$set": {"rolled_up_claimed_at": now}})
+            if result.modified_count:
+                return token
+        ids = [expense["_id"] for expense in expenses_collection.find({"rolled_up": False}, {"_id": 1}).limit(BACKFILL_BATCH_SIZE)]
+        if not ids:
+            return None
+        token = uuid.uuid4().hex
+        # Only expenses still unclaimed are taken; another run may have claimed some of these meanwhile.
+        expenses_collection.update_many({"_id": {"$in": ids}, "rolled_up": False},
+                                        {"$set": {"rolled_up": token, "rolled_up_claimed_at": now}})
+        return token
+
+
+def resolve_period(start_date=None, end_date=None, today=None):
+    """
+    Turns optional 'YYYY-MM-DD' dates (end inclusive) into a (start, end) local date range,
+    end exclusive. Defaults to the current month so far.
+    """
+    today = today or datetime.now(LOCAL_TIMEZONE).date()
+
+    def to_date(value):
+        try:
+            return datetime.strptime(str(value)[:10], "%Y-%m-%d").date() if value else None
+        except ValueError:
+            return None
+
+    start, last_day = to_date(start_date), to_date(end_date)
+    start = start or (last_day.replace(day=1) if last_day else today.replace(day=1))
+    last_day = last_day or today
+    if last_day < start:
+        start, last_day = last_day, start
+    return start, last_day + timedelta(days=1)
+
+
+def format_expense_summary(summary, start, end, term=None, place=None):
+    last_day = end - timedelta(days=1)
+    period = start.strftime('%d %b') if start == last_day else f"{start.strftime('%d %b')} – {last_day.strftime('%d %b %Y')}"
+    subject = f" on *{term}*" if term else ""
+    subject += f" at *{place.title()}*" if place else ""
+    if not summary["count"]:
+        return f"📊 No expenses{subject} logged for {period}."
+    lines = [f"📊 You spent *₹{summary['total']:,.2f}*{subject} across {summary['count']} expense(s) ({period})."]
+    if not term and not place and summary["categories"]:
+        lines.append("")
+        lines.append("Top categories:")
+        lines += [f"• {name.title()}: ₹{total:,.2f}" for name, total in summary["categories"]]
+    return "\n".join(lines)
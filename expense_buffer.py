@@ -0,0 +1,148 @@
+# expense_buffer.py
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING
+
+# --- Configuration ---
+DEFAULT_WINDOW_SECONDS = 5    # Rows a user logs within this window are written together
+LEASE_SECONDS = 120           # How long a flush may hold rows before another worker retries them
+MAX_ATTEMPTS = 5              # After this many failed flushes, rows are handed to on_failed
+RETRY_DELAY_SECONDS = 30
+POLL_INTERVAL = 5.0
+FLUSH_WORKERS = 4
+
+
+class ExpenseBuffer:
+    """
+    A write-behind buffer for expense rows bound for Google Sheets.
+
+    `add` stores a row in Mongo and returns at once. The first pending row for a user opens a
+    window of `window_seconds`; when it closes, every pending row for that user is leased and
+    passed to `flush_func(user_id, rows)` (see `start`) in a single call. Rows are deleted once the flush
+    succeeds, retried with backoff when it raises, and passed to `on_failed(user_id, rows)`
+    after MAX_ATTEMPTS. Like WebhookQueue, a row's `available_at` is either when it becomes
+    due ("pending") or the end of the current lease ("flushing"), so rows held by a process
+    that stopped are flushed again after a restart. Delivery is at-least-once.
+    """
+
+    def __init__(self, collection, window_seconds=DEFAULT_WINDOW_SECONDS):
+        self.collection = collection
+        self.flush_func = None
+        self.on_failed = None
+        self.window_seconds = window_seconds
+        self._wakeup = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=FLUSH_WORKERS, thread_name_prefix="expense-flush")
+        self._flushing = set()   # Users with a flush in progress in this process
+        self._lock = threading.Lock()
+        self.collection.create_index([("status", ASCENDING), ("available_at", ASCENDING)])
+        self.collection.create_index([("user_id", ASCENDING), ("created_at", ASCENDING)])
+
+    def add(self, user_id, row):
+        """Buffers `row` for the user's sheet. Returns the number of rows now waiting for that user."""
+        now = datetime.now(timezone.utc)
+        first_pending = self.collection.find_one({"user_id": user_id, "status": "pending"}, {"available_at": 1},
+                                                 sort=[("available_at", ASCENDING)])
+        # Join the user's open window instead of starting a new one.
+        available_at = first_pending["available_at"] if first_pending else now + timedelta(seconds=self.window_seconds)
+        self.collection.insert_one({
+            "user_id": user_id,
+            "row": row,
+            "status": "pending",
+            "attempts": 0,
+            "created_at": now,
+            "available_at": available_at
+        })
+        self._wakeup.set()
+        return self.collection.count_documents({"user_id": user_id, "status": "pending"})
+
+    def pending_count(self, user_id=None):
+        query = {"status": {"$in": ["pending", "flushing"]}}
+        if user_id:
+            query["user_id"] = user_id
+        return self.collection.count_documents(query)
+
+    def start(self, flush_func, on_failed=None):
+        """
+        Starts the flusher thread, which calls `flush_func(user_id, rows)` for each closed window.
+        Rows left over from a previous run are picked up on its first pass.
+        """
+        self.flush_func = flush_func
+        self.on_failed = on_failed
+        threading.Thread(target=self._flusher_loop, name="expense-flusher", daemon=True).start()
+        leftover = self.pending_count()
+        if leftover:
+            print(f"Expense buffer: {leftover} row(s) from a previous run will be written to Google Sheets.")
+
+    def _flusher_loop(self):
+        while True:
+            try:
+                self.flush_due()
+            except Exception as e:
+                print(f"❌ Expense buffer error: {e}")
+            self._wakeup.wait(self._seconds_until_next_due())
+            self._wakeup.clear()
+
+    def _seconds_until_next_due(self):
+        try:
+            next_row = self.collection.find_one({"status": {"$in": ["pending", "flushing"]}}, {"available_at": 1},
+                                                sort=[("available_at", ASCENDING)])
+        except Exception:
+            return POLL_INTERVAL
+        if not next_row:
+            return POLL_INTERVAL
+        available_at = next_row["available_at"]
+        if available_at.tzinfo is None:  # PyMongo returns naive UTC datetimes by default
+            available_at = available_at.replace(tzinfo=timezone.utc)
+        return min(POLL_INTERVAL, max(0.0, (available_at - datetime.now(timezone.utc)).total_seconds()))
+
+    def flush_due(self):
+        """Starts a flush for every user whose window has closed (or whose last flush's lease ran out)."""
+        now = datetime.now(timezone.utc)
+        user_ids = self.collection.distinct("user_id", {"status": {"$in": ["pending", "flushing"]}, "available_at": {"$lte": now}})
+        for user_id in user_ids:
+            with self._lock:
+                if user_id in self._flushing:
+                    continue
+                self._flushing.add(user_id)
+            self._executor.submit(self._flush_user, user_id)
+
+    def _flush_user(self, user_id):
+        try:
+            self._flush_rows(user_id)
+        except Exception as e:
+            print(f"❌ Expense flush for {user_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._flushing.discard(user_id)
+
+    def _flush_rows(self, user_id):
+        now = datetime.now(timezone.utc)
+        lease = uuid.uuid4().hex
+        # Lease every row the user has waiting, including ones logged after the window opened.
+        self.collection.update_many(
+            {"user_id": user_id, "$or": [{"status": "pending"}, {"status": "flushing", "available_at": {"$lte": now}}]},
+            {"$set": {"status": "flushing", "lease": lease, "available_at": now + timedelta(seconds=LEASE_SECONDS)},
+             "$inc": {"attempts": 1}}
+        )
+        docs = list(self.collection.find({"lease": lease}).sort("created_at", ASCENDING))
+        if not docs:
+            return
+        rows = [doc["row"] for doc in docs]
+        try:
+            self.flush_func(user_id, rows)
+        except Exception as e:
+            attempts = max(doc.get("attempts", 1) for doc in docs)
+            if attempts >= MAX_ATTEMPTS and self.on_failed:
+                print(f"❌ Giving up on {len(rows)} buffered expense(s) for {user_id}: {e}")
+                self.on_failed(user_id, rows)
+                self.collection.delete_many({"lease": lease})
+            else:
+                retry_at = datetime.now(timezone.utc) + timedelta(seconds=RETRY_DELAY_SECONDS * attempts)
+                self.collection.update_many({"lease": lease}, {"$set": {"status": "pending", "available_at": retry_at, "error": str(e)},
+                                                               "$unset": {"lease": ""}})
+                print(f"❌ Expense flush for {user_id} failed (attempt {attempts}), retrying: {e}")
+            return
+        self.collection.delete_many({"lease": lease})
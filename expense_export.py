@@ -0,0 +1,99 @@
+# expense_export.py
+"""
+Streaming expense exports.
+
+Expenses are read from the expenses collection in cursor batches and written row by row,
+with openpyxl's write-only mode for Excel or the csv module, so memory use does not grow
+with the length of a user's history. Each export goes to its own temp file in uploads/.
+"""
+import csv
+import os
+import tempfile
+
+import pytz
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+# --- Configuration ---
+EXPORT_BATCH_SIZE = 1000
+LOCAL_TIMEZONE = pytz.timezone('Asia/Kolkata')
+HEADERS = ['Date', 'Time', 'Item', 'Place', 'Cost (₹)']
+
+FORMATS = {
+    "excel": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": (".csv", "text/csv"),
+}
+
+
+def normalize_format(value):
+    """Maps a requested format ("csv", "xlsx", "Excel", None...) to "csv" or "excel"."""
+    return "csv" if str(value or "").strip().lower() == "csv" else "excel"
+
+
+def _rows(expenses):
+    for expense in expenses:
+        timestamp = expense["timestamp"]
+        if timestamp.tzinfo is None:  # PyMongo returns naive UTC datetimes by default
+            timestamp = pytz.utc.localize(timestamp)
+        timestamp = timestamp.astimezone(LOCAL_TIMEZONE)
+        yield [
+            timestamp.strftime('%Y-%m-%d'),
+            timestamp.strftime('%I:%M %p'),
+            expense.get("item"),
+            expense.get("place"),
+            expense.get("cost")
+        ]
+
+
+def _write_excel(file_path, rows):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Expenses")
+    header_cells = []
+    for header in HEADERS:
+        cell = WriteOnlyCell(sheet, value=header)
+        cell.font = Font(bold=True)
+        header_cells.append(cell)
+    sheet.append(header_cells)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(file_path)
+    return count
+
+
+def _write_csv(file_path, rows):
+    count = 0
+    # utf-8-sig so Excel shows the ₹ in the header correctly.
+    with open(file_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def export_expenses(expense_store, user_id, export_format="excel", start=None, end=None):
+    """
+    Writes the user's expenses with start <= timestamp < end to a new file.
+    Returns (file_path, mime_type, row_count), or (None, None, 0) if there is nothing to export.
+    """
+    export_format = normalize_format(export_format)
+    suffix, mime_type = FORMATS[export_format]
+    expenses = expense_store.find(user_id, start, end).batch_size(EXPORT_BATCH_SIZE)
+    fd, file_path = tempfile.mkstemp(dir="uploads", prefix="expenses_", suffix=suffix)
+    os.close(fd)
+    try:
+        writer = _write_csv if export_format == "csv" else _write_excel
+        count = writer(file_path, _rows(expenses))
+    except Exception:
+        os.remove(file_path)
+        raise
+    finally:
+        expenses.close()
+    if not count:
+        os.remove(file_path)
+        return None, None, 0
+    return file_path, mime_type, count
@@ -0,0 +1,101 @@
+# expense_store.py
+import hashlib
+from datetime import datetime, timezone
+
+import pytz
+from pymongo import ASCENDING, UpdateOne
+
+# --- Configuration ---
+LOCAL_TIMEZONE = pytz.timezone('Asia/Kolkata')   # Expenses logged without an offset are in local time
+MIGRATION_BATCH_SIZE = 500
+EXPORT_FIELDS = {"_id": 0, "timestamp": 1, "item": 1, "place": 1, "cost": 1}
+
+
+def parse_timestamp(value):
+    """Returns an aware datetime for a stored expense timestamp (a datetime or an ISO string)."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = LOCAL_TIMEZONE.localize(value)
+    return value
+
+
+class ExpenseStore:
+    """
+    Locally logged expenses, one document per expense, indexed by (user_id, timestamp).
+
+    Expenses used to be $push-ed onto an `expenses` array on the user document; that array
+    is moved here by `migrate_embedded`. Timestamps are stored as BSON dates (UTC), so
+    date ranges are index range scans.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.collection.create_index([("user_id", ASCENDING), ("timestamp", ASCENDING)])
+        self.collection.create_index("rolled_up", sparse=True)
+
+    def add(self, user_id, expenses):
+        """Stores expense dicts ({"cost", "item", "place", "timestamp"}) for a user."""
+        documents = [self._document(user_id, expense) for expense in expenses]
+        if documents:
+            self.collection.insert_many(documents)
+
+    def find(self, user_id, start=None, end=None, projection=EXPORT_FIELDS):
+        """Returns a cursor over the user's expenses with start <= timestamp < end, oldest first."""
+        query = {"user_id": user_id}
+        if start or end:
+            query["timestamp"] = {}
+            if start:
+                query["timestamp"]["$gte"] = start
+            if end:
+                query["timestamp"]["$lt"] = end
+        return self.collection.find(query, projection).sort("timestamp", ASCENDING)
+
+    def has_expenses(self, user_id):
+        return self.collection.find_one({"user_id": user_id}, {"_id": 1}) is not None
+
+    def delete_user(self, user_id):
+        return self.collection.delete_many({"user_id": user_id})
+
+    def delete_all(self):
+        return self.collection.delete_many({})
+
+    @staticmethod
+    def _document(user_id, expense):
+        return {
+            "user_id": user_id,
+            "cost": expense.get("cost"),
+            "item": expense.get("item"),
+            "place": expense.get("place") or "N/A",
+            "timestamp": parse_timestamp(expense["timestamp"]).astimezone(timezone.utc)
+        }
+
+    def migrate_embedded(self, users_collection):
+        """
+        Moves every user's embedded `expenses` array into this collection. Safe to re-run:
+        each migrated expense gets an ID derived from its user, position and contents, and an
+        array is only removed if it hasn't changed since it was copied.
+        Returns the number of expenses copied.
+        """
+        migrated = 0
+        for user in users_collection.find({"expenses": {"$exists": True}}, {"expenses": 1}):
+            user_id, expenses = user["_id"], user.get("expenses") or []
+            operations = []
+            for position, expense in enumerate(expenses):
+                try:
+                    document = self._document(user_id, expense)
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"Skipping unreadable expense {position} for {user_id}: {e}")
+                    continue
+                key = f"{user_id}:{position}:{sorted(expense.items())!r}"
+                document["_id"] = hashlib.sha1(key.encode()).hexdigest()
+                document["rolled_up"] = False   # Not yet in the analytics rollups; see ExpenseAnalytics.backfill
+                operations.append(UpdateOne({"_id": document["_id"]}, {"$setOnInsert": document}, upsert=True))
+                if len(operations) >= MIGRATION_BATCH_SIZE:
+                    self.collection.bulk_write(operations, ordered=False)
+                    operations = []
+            if operations:
+                self.collection.bulk_write(operations, ordered=False)
+            users_collection.update_one({"_id": user_id, "expenses": {"$size": len(expenses)}}, {"$unset": {"expenses": ""}})
+            migrated += len(expenses)
+        return migrated
@@ -2,7 +2,7 @@
 
 import os
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+from google_services import get_service
 from datetime import timedelta
 import json
 import io
@@ -45,7 +45,7 @@ def create_google_calendar_event(credentials, task, run_time):
     Creates an event on the user's primary Google Calendar and returns a link.
     """
     try:
-        service = build('calendar', 'v3', credentials=credentials, cache_discovery=False)
+        service = get_service('calendar', 'v3', credentials)
         
         end_time = run_time + timedelta(minutes=30)
 
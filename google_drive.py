@@ -1,14 +1,45 @@
 # google_drive.py
 
 import os
-from googleapiclient.discovery import build
+import hashlib
+import tempfile
+from google_services import get_service
 from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
 from googleapiclient.errors import HttpError
-import io
-
-# Local application imports
-from document_processor import get_text_from_file
-from grok_ai import analyze_document_context
+from werkzeug.utils import secure_filename
+from google_resources import DRIVE_FOLDER, is_not_found
+
+# The client library's default chunk (100 MB) is buffered in memory on every request.
+DRIVE_DOWNLOAD_CHUNK_BYTES = int(os.environ.get("DRIVE_DOWNLOAD_CHUNK_MB", 8)) * 1024 * 1024
+
+class _HashingWriter:
+    """File-like wrapper that hashes everything written through it."""
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha256()
+
+    def write(self, data):
+        self.digest.update(data)
+        return self.f.write(data)
+
+def download_request_to_file(request, file_name, chunk_size=DRIVE_DOWNLOAD_CHUNK_BYTES):
+    """
+    Streams a Drive media request chunk by chunk into a new, uniquely named file in uploads/.
+    Returns (file_path, sha256). Only one chunk is ever held in memory.
+    """
+    stem, ext = os.path.splitext(secure_filename(file_name) or "drive_file")
+    fd, file_path = tempfile.mkstemp(dir="uploads", prefix=f"{stem}_", suffix=ext)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            writer = _HashingWriter(f)
+            downloader = MediaIoBaseDownload(writer, request, chunksize=chunk_size)
+            done = False
+            while not done:
+                _, done = downloader.next_chunk()
+    except Exception:
+        os.remove(file_path)
+        raise
+    return file_path, writer.digest.hexdigest()
 
 def _get_or_create_folder(service):
     """Checks for the 'AI Buddy' folder and creates it if it doesn't exist."""
@@ -34,23 +65,45 @@ def _get_or_create_folder(service):
         print(f"An error occurred while checking/creating the folder: {error}")
         return None
 
-def upload_file_to_drive(credentials, file_path, original_filename, mime_type):
-    """Uploads a file to the user's Google Drive in a specific folder."""
-    try:
-        service = build('drive', 'v3', credentials=credentials)
-        
+def _get_folder_id(service, user_id, resources):
+    """Returns the 'AI Buddy' folder ID, from the user's cached resource IDs when `resources` is given."""
+    if resources is None:
+        return _get_or_create_folder(service)
+
+    def locate():
         folder_id = _get_or_create_folder(service)
-        if not folder_id:
-            return "❌ Could not create or find the 'AI Buddy' folder in your Google Drive."
+        return {"id": folder_id} if folder_id else None
 
-        file_metadata = {
-            'name': original_filename,
-            'parents': [folder_id]
-        }
-        
-        media = MediaFileUpload(file_path, mimetype=mime_type, resumable=True)
-        
-        file = service.files().create(body=file_metadata, media_body=media, fields='id, webViewLink').execute()
+    entry = resources.get(user_id, DRIVE_FOLDER, service, locate)
+    return entry["id"] if entry else None
+
+def upload_file_to_drive(credentials, file_path, original_filename, mime_type, user_id=None, resources=None):
+    """
+    Uploads a file to the user's Google Drive in a specific folder.
+    `resources` is an optional GoogleResourceCache holding the user's folder ID.
+    """
+    try:
+        service = get_service('drive', 'v3', credentials)
+
+        for attempt in range(2):
+            folder_id = _get_folder_id(service, user_id, resources)
+            if not folder_id:
+                return "❌ Could not create or find the 'AI Buddy' folder in your Google Drive."
+
+            file_metadata = {
+                'name': original_filename,
+                'parents': [folder_id]
+            }
+
+            media = MediaFileUpload(file_path, mimetype=mime_type, resumable=True)
+            try:
+                file = service.files().create(body=file_metadata, media_body=media, fields='id, webViewLink').execute()
+                break
+            except HttpError as error:
+                # The cached folder was deleted: forget it and find or recreate it once.
+                if resources is None or attempt or not is_not_found(error):
+                    raise
+                resources.invalidate(user_id, DRIVE_FOLDER)
         
         file_link = file.get('webViewLink')
         return f"✅ File uploaded successfully to your 'AI Buddy' folder!\n\n🔗 View File: {file_link}"
@@ -65,7 +118,7 @@ def upload_file_to_drive(credentials, file_path, original_filename, mime_type):
 def search_files_in_drive(credentials, search_query):
     """Searches for files in the user's Google Drive."""
     try:
-        service = build('drive', 'v3', credentials=credentials)
+        service = get_service('drive', 'v3', credentials)
         
         query = f"name contains '{search_query}' and trashed=false"
         
@@ -91,16 +144,16 @@ def search_files_in_drive(credentials, search_query):
         return "❌ An unexpected error occurred while searching for files."
 
 def download_file_from_drive(credentials, file_name):
-    """Finds a file by name and downloads its content."""
+    """Finds a file by name and downloads it. Returns (file_path, mime_type, sha256, error)."""
     try:
-        service = build('drive', 'v3', credentials=credentials)
+        service = get_service('drive', 'v3', credentials)
         
         query = f"name = '{file_name}' and trashed=false"
         response = service.files().list(q=query, spaces='drive', fields='files(id, name, mimeType)', pageSize=1).execute()
         files = response.get('files', [])
 
         if not files:
-            return None, None, f"😕 Couldn't find a file named '*{file_name}*'. Please check the name and try again."
+            return None, None, None, f"😕 Couldn't find a file named '*{file_name}*'. Please check the name and try again."
 
         file_info = files[0]
         file_id = file_info.get('id')
@@ -116,31 +169,21 @@ def download_file_from_drive(credentials, file_name):
             request = service.files().get_media(fileId=file_id)
             final_mime_type = original_mime_type
 
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while done is False:
-            status, done = downloader.next_chunk()
-        
-        fh.seek(0)
-        
-        # Save to a temporary local file to be processed
-        temp_file_path = os.path.join("uploads", file_name)
-        with open(temp_file_path, "wb") as f:
-            f.write(fh.read())
+        # Written straight to disk; text extraction then reads from the file (PyMuPDF loads pages on demand).
+        temp_file_path, file_hash = download_request_to_file(request, file_name)
 
-        return temp_file_path, final_mime_type, None # No error
+        return temp_file_path, final_mime_type, file_hash, None # No error
 
     except HttpError as error:
         print(f"An HTTP error occurred during file download: {error}")
-        return None, None, "❌ Failed to download the file due to an API error."
+        return None, None, None, "❌ Failed to download the file due to an API error."
     except Exception as e:
         print(f"An unexpected error occurred during file download: {e}")
-        return None, None, "❌ An unexpected error occurred while accessing the file."
+        return None, None, None, "❌ An unexpected error occurred while accessing the file."
 
-def analyze_drive_file_content(credentials, file_name):
+def analyze_drive_file_content(credentials, file_name, document_store):
     """Orchestrates downloading, processing, and analyzing a file from Drive."""
-    downloaded_path, mime_type, error = download_file_from_drive(credentials, file_name)
+    downloaded_path, mime_type, file_hash, error = download_file_from_drive(credentials, file_name)
     if error:
         return {"error": error}
         
@@ -148,20 +191,8 @@ def analyze_drive_file_content(credentials, file_name):
         if not downloaded_path:
             return {"error": "Failed to save the downloaded file locally."}
 
-        extracted_text = get_text_from_file(downloaded_path, mime_type)
-        if not extracted_text:
-            return {"error": "❌ I couldn't find any readable text in that file."}
-
-        analysis = analyze_document_context(extracted_text)
-        if not analysis:
-            return {"error": "🤔 I analyzed the document, but I'm not sure what to do with it."}
-            
-        return {
-            "document_text": extracted_text,
-            "doc_type": analysis.get("doc_type"),
-            "data": analysis.get("data", {}),
-            "error": None
-        }
+        # Extraction and analysis are skipped if this exact file was processed before.
+        return document_store.ingest_file(downloaded_path, mime_type, document_id=file_hash)
     finally:
         # Clean up the temporary file
         if downloaded_path and os.path.exists(downloaded_path):
@@ -0,0 +1,133 @@
+# google_resources.py
+import hashlib
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from googleapiclient.errors import HttpError
+from pymongo.errors import DuplicateKeyError
+
+# --- Configuration ---
+REVALIDATE_AFTER = timedelta(hours=int(os.environ.get("GOOGLE_RESOURCE_REVALIDATE_HOURS", 24)))
+LOCK_TTL = timedelta(seconds=30)   # A lock left behind by a crashed process is taken over after this
+LOCK_WAIT_SECONDS = 20
+LOCK_POLL_SECONDS = 0.25
+LOCAL_LOCK_STRIPES = 64
+
+# Resource names, stored under users.google_resources.<name>
+DRIVE_FOLDER = "drive_folder"
+EXPENSE_SHEET = "expense_sheet"
+
+
+def is_not_found(error):
+    return isinstance(error, HttpError) and error.resp.status == 404
+
+
+class GoogleResourceCache:
+    """
+    Remembers the IDs of the Drive folder and spreadsheet AI Buddy keeps in each user's account.
+
+    The first lookup searches Drive (creating the resource if it is missing) and stores
+    {"id", "url", "verified_at"} on the user record; later lookups are a Mongo read. Cached IDs
+    are re-checked with a single files().get once they are older than REVALIDATE_AFTER, and
+    callers invalidate them when an API call using them returns 404.
+
+    Search-then-create runs under a per-user lock, held both in-process and in Mongo (so other
+    workers wait too), so concurrent requests can't create duplicate folders or sheets.
+    """
+
+    def __init__(self, users_collection, locks_collection):
+        self.users = users_collection
+        self.locks = locks_collection
+        self.locks.create_index("expires_at", expireAfterSeconds=0)
+        self._local_locks = [threading.Lock() for _ in range(LOCAL_LOCK_STRIPES)]
+
+    def get(self, user_id, name, drive_service, locate):
+        """
+        Returns the cached {"id", "url"} entry for `name`, or calls `locate()` (which searches
+        for or creates the resource and returns such a dict, or None) and caches its result.
+        """
+        entry = self._cached(user_id, name)
+        if entry and self._still_valid(user_id, name, entry, drive_service):
+            return entry
+
+        key = f"{user_id}:{name}"
+        stripe = int(hashlib.md5(key.encode()).hexdigest(), 16) % LOCAL_LOCK_STRIPES
+        with self._local_locks[stripe]:
+            token = self._acquire(key)
+            try:
+                # Whoever held the lock before us may have just found or created it.
+                entry = self._cached(user_id, name)
+                if entry and not self._is_stale(entry):
+                    return entry
+                entry = locate()
+                if entry and entry.get("id"):
+                    self._store(user_id, name, entry)
+                return entry
+            finally:
+                if token:
+                    self.locks.delete_one({"_id": key, "token": token})
+
+    def peek(self, user_id, name):
+        """Returns the cached entry for `name` without checking it is still valid, or None."""
+        return self._cached(user_id, name)
+
+    def invalidate(self, user_id, name):
+        self.users.update_one({"_id": user_id}, {"$unset": {f"google_resources.{name}": ""}})
+
+    def clear(self, user_id):
+        """Forgets every cached resource, e.g. when a different Google account is connected."""
+        self.users.update_one({"_id": user_id}, {"$unset": {"google_resources": ""}})
+
+    def _cached(self, user_id, name):
+        user = self.users.find_one({"_id": user_id}, {f"google_resources.{name}": 1})
+        return ((user or {}).get("google_resources") or {}).get(name)
+
+    def _store(self, user_id, name, entry):
+        value = {"id": entry["id"], "url": entry.get("url"), "verified_at": datetime.now(timezone.utc)}
+        self.users.update_one({"_id": user_id}, {"$set": {f"google_resources.{name}": value}})
+        entry.update(value)
+
+    @staticmethod
+    def _is_stale(entry):
+        verified_at = entry.get("verified_at")
+        if verified_at is None:
+            return True
+        if verified_at.tzinfo is None:  # PyMongo returns naive UTC datetimes by default
+            verified_at = verified_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - verified_at > REVALIDATE_AFTER
+
+    def _still_valid(self, user_id, name, entry, drive_service):
+        if not self._is_stale(entry):
+            return True
+        try:
+            file = drive_service.files().get(fileId=entry["id"], fields="id, trashed, webViewLink").execute()
+        except HttpError as error:
+            if is_not_found(error):
+                self.invalidate(user_id, name)
+                return False
+            raise
+        if file.get("trashed"):
+            self.invalidate(user_id, name)
+            return False
+        self._store(user_id, name, {"id": entry["id"], "url": file.get("webViewLink") or entry.get("url")})
+        return True
+
+    def _acquire(self, key):
+        """Takes the Mongo lock for `key`. Returns its token, or None if it couldn't be had in time."""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        while True:
+            now = datetime.now(timezone.utc)
+            try:
+                self.locks.insert_one({"_id": key, "token": token, "expires_at": now + LOCK_TTL})
+                return token
+            except DuplicateKeyError:
+                # Take over a lock whose holder died without releasing it (the TTL monitor only runs once a minute).
+                self.locks.delete_one({"_id": key, "expires_at": {"$lt": now}})
+            if time.monotonic() >= deadline:
+                print(f"Timed out waiting for the Google resource lock {key}; continuing without it")
+                return None
+            time.sleep(LOCK_POLL_SECONDS)
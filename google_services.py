@@ -0,0 +1,97 @@
+# google_services.py
+"""
+Shared factory for Google API clients.
+
+Discovery documents are read once from the copies bundled with google-api-python-client
+instead of being fetched and parsed on every call. Built service objects are cached per
+thread, keyed by API, version and credential identity (least recently used evicted first),
+and each thread has its own HTTP connection, since httplib2 is not thread-safe.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import Counter, OrderedDict
+
+import google_auth_httplib2
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.http import build_http
+
+# --- Configuration ---
+SERVICE_CACHE_SIZE = int(os.environ.get("GOOGLE_SERVICE_CACHE_SIZE", 32))  # Service objects per thread
+
+_discovery_docs = {}
+_discovery_lock = threading.Lock()
+_local = threading.local()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _record(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def _discovery_doc(name, version):
+    """Returns the parsed discovery document for an API, or None if no static copy is bundled."""
+    key = (name, version)
+    with _discovery_lock:
+        if key not in _discovery_docs:
+            doc = discovery_cache.get_static_doc(name, version)
+            _discovery_docs[key] = json.loads(doc) if doc else None
+        return _discovery_docs[key]
+
+
+def credential_identity(credentials):
+    """A stable key for the Google account behind `credentials`, without keeping the secret itself."""
+    secret = getattr(credentials, "refresh_token", None) or getattr(credentials, "token", None) or str(id(credentials))
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+def _thread_state():
+    if not hasattr(_local, "services"):
+        _local.http = build_http()
+        _local.services = OrderedDict()
+    return _local
+
+
+def get_service(name, version, credentials):
+    """
+    Returns a Google API client for `name`/`version` authorized with `credentials`.
+
+    The client may be reused from an earlier call on this thread for the same account; it is
+    re-pointed at `credentials` so refreshed tokens are always used. Clients must not be
+    passed to other threads.
+    """
+    state = _thread_state()
+    key = (name, version, credential_identity(credentials))
+    cached = state.services.get(key)
+    if cached is not None:
+        state.services.move_to_end(key)
+        service, http = cached
+        http.credentials = credentials
+        _record("hits")
+        return service
+
+    http = google_auth_httplib2.AuthorizedHttp(credentials, http=state.http)
+    doc = _discovery_doc(name, version)
+    if doc is not None:
+        service = build_from_document(doc, http=http)
+    else:
+        _record("discovery_fetches")
+        service = build(name, version, http=http, cache_discovery=False, static_discovery=False)
+    state.services[key] = (service, http)
+    while len(state.services) > SERVICE_CACHE_SIZE:
+        state.services.popitem(last=False)
+        _record("evictions")
+    _record("misses")
+    return service
+
+
+def get_service_metrics():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    stats["hit_ratio"] = round(stats.get("hits", 0) / lookups, 3) if lookups else None
+    return stats
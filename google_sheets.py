@@ -1,11 +1,22 @@
 # google_sheets.py
 
-from googleapiclient.discovery import build
+from google_services import get_service
 from googleapiclient.errors import HttpError
+from google_resources import EXPENSE_SHEET, is_not_found
 import logging
 
 logger = logging.getLogger(__name__)
 
+SPREADSHEET_QUERY = "mimeType='application/vnd.google-apps.spreadsheet' and name='AI Buddy Expenses' and trashed=false"
+
+def _find_spreadsheet(drive_service):
+    """Searches Drive for the 'AI Buddy Expenses' spreadsheet and returns its ID and URL."""
+    response = drive_service.files().list(q=SPREADSHEET_QUERY, spaces='drive', fields='files(id, name, webViewLink)').execute()
+    files = response.get('files', [])
+    if files:
+        return files[0].get('id'), files[0].get('webViewLink')
+    return None, None
+
 def _get_or_create_spreadsheet(drive_service, sheets_service):
     """
     Checks if the 'AI Buddy Expenses' spreadsheet exists, creates it if not,
@@ -13,14 +24,10 @@ def _get_or_create_spreadsheet(drive_service, sheets_service):
     """
     try:
         # 1. Use Drive service to search for the spreadsheet
-        query = "mimeType='application/vnd.google-apps.spreadsheet' and name='AI Buddy Expenses' and trashed=false"
-        response = drive_service.files().list(q=query, spaces='drive', fields='files(id, name, webViewLink)').execute()
-        files = response.get('files', [])
+        sheet_id, sheet_url = _find_spreadsheet(drive_service)
 
-        if files:
+        if sheet_id:
             # File exists, return its info
-            sheet_id = files[0].get('id')
-            sheet_url = files[0].get('webViewLink')
             return sheet_id, sheet_url
         else:
             # 2. File does not exist, use Sheets service to create it
@@ -51,72 +58,71 @@ def _get_or_create_spreadsheet(drive_service, sheets_service):
         logger.error(f"An unexpected error occurred in _get_or_create_spreadsheet: {e}")
         return None, None
 
-def append_expense_to_sheet(credentials, user_id, expense_data):
+def _get_spreadsheet(drive_service, sheets_service, user_id, resources, create=True):
     """
-    Appends a new row of expense data to the user's 'AI Buddy Expenses' sheet.
-    
-    Args:
-        credentials: The user's Google API credentials.
-        user_id: The unique identifier for the user.
-        expense_data (dict): A dictionary containing the expense details.
-                             Expected keys: 'timestamp', 'item', 'place', 'cost'.
-    
-    Returns:
-        A confirmation message string.
+    Returns the spreadsheet's ID and URL, from the user's cached resource IDs when `resources`
+    (a GoogleResourceCache) is given, otherwise by searching Drive.
     """
-    try:
-        drive_service = build('drive', 'v3', credentials=credentials)
-        sheets_service = build('sheets', 'v4', credentials=credentials)
+    locate_spreadsheet = (lambda: _get_or_create_spreadsheet(drive_service, sheets_service)) if create else (lambda: _find_spreadsheet(drive_service))
+    if resources is None:
+        return locate_spreadsheet()
 
-        spreadsheet_id, spreadsheet_url = _get_or_create_spreadsheet(drive_service, sheets_service)
+    def locate():
+        sheet_id, sheet_url = locate_spreadsheet()
+        return {"id": sheet_id, "url": sheet_url} if sheet_id else None
 
-        if not spreadsheet_id:
-            return "❌ Could not find or create your expense sheet in Google Drive."
-
-        # Format the data for the new row
-        new_row = [
-            expense_data['timestamp'].strftime('%Y-%m-%d'),
-            expense_data['timestamp'].strftime('%I:%M %p'),
-            expense_data['item'].title(),
-            expense_data['place'].title() if expense_data.get('place') else 'N/A',
-            f"{expense_data['cost']:.2f}"
-        ]
-        
-        body = {'values': [new_row]}
-        
-        sheets_service.spreadsheets().values().append(
-            spreadsheetId=spreadsheet_id,
-            range='A1',
-            valueInputOption='USER_ENTERED',
-            insertDataOption='INSERT_ROWS',
-            body=body
-        ).execute()
-
-        confirmation = (
-            f"✅ Logged: *₹{expense_data['cost']:.2f}* for *{expense_data['item'].title()}* to your Google Sheet.\n\n"
-            f"🔗 View Sheet: {spreadsheet_url}"
-        )
-        return confirmation
+    entry = resources.get(user_id, EXPENSE_SHEET, drive_service, locate)
+    return (entry["id"], entry.get("url")) if entry else (None, None)
 
-    except HttpError as error:
-        logger.error(f"An HTTP error occurred while appending to the sheet: {error}")
-        return "❌ Failed to log expense to Google Sheets due to an API error."
-    except Exception as e:
-        logger.error(f"An unexpected error occurred during sheet append: {e}")
-        return "❌ An unexpected error occurred while logging your expense."
+def _expense_row(expense_data):
+    return [
+        expense_data['timestamp'].strftime('%Y-%m-%d'),
+        expense_data['timestamp'].strftime('%I:%M %p'),
+        expense_data['item'].title(),
+        expense_data['place'].title() if expense_data.get('place') else 'N/A',
+        f"{expense_data['cost']:.2f}"
+    ]
+
+def append_expenses_to_sheet(credentials, user_id, expenses, resources=None):
+    """
+    Appends several expenses to the user's 'AI Buddy Expenses' sheet in a single request.
+
+    Raises on failure (HttpError, or RuntimeError if the sheet can't be found or created),
+    so callers such as the expense buffer can retry.
+    Returns the spreadsheet URL.
+    """
+    drive_service = get_service('drive', 'v3', credentials)
+    sheets_service = get_service('sheets', 'v4', credentials)
+    body = {'values': [_expense_row(expense) for expense in expenses]}
+
+    for attempt in range(2):
+        spreadsheet_id, spreadsheet_url = _get_spreadsheet(drive_service, sheets_service, user_id, resources)
+        if not spreadsheet_id:
+            raise RuntimeError("Could not find or create the expense sheet")
+        try:
+            sheets_service.spreadsheets().values().append(
+                spreadsheetId=spreadsheet_id,
+                range='A1',
+                valueInputOption='USER_ENTERED',
+                insertDataOption='INSERT_ROWS',
+                body=body
+            ).execute()
+            return spreadsheet_url
+        except HttpError as error:
+            # The cached sheet was deleted: forget it and find or recreate it once.
+            if resources is None or attempt or not is_not_found(error):
+                raise
+            resources.invalidate(user_id, EXPENSE_SHEET)
 
-def get_sheet_link(credentials, user_id):
+def get_sheet_link(credentials, user_id, resources=None):
     """
     Gets the link to the 'AI Buddy Expenses' spreadsheet without adding data.
     """
     try:
-        drive_service = build('drive', 'v3', credentials=credentials)
-        query = "mimeType='application/vnd.google-apps.spreadsheet' and name='AI Buddy Expenses' and trashed=false"
-        response = drive_service.files().list(q=query, spaces='drive', fields='files(id, name, webViewLink)').execute()
-        files = response.get('files', [])
+        drive_service = get_service('drive', 'v3', credentials)
+        spreadsheet_id, spreadsheet_url = _get_spreadsheet(drive_service, None, user_id, resources, create=False)
 
-        if files:
-            spreadsheet_url = files[0].get('webViewLink')
+        if spreadsheet_id:
             return f"📊 Here is the link to your expense sheet:\n\n🔗 {spreadsheet_url}"
         else:
             return "😕 I couldn't find your expense sheet. Try logging an expense first to create it."
@@ -1,48 +1,116 @@
 # grok_ai.py
-import requests
 import os
 import json
+import threading
 from datetime import datetime
 
+from grok_client import GrokClient, CircuitBreaker
+from intent_classifier import classify_intent_locally
+from response_cache import ResponseCache
+
 # --- Configuration ---
 GROK_API_KEY = os.environ.get("GROK_API_KEY")
 GROK_URL = "https://api.groq.com/openai/v1/chat/completions"
 GROK_MODEL_FAST = "llama-3.1-8b-instant"
 GROK_MODEL_SMART = "llama-3.3-70b-versatile"
-GROK_HEADERS = {
-    "Authorization": f"Bearer {GROK_API_KEY}",
-    "Content-Type": "application/json"
-}
+GROK_POOL_SIZE = int(os.environ.get("GROK_POOL_SIZE", 10))
+GROK_MAX_RETRIES = int(os.environ.get("GROK_MAX_RETRIES", 3))
+STREAM_CHUNK_CHARS = 700  # Roughly one comfortable WhatsApp message
+# Intents whose entities are resolved against the current time, so their results must not be reused.
+TIME_RELATIVE_INTENTS = {"set_reminder", "log_expense", "schedule_meeting", "export_expenses", "get_expense_summary"}
+
+# --- Shared client, used by every function below ---
+grok_client = GrokClient(
+    GROK_API_KEY,
+    GROK_URL,
+    pool_size=GROK_POOL_SIZE,
+    max_retries=GROK_MAX_RETRIES,
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get("GROK_BREAKER_THRESHOLD", 5)),
+        reset_timeout=int(os.environ.get("GROK_BREAKER_RESET_SECONDS", 30))
+    )
+)
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+def _record_grok_metrics(payload, info):
+    """Response hook: aggregates call counts, errors, retries, latency and tokens per model."""
+    with _metrics_lock:
+        stats = _metrics.setdefault(info.get("model") or "unknown", {"calls": 0, "errors": 0, "retries": 0, "total_latency": 0.0, "total_tokens": 0})
+        stats["calls"] += 1
+        stats["retries"] += max(0, (info.get("attempts") or 1) - 1)
+        stats["total_latency"] += info.get("latency") or 0.0
+        if info.get("error"):
+            stats["errors"] += 1
+        if info.get("usage"):
+            stats["total_tokens"] += info["usage"].get("total_tokens", 0)
+
+grok_client.add_response_hook(_record_grok_metrics)
+
+# --- RESPONSE CACHE ---
+response_cache = ResponseCache()
+grok_client.add_response_hook(lambda payload, info: response_cache.record_call(not info.get("error")))
+
+def configure_response_cache(collection):
+    """Backs the in-memory response cache with a Mongo collection shared by all workers."""
+    response_cache.configure(collection)
+
+def _normalized_lower(*args):
+    return " ".join(" ".join(args).lower().split()).rstrip("?!. ")
+
+def _weather_cache_key(weather_data, location):
+    # Readings are rounded so near-identical weather in the same city shares one summary.
+    main = weather_data.get('main', {})
+    return "|".join(str(part) for part in (
+        location.strip().lower(),
+        weather_data.get('weather', [{}])[0].get('description', 'N/A'),
+        round(main.get('temp', 0)),
+        round(main.get('feels_like', 0)),
+        main.get('humidity', 0) // 10,
+        round(weather_data.get('wind', {}).get('speed', 0))
+    ))
+
+def get_grok_metrics():
+    with _metrics_lock:
+        models = {
+            model: dict(stats, avg_latency=round(stats["total_latency"] / stats["calls"], 3) if stats["calls"] else 0.0)
+            for model, stats in _metrics.items()
+        }
+    return {"circuit_breaker": grok_client.breaker.state, "models": models, "response_cache": response_cache.get_stats()}
 
 
-# --- UNIFIED DAILY BRIEFING GENERATOR ---
-def generate_full_daily_briefing(user_name, festival_name, quote, author, history_events, weather_data):
+# --- DAILY BRIEFING GENERATORS ---
+# The briefing is generated in two kinds of calls: the shared sections once per day, and the
+# weather text once per city. Personalizing with the user's name is done locally in briefing.py.
+def generate_briefing_shared_sections(festival_name, quote, author, history_events):
     """
-    Uses a single, powerful AI call to generate all components of the daily briefing,
-    including a culturally-aware greeting.
+    Generates the parts of the daily briefing that are the same for every user:
+    a greeting (without the user's name), the quote explanation and the history summary.
+    Returns None if the Grok call fails, so the caller can retry rather than cache a placeholder.
     """
+    fallback = {
+        "greeting": "☀️ Good Morning",
+        "quote_explanation": "Have a great day!",
+        "detailed_history": "No historical fact found for today."
+    }
     if not GROK_API_KEY:
-        return {
-            "greeting": f"☀️ Good Morning, {user_name}!",
-            "quote_explanation": "Have a great day!",
-            "detailed_history": "No historical fact found for today.",
-            "detailed_weather": "Weather data is currently unavailable."
-        }
+        return fallback
 
     history_texts = [event.get("text", "") for event in history_events]
-    
+
     prompt = f"""
     You are an expert AI assistant with a deep understanding of Indian culture. Your persona is that of a helpful Indian friend creating an engaging daily briefing.
-    Today's date is {datetime.now().strftime('%A, %B %d, %Y')}. The user's name is {user_name}.
+    Today's date is {datetime.now().strftime('%A, %B %d, %Y')}.
 
-    You must generate four distinct pieces of content based on the data provided below and return them in a single JSON object with the keys: "greeting", "quote_explanation", "detailed_history", and "detailed_weather".
+    You must generate three distinct pieces of content based on the data provided below and return them in a single JSON object with the keys: "greeting", "quote_explanation", and "detailed_history".
 
     1.  **Greeting Generation:**
         -   Today's known festival is: "{festival_name if festival_name else 'None'}".
-        -   Task: Create a cheerful morning greeting.
+        -   Task: Create a short, cheerful morning greeting WITHOUT any name and without trailing punctuation. The user's name will be appended after a comma.
         -   **Strict Rules:** If a festival_name is provided (e.g., "Raksha Bandhan"), you MUST generate a festive greeting for it. If festival_name is "None", you MUST generate a standard "Good Morning" greeting.
-        -   Example (if festival is "Raksha Bandhan"): "Happy Raksha Bandhan, {user_name}!"
-        -   Example (if festival is "None"): "☀️ Good Morning, {user_name}!"
+        -   Example (if festival is "Raksha Bandhan"): "🪢 Happy Raksha Bandhan"
+        -   Example (if festival is "None"): "☀️ Good Morning"
 
     2.  **Quote Analysis:**
         -   Quote: "{quote}" by {author}
@@ -52,10 +120,6 @@ def generate_full_daily_briefing(user_name, festival_name, quote, author, histor
         -   Events: {json.dumps(history_texts)}
         -   Task: Pick the most interesting event from the list and write an engaging 2-3 sentence summary about it.
 
-    4.  **Weather Forecast:**
-        -   Weather Data: {json.dumps(weather_data)}
-        -   Task: Write a friendly, detailed weather forecast for Vijayawada. Mention temperature, conditions, and a helpful suggestion.
-
     Return only the JSON object.
     """
 
@@ -66,22 +130,55 @@ def generate_full_daily_briefing(user_name, festival_name, quote, author, histor
         "response_format": {"type": "json_object"}
     }
     try:
-        response = requests.post(GROK_URL, headers=GROK_HEADERS, json=payload, timeout=45)
-        response.raise_for_status()
-        result_text = response.json()["choices"][0]["message"]["content"]
-        return json.loads(result_text)
+        content = grok_client.chat(**payload, timeout=45)
+        result = json.loads(content)
+        return {key: result.get(key) or value for key, value in fallback.items()}
     except Exception as e:
-        print(f"Grok unified briefing error: {e}")
-        return {
-            "greeting": f"☀️ Good Morning, {user_name}!",
-            "quote_explanation": "Could not generate explanation.",
-            "detailed_history": "Could not generate historical fact.",
-            "detailed_weather": "Could not generate weather forecast."
-        }
+        print(f"Grok briefing sections error: {e}")
+        return None
+
+
+def generate_city_weather_forecast(city, weather_data):
+    """
+    Writes the briefing's weather forecast for one city; shared by every user in that city.
+    Returns None if the Grok call fails.
+    """
+    if not weather_data:
+        return "Weather data is currently unavailable."
+    if not GROK_API_KEY:
+        temp = weather_data.get('main', {}).get('temp', 'N/A')
+        condition = weather_data.get('weather', [{}])[0].get('description', 'N/A')
+        return f"It's currently {temp}°C with {condition} in {city}."
+
+    prompt = f"""
+    You are a friendly weather reporter writing one part of a morning briefing.
+    Weather Data: {json.dumps(weather_data)}
+    Task: Write a friendly, detailed weather forecast for {city} in 2-3 sentences. Mention temperature, conditions, and a helpful suggestion. Do not greet the reader or use their name.
+    """
+
+    payload = {
+        "model": GROK_MODEL_FAST,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.7
+    }
+    try:
+        content = grok_client.chat(**payload, timeout=20)
+        return content.strip()
+    except Exception as e:
+        print(f"Grok briefing weather error for {city}: {e}")
+        return None
 
 
 # --- PRIMARY INTENT ROUTER ---
 def route_user_intent(text):
+    # Common, unambiguous phrasings are classified locally; only the rest costs an LLM call.
+    local_result = classify_intent_locally(text)
+    if local_result:
+        return local_result
+    return _route_user_intent_with_grok(text)
+
+@response_cache.cached("route_user_intent", key_func=_normalized_lower, should_cache=lambda result: result.get("intent") not in TIME_RELATIVE_INTENTS)
+def _route_user_intent_with_grok(text):
     if not GROK_API_KEY:
         return {"intent": "general_query", "entities": {}}
 
@@ -134,7 +231,15 @@ def route_user_intent(text):
         - Triggered by requests to summarize, analyze, or ask questions about a specific file in Google Drive.
         - "entities": {{"filename": "The exact or partial filename to analyze."}}
 
-    12. "general_query":
+    12. "export_expenses":
+        - Triggered by requests to export, download, or get a file/report of the user's logged expenses.
+        - "entities": {{"start_date": "YYYY-MM-DD or null", "end_date": "YYYY-MM-DD or null (inclusive)", "format": "csv" or "excel" (default "excel")}}
+
+    13. "get_expense_summary":
+        - Triggered by questions about how much the user has spent, e.g. "how much did I spend on food this month?" or "my expenses last week".
+        - "entities": {{"category": "category or item asked about, e.g. 'food', 'petrol', or null", "place": "store_name_or_null", "start_date": "YYYY-MM-DD or null", "end_date": "YYYY-MM-DD or null (inclusive)"}}
+
+    14. "general_query":
         - This is the default intent for any other general question or command.
         - "entities": {{}}
 
@@ -151,15 +256,15 @@ def route_user_intent(text):
         "response_format": {"type": "json_object"}
     }
     try:
-        response = requests.post(GROK_URL, headers=GROK_HEADERS, json=payload, timeout=45)
-        response.raise_for_status()
-        result_text = response.json()["choices"][0]["message"]["content"]
-        return json.loads(result_text)
+        content = grok_client.chat(**payload, timeout=45)
+        return json.loads(content)
     except Exception as e:
         print(f"Grok intent routing error: {e}")
+        response_cache.record_failure()
         return {"intent": "general_query", "entities": {}}
 
 # --- NEW WEATHER SUMMARY FUNCTION ---
+@response_cache.cached("generate_weather_summary", ttl=30 * 60, key_func=_weather_cache_key)
 def generate_weather_summary(weather_data, location):
     """
     Uses AI to create a conversational weather summary from raw API data.
@@ -188,12 +293,11 @@ def generate_weather_summary(weather_data, location):
         "temperature": 0.7
     }
     try:
-        response = requests.post(GROK_URL, headers=GROK_HEADERS, json=payload, timeout=20)
-        response.raise_for_status()
-        summary = response.json()["choices"][0]["message"]["content"].strip()
-        return summary
+        content = grok_client.chat(**payload, timeout=20)
+        return content.strip()
     except Exception as e:
         print(f"Grok weather summary error: {e}")
+        response_cache.record_failure()
         return "⚠️ Sorry, I couldn't generate a detailed weather summary right now."
 
 
@@ -203,21 +307,20 @@ def analyze_document_context(text):
     prompt = f"""You are an expert document analysis AI. Read the following text and determine its type and extract key information. Your response MUST be a JSON object with two keys: "doc_type" and "data". Possible "doc_type" values are: "resume", "project_plan", "meeting_invite", "q_and_a", "generic_document". The "data" key should be an empty object `{{}}` unless it's a "meeting_invite", in which case it should be `{{"task": "description of event", "timestamp": "YYYY-MM-DD HH:MM:SS"}}`. The current date is {datetime.now().strftime('%Y-%m-%d %A')}. Here is the text to analyze: --- {text} --- Return only the JSON object."""
     payload = { "model": GROK_MODEL_SMART, "messages": [{"role": "user", "content": prompt}], "temperature": 0.1, "response_format": {"type": "json_object"} }
     try:
-        response = requests.post(GROK_URL, headers=GROK_HEADERS, json=payload, timeout=45)
-        response.raise_for_status()
-        return json.loads(response.json()["choices"][0]["message"]["content"])
+        content = grok_client.chat(**payload, timeout=45)
+        return json.loads(content)
     except Exception as e:
         print(f"Grok document context analysis error: {e}")
         return None
 
-def get_contextual_ai_response(document_text, question):
+def get_contextual_ai_response(document_excerpts, question):
+    """Answers a question from the parts of a document retrieved for it (see DocumentIndex.context_for)."""
     if not GROK_API_KEY: return "❌ The Grok API key is not configured."
-    prompt = f"""You are an AI assistant with a document's content loaded into your memory. A user is now asking a question about this document. Your task is to answer their question based *only* on the information provided in the document text. Here is the full text of the document: --- DOCUMENT START --- {document_text} --- DOCUMENT END --- Here is the user's question: "{question}". Provide a direct and helpful answer. If the answer cannot be found in the document, say "I couldn't find the answer to that in the document." """
+    prompt = f"""You are an AI assistant with a document's content loaded into your memory. A user is now asking a question about this document. Your task is to answer their question based *only* on the information provided in the document text. Here are the parts of the document relevant to the question (long documents are shown as numbered excerpts): --- DOCUMENT START --- {document_excerpts} --- DOCUMENT END --- Here is the user's question: "{question}". Provide a direct and helpful answer. If the answer cannot be found in the document, say "I couldn't find the answer to that in the document." """
     payload = { "model": GROK_MODEL_SMART, "messages": [{"role": "user", "content": prompt}], "temperature": 0.3 }
     try:
-        response = requests.post(GROK_URL, headers=GROK_HEADERS, json=payload, timeout=60)
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"].strip()
+        content = grok_client.chat(**payload, timeout=60)
+        return content.strip()
     except Exception as e:
         print(f"Grok contextual response error: {e}")
         return "⚠️ Sorry, I had trouble answering that question."
@@ -230,9 +333,8 @@ def is_document_followup_question(text):
     prompt = f"""A user has previously uploaded a document and is in a follow-up conversation. Their new message is: "{text}". Is this message a question or command related to the document (e.g., "summarize it", "what are the key points?")? Or is it a completely new, unrelated command? Respond with only the word "yes" if it is a follow-up, or "no" if it is a new command."""
     payload = { "model": GROK_MODEL_FAST, "messages": [{"role": "user", "content": prompt}], "temperature": 0.0, "max_tokens": 5 }
     try:
-        response = requests.post(GROK_URL, headers=GROK_HEADERS, json=payload, timeout=10)
-        response.raise_for_status()
-        return "yes" in response.json()["choices"][0]["message"]["content"].strip().lower()
+        content = grok_client.chat(**payload, timeout=10)
+        return "yes" in content.strip().lower()
     except Exception as e:
         print(f"Grok context check error: {e}")
         return True
@@ -241,36 +343,70 @@ def ai_reply(prompt):
     if not GROK_API_KEY: return "❌ The Grok API key is not configured. This feature is disabled."
     payload = { "model": GROK_MODEL_SMART, "messages": [{"role": "user", "content": prompt}], "temperature": 0.7 }
     try:
-        res = requests.post(GROK_URL, headers=GROK_HEADERS, json=payload, timeout=20)
-        res.raise_for_status()
-        return res.json()["choices"][0]["message"]["content"].strip()
+        content = grok_client.chat(**payload, timeout=20)
+        return content.strip()
     except Exception as e:
         print(f"Grok AI error: {e}")
         return "⚠️ Sorry, I couldn't connect to the AI service right now."
 
+def ai_reply_stream(prompt, chunk_chars=STREAM_CHUNK_CHARS):
+    """
+    Streams an answer from the model and yields it in message-sized pieces as soon as each
+    piece is ready, split at paragraph or sentence boundaries where possible.
+    """
+    if not GROK_API_KEY:
+        yield "❌ The Grok API key is not configured. This feature is disabled."
+        return
+    messages = [{"role": "user", "content": prompt}]
+    buffer = ""
+    sent_any = False
+    try:
+        for delta in grok_client.stream_chat(messages, GROK_MODEL_SMART, temperature=0.7, timeout=20):
+            buffer += delta
+            if len(buffer) < chunk_chars:
+                continue
+            split_at = max(buffer.rfind("\n\n", 0, chunk_chars * 2), buffer.rfind(". ", 0, chunk_chars * 2) + 1)
+            if split_at <= 0:
+                if len(buffer) < chunk_chars * 2:
+                    continue
+                split_at = buffer.rfind(" ") if buffer.rfind(" ") > 0 else len(buffer)
+            chunk, buffer = buffer[:split_at].strip(), buffer[split_at:]
+            if chunk:
+                sent_any = True
+                yield chunk
+    except Exception as e:
+        print(f"Grok AI streaming error: {e}")
+        if not sent_any and not buffer.strip():
+            yield "⚠️ Sorry, I couldn't connect to the AI service right now."
+            return
+    if buffer.strip():
+        yield buffer.strip()
+
+@response_cache.cached("correct_grammar_with_grok")
 def correct_grammar_with_grok(text):
     if not GROK_API_KEY: return "❌ The Grok API key is not configured. This feature is disabled."
     system_prompt = "You are an expert grammar and spelling correction assistant. Correct the user's text. Only return the corrected text, without any explanation or preamble."
     payload = { "model": GROK_MODEL_SMART, "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": text}], "temperature": 0.2 }
     try:
-        res = requests.post(GROK_URL, headers=GROK_HEADERS, json=payload, timeout=20)
-        res.raise_for_status()
-        corrected_text = res.json()["choices"][0]["message"]["content"].strip().strip('"')
+        content = grok_client.chat(**payload, timeout=20)
+        corrected_text = content.strip().strip('"')
         return f"✅ Corrected:\n\n_{corrected_text}_"
     except Exception as e:
         print(f"Grok Grammar error: {e}")
+        response_cache.record_failure()
         return "⚠️ Sorry, the grammar correction service is unavailable."
 
+@response_cache.cached("analyze_email_subject", key_func=_normalized_lower, semantic_threshold=0.8)
 def analyze_email_subject(subject):
     if not GROK_API_KEY: return None
     prompt = f"""You are an email assistant. The user wants to write an email with the subject: "{subject}". What are the 2-3 most important follow-up questions you should ask to get the necessary details to write this email? Return your answer as a JSON object with a single key "questions" which is an array of strings. For a 'leave' subject, ask for dates and reason. For a 'meeting request' subject, ask for topic, date/time, and attendees. For a generic subject, just ask for the main point of the email. Only return the JSON object."""
     payload = { "model": GROK_MODEL_FAST, "messages": [{"role": "user", "content": prompt}], "temperature": 0.2, "response_format": {"type": "json_object"} }
     try:
-        response = requests.post(GROK_URL, headers=GROK_HEADERS, json=payload, timeout=15)
-        response.raise_for_status()
-        return json.loads(response.json()["choices"][0]["message"]["content"]).get("questions")
+        content = grok_client.chat(**payload, timeout=15)
+        return json.loads(content).get("questions")
     except Exception as e:
         print(f"Grok subject analysis error: {e}")
+        response_cache.record_failure()
         return None
 
 def write_email_body_with_grok(prompt):
@@ -278,9 +414,8 @@ def write_email_body_with_grok(prompt):
     system_prompt = "You are an expert email writing assistant. Based on the user's prompt, write a clear, professional, and well-formatted email body. Your entire response must consist *only* of the email body text. Do not include a subject line, greetings like 'Hello,', sign-offs like 'Sincerely,', or any preamble like 'Here is the email body:'."
     payload = { "model": GROK_MODEL_SMART, "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": prompt}], "temperature": 0.7 }
     try:
-        res = requests.post(GROK_URL, headers=GROK_HEADERS, json=payload, timeout=30)
-        res.raise_for_status()
-        return res.json()["choices"][0]["message"]["content"].strip()
+        content = grok_client.chat(**payload, timeout=30)
+        return content.strip()
     except Exception as e:
         print(f"Grok email writing error: {e}")
         return "❌ Sorry, I couldn't write the email body right now."
@@ -290,9 +425,8 @@ def edit_email_body(original_draft, edit_instruction):
     prompt = f"""You are an email editor. Here is an email draft: --- DRAFT --- {original_draft} --- END DRAFT --- The user wants to make a change. Their instruction is: "{edit_instruction}". Apply the change and return only the complete, new version of the email body."""
     payload = { "model": GROK_MODEL_SMART, "messages": [{"role": "user", "content": prompt}], "temperature": 0.5 }
     try:
-        response = requests.post(GROK_URL, headers=GROK_HEADERS, json=payload, timeout=30)
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"].strip()
+        content = grok_client.chat(**payload, timeout=30)
+        return content.strip()
     except Exception as e:
         print(f"Grok email editing error: {e}")
         return None
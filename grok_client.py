@@ -0,0 +1,202 @@
+# grok_client.py
+import json
+import random
+import threading
+import time
+
+import requests
+
+from http_session import create_pooled_session
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class GrokAPIError(Exception):
+    """Raised when a Grok (Groq) API call fails after all retries."""
+
+
+class CircuitOpenError(GrokAPIError):
+    """Raised without calling the API while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated failures, then lets a single trial call through
+    once `reset_timeout` seconds have passed ("half-open").
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class GrokClient:
+    """
+    A shared, thread-safe client for the Groq chat completions API.
+
+    It keeps connections alive in a pool, retries 429/5xx/connection errors with jittered
+    exponential backoff, trips a circuit breaker when the service keeps failing, and can
+    stream tokens. Request and response hooks receive every call, e.g. for metrics.
+    """
+
+    def __init__(self, api_key, url, pool_size=10, max_retries=3, base_backoff=0.5, max_backoff=8.0,
+                 default_timeout=30, breaker=None):
+        self.api_key = api_key
+        self.url = url
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.default_timeout = default_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.request_hooks = []
+        self.response_hooks = []
+        # Retries are handled here (with jitter and the breaker), not by the transport.
+        self.session = create_pooled_session(pool_size=pool_size, retries=0, headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+
+    def add_request_hook(self, hook):
+        """Registers `hook(payload)`, called before each API request."""
+        self.request_hooks.append(hook)
+
+    def add_response_hook(self, hook):
+        """Registers `hook(payload, info)`, called after each call with status, latency, attempts, usage and error."""
+        self.response_hooks.append(hook)
+
+    def _run_hooks(self, hooks, *args):
+        for hook in hooks:
+            try:
+                hook(*args)
+            except Exception as e:
+                print(f"Grok client hook error: {e}")
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        # "Full jitter": spread retries out so many workers don't hit the API in lockstep.
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+
+    def _post(self, payload, timeout, stream=False):
+        """Sends a request with retries. Returns (response, attempts, start time); raises GrokAPIError on failure."""
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("Grok circuit breaker is open; skipping call.")
+
+        self._run_hooks(self.request_hooks, payload)
+        started = time.monotonic()
+        last_error = None
+        response = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(self.url, json=payload, timeout=timeout or self.default_timeout, stream=stream)
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    break
+                last_error = GrokAPIError(f"HTTP {response.status_code}: {response.text[:200]}")
+            except requests.exceptions.RequestException as e:
+                last_error = GrokAPIError(str(e))
+                response = None
+            if attempt < self.max_retries:
+                time.sleep(self._backoff(attempt, response))
+        else:
+            self.breaker.record_failure()
+            self._run_hooks(self.response_hooks, payload, {
+                "model": payload.get("model"), "status": response.status_code if response is not None else None,
+                "latency": time.monotonic() - started, "attempts": self.max_retries + 1, "usage": None, "error": str(last_error)
+            })
+            raise last_error
+
+        if response.status_code >= 400:
+            # Client errors (bad request, auth) mean the service is up, so they don't trip the breaker.
+            self.breaker.record_success()
+            self._run_hooks(self.response_hooks, payload, {
+                "model": payload.get("model"), "status": response.status_code, "latency": time.monotonic() - started,
+                "attempts": attempt + 1, "usage": None, "error": response.text[:200]
+            })
+            raise GrokAPIError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+        self.breaker.record_success()
+        return response, attempt + 1, started
+
+    def chat(self, messages, model, temperature=0.7, timeout=None, response_format=None, max_tokens=None):
+        """Runs a chat completion and returns the message content as a string."""
+        payload = {"model": model, "messages": messages, "temperature": temperature}
+        if response_format:
+            payload["response_format"] = response_format
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+
+        response, attempts, started = self._post(payload, timeout)
+        body = response.json()
+        self._run_hooks(self.response_hooks, payload, {
+            "model": model, "status": response.status_code, "latency": time.monotonic() - started,
+            "attempts": attempts, "usage": body.get("usage"), "error": None
+        })
+        return body["choices"][0]["message"]["content"]
+
+    def chat_json(self, messages, model, temperature=0.0, timeout=None):
+        """Runs a JSON-mode chat completion and returns the parsed object."""
+        return json.loads(self.chat(messages, model, temperature=temperature, timeout=timeout, response_format={"type": "json_object"}))
+
+    def stream_chat(self, messages, model, temperature=0.7, timeout=None):
+        """Yields content deltas as the model produces them (server-sent events)."""
+        payload = {"model": model, "messages": messages, "temperature": temperature, "stream": True}
+        response, attempts, started = self._post(payload, timeout, stream=True)
+        error = None
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                data = line[len("data: "):]
+                if data.strip() == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+        except Exception as e:
+            error = str(e)
+            raise GrokAPIError(f"Stream interrupted: {e}")
+        finally:
+            response.close()
+            self._run_hooks(self.response_hooks, payload, {
+                "model": model, "status": response.status_code, "latency": time.monotonic() - started,
+                "attempts": attempts, "usage": None, "error": error
+            })
@@ -0,0 +1,47 @@
+# http_session.py
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class _PostSafeRetry(Retry):
+    """
+    A Retry that only resends a POST on a 429, or a 503 with Retry-After: after any other 5xx
+    the server may already have acted on it (e.g. accepted a WhatsApp message). Idempotent
+    requests such as media GETs are still retried on every code in RETRY_STATUS_CODES.
+    """
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method.upper() == "POST" and not (status_code == 429 or (status_code == 503 and has_retry_after)):
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def create_pooled_session(pool_size=20, retries=3, backoff_factor=0.5, headers=None):
+    """
+    Builds a requests.Session that keeps connections alive and shares them across threads.
+
+    Connection failures are retried with exponential backoff (honouring Retry-After), as are
+    429/5xx responses to GETs. POSTs are only retried on 429 or a 503 with Retry-After, and
+    read timeouts never are, since the server may already have acted on the request.
+    """
+    session = requests.Session()
+    retry = _PostSafeRetry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET", "POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
@@ -0,0 +1,398 @@
+# intent_classifier.py
+"""
+Local, CPU-only intent classification that runs before the Grok router.
+
+Anchored rules recognise the common phrasings and pull out entities with deterministic
+parsers; a small Naive Bayes model trained on the examples below covers rewordings of
+the intents that need no entities, but only for messages made entirely of words it was
+trained on, with no request to change anything, and a clear lead over the runner-up.
+Anything that is not a confident match returns None and is escalated to
+`route_user_intent`'s LLM call.
+"""
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import pytz
+
+CONFIDENCE_THRESHOLD = float(os.environ.get("LOCAL_INTENT_THRESHOLD", 0.85))
+MIN_LOG_MARGIN = 4.0     # The model's best intent must beat the runner-up by this log-likelihood margin
+MIN_VOCABULARY_COVERAGE = 1.0   # Share of a message's words the model must have seen in training
+MAX_LOCAL_TEXT_LENGTH = 160  # Longer messages are usually compound requests; let the LLM read them
+
+# Intents the model may answer on its own because they carry no entities.
+ENTITY_FREE_INTENTS = {"get_reminders", "get_features", "get_bot_identity"}
+
+TRAINING_EXAMPLES = [
+    # get_reminders
+    ("show my reminders", "get_reminders"),
+    ("list all my reminders", "get_reminders"),
+    ("what reminders do i have", "get_reminders"),
+    ("check my reminders", "get_reminders"),
+    ("do i have any reminders set", "get_reminders"),
+    ("view my active reminders", "get_reminders"),
+    ("what are my upcoming reminders", "get_reminders"),
+    ("see reminders", "get_reminders"),
+    ("which reminders are pending", "get_reminders"),
+    ("display my scheduled reminders", "get_reminders"),
+    ("any reminders for me", "get_reminders"),
+    ("what have i asked you to remind me about", "get_reminders"),
+    # set_reminder
+    ("remind me to call mom tomorrow at 5pm", "set_reminder"),
+    ("set a reminder for the meeting at 3", "set_reminder"),
+    ("remind me every day at 7am to drink water", "set_reminder"),
+    ("please remind me to pay rent on the 1st of every month", "set_reminder"),
+    ("remind me in 10 minutes to check the oven", "set_reminder"),
+    ("set reminder to submit assignment friday 9am", "set_reminder"),
+    ("don't let me forget to buy milk tonight", "set_reminder"),
+    ("create a reminder for my dentist appointment next monday", "set_reminder"),
+    ("remind me about the gym at 6 every morning", "set_reminder"),
+    ("wake me up tomorrow at 6", "set_reminder"),
+    # schedule_meeting
+    ("schedule a meeting with ravi and priya next week", "schedule_meeting"),
+    ("set up a call with john tomorrow afternoon", "schedule_meeting"),
+    ("find a time to meet with the team this friday", "schedule_meeting"),
+    ("book a 30 minute meeting with anita about the budget", "schedule_meeting"),
+    ("arrange a sync with rahul on monday", "schedule_meeting"),
+    ("organize a meeting with sam to discuss the project", "schedule_meeting"),
+    ("can you schedule a call with my manager", "schedule_meeting"),
+    ("plan a meeting with kiran and arjun for next tuesday", "schedule_meeting"),
+    # log_expense
+    ("i spent 300 on pizza", "log_expense"),
+    ("spent 50 on chai", "log_expense"),
+    ("paid 1200 for electricity bill", "log_expense"),
+    ("i paid 250 for a movie ticket at pvr", "log_expense"),
+    ("spent 80 rupees on auto", "log_expense"),
+    ("bought groceries for 900 at dmart", "log_expense"),
+    ("log 150 for lunch", "log_expense"),
+    ("add expense 400 for petrol", "log_expense"),
+    ("i spent 300 on pizza and 50 on chai", "log_expense"),
+    ("paid rs 60 for coffee", "log_expense"),
+    # convert_currency
+    ("convert 100 usd to inr", "convert_currency"),
+    ("100 dollars in rupees", "convert_currency"),
+    ("how much is 50 euros in inr", "convert_currency"),
+    ("what is 20 gbp in usd", "convert_currency"),
+    ("convert 5000 inr to dollars", "convert_currency"),
+    ("exchange rate usd to inr for 10", "convert_currency"),
+    ("1000 yen to rupees", "convert_currency"),
+    ("change 75 eur into usd", "convert_currency"),
+    # get_weather
+    ("weather in pune", "get_weather"),
+    ("what's the weather in mumbai", "get_weather"),
+    ("how is the weather in delhi today", "get_weather"),
+    ("hyderabad weather", "get_weather"),
+    ("is it raining in chennai", "get_weather"),
+    ("temperature in bangalore", "get_weather"),
+    ("will it rain in kolkata today", "get_weather"),
+    ("weather forecast for vijayawada", "get_weather"),
+    ("how hot is it in nagpur", "get_weather"),
+    # get_features
+    ("what can you do", "get_features"),
+    ("what are your features", "get_features"),
+    ("help", "get_features"),
+    ("what are your commands", "get_features"),
+    ("show me your features", "get_features"),
+    ("what all can you help me with", "get_features"),
+    ("list your capabilities", "get_features"),
+    ("what services do you offer", "get_features"),
+    ("how can you help me", "get_features"),
+    ("what do you do", "get_features"),
+    # get_bot_identity
+    ("who are you", "get_bot_identity"),
+    ("what are you", "get_bot_identity"),
+    ("who made you", "get_bot_identity"),
+    ("who created you", "get_bot_identity"),
+    ("who built you", "get_bot_identity"),
+    ("who is your creator", "get_bot_identity"),
+    ("who developed this bot", "get_bot_identity"),
+    ("are you a bot", "get_bot_identity"),
+    ("what is your name", "get_bot_identity"),
+    ("tell me about yourself", "get_bot_identity"),
+    # youtube_search
+    ("search youtube for lofi music", "youtube_search"),
+    ("find a video on how to tie a tie", "youtube_search"),
+    ("play despacito on youtube", "youtube_search"),
+    ("show me cooking videos on youtube", "youtube_search"),
+    ("youtube python tutorial", "youtube_search"),
+    ("get me the trailer of the new marvel movie on youtube", "youtube_search"),
+    ("find guitar lessons video", "youtube_search"),
+    ("search for funny cat videos", "youtube_search"),
+    # drive_search_file
+    ("find my resume in drive", "drive_search_file"),
+    ("search my google drive for invoice", "drive_search_file"),
+    ("look for the project report in my drive", "drive_search_file"),
+    ("where is my tax document in drive", "drive_search_file"),
+    ("search drive for budget sheet", "drive_search_file"),
+    ("find file named notes in google drive", "drive_search_file"),
+    ("locate the presentation in my drive", "drive_search_file"),
+    # drive_analyze_file
+    ("summarize my resume from drive", "drive_analyze_file"),
+    ("analyze the project plan file in my drive", "drive_analyze_file"),
+    ("read report.pdf from google drive and summarize it", "drive_analyze_file"),
+    ("what does the contract in my drive say", "drive_analyze_file"),
+    ("review the document proposal in drive", "drive_analyze_file"),
+    ("give me a summary of notes.docx in my drive", "drive_analyze_file"),
+    ("analyse budget.xlsx from my drive", "drive_analyze_file"),
+    # general_query
+    ("what is the capital of france", "general_query"),
+    ("explain quantum computing in simple terms", "general_query"),
+    ("write a poem about the monsoon", "general_query"),
+    ("how do i make biryani", "general_query"),
+    ("tell me a joke", "general_query"),
+    ("what is machine learning", "general_query"),
+    ("give me tips to improve my sleep", "general_query"),
+    ("who won the world cup in 2011", "general_query"),
+    ("translate good morning to hindi", "general_query"),
+    ("how far is the moon", "general_query"),
+    ("what should i cook for dinner", "general_query"),
+    ("suggest a good book to read", "general_query"),
+    ("why is the sky blue", "general_query"),
+    ("what are the benefits of yoga", "general_query"),
+    ("can you help me write an essay", "general_query"),
+    ("help me plan a trip to goa", "general_query"),
+    ("can you help me with my math homework", "general_query"),
+    ("help me draft a message to my landlord", "general_query"),
+]
+
+
+# --- Tokenization & model ---
+def _tokenize(text):
+    words = re.findall(r"[a-z0-9']+", text.lower())
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class NaiveBayesIntentModel:
+    """A multinomial Naive Bayes text classifier over word unigrams and bigrams."""
+
+    def __init__(self, alpha=0.5):
+        self.alpha = alpha
+        self.class_log_priors = {}
+        self.token_log_probs = {}
+        self.unknown_log_probs = {}
+        self.vocabulary = set()
+
+    def fit(self, examples):
+        class_counts = Counter(label for _, label in examples)
+        token_counts = defaultdict(Counter)
+        vocabulary = set()
+        for text, label in examples:
+            tokens = _tokenize(text)
+            token_counts[label].update(tokens)
+            vocabulary.update(tokens)
+        self.vocabulary = {token for token in vocabulary if "_" not in token}
+
+        total = sum(class_counts.values())
+        for label, count in class_counts.items():
+            self.class_log_priors[label] = math.log(count / total)
+            denominator = sum(token_counts[label].values()) + self.alpha * len(vocabulary)
+            self.token_log_probs[label] = {token: math.log((n + self.alpha) / denominator) for token, n in token_counts[label].items()}
+            self.unknown_log_probs[label] = math.log(self.alpha / denominator)
+        return self
+
+    def predict_proba(self, text):
+        tokens = _tokenize(text)
+        scores = {}
+        for label, prior in self.class_log_priors.items():
+            log_probs, unknown = self.token_log_probs[label], self.unknown_log_probs[label]
+            scores[label] = prior + sum(log_probs.get(token, unknown) for token in tokens)
+        best = max(scores.values())
+        exp_scores = {label: math.exp(score - best) for label, score in scores.items()}
+        total = sum(exp_scores.values())
+        return {label: value / total for label, value in exp_scores.items()}
+
+
+_model = NaiveBayesIntentModel().fit(TRAINING_EXAMPLES)
+
+
+# --- Deterministic entity parsers ---
+CURRENCY_WORDS = {
+    "dollar": "USD", "dollars": "USD", "usd": "USD", "$": "USD",
+    "rupee": "INR", "rupees": "INR", "inr": "INR", "rs": "INR", "₹": "INR",
+    "euro": "EUR", "euros": "EUR", "eur": "EUR",
+    "pound": "GBP", "pounds": "GBP", "gbp": "GBP",
+    "yen": "JPY", "jpy": "JPY",
+    "dirham": "AED", "dirhams": "AED", "aed": "AED",
+}
+# ISO 4217 codes the ExchangeRate-API supports. A three-letter word outside this set (kgs, lbs...) is not a currency.
+ISO_CURRENCY_CODES = set("""
+    AED AFN ALL AMD ANG AOA ARS AUD AWG AZN BAM BBD BDT BGN BHD BIF BMD BND BOB BRL BSD BTN BWP BYN BZD
+    CAD CDF CHF CLP CNY COP CRC CUP CVE CZK DJF DKK DOP DZD EGP ERN ETB EUR FJD FKP GBP GEL GHS GIP GMD
+    GNF GTQ GYD HKD HNL HRK HTG HUF IDR ILS INR IQD IRR ISK JMD JOD JPY KES KGS KHR KMF KRW KWD KYD KZT
+    LAK LBP LKR LRD LSL LYD MAD MDL MGA MKD MMK MNT MOP MRU MUR MVR MWK MXN MYR MZN NAD NGN NIO NOK NPR
+    NZD OMR PAB PEN PGK PHP PKR PLN PYG QAR RON RSD RUB RWF SAR SBD SCR SDG SEK SGD SHP SLE SOS SRD SSP
+    STN SYP SZL THB TJS TMT TND TOP TRY TTD TWD TZS UAH UGX USD UYU UZS VES VND VUV WST XAF XCD XOF XPF
+    YER ZAR ZMW ZWL
+""".split())
+_CURRENCY = r"(?:[a-z]{3}|dollars?|rupees?|euros?|pounds?|yen|dirhams?)"
+_DRIVE = r"(?:in|on|from) (?:my )?(?:google )?drive"
+_FILE_WORDS = r"(?: the| my)?(?: file| document| doc)?(?: named| called)?"
+
+_RULES = [
+    ("get_reminders", re.compile(r"^(?:(?:show|list|check|see|view|display|get|give)(?: me)?(?: all)?(?: of)?(?: my| the)?|what are(?: all)? my|my)(?: active| current| upcoming| pending| scheduled)? reminders?$")),
+    ("get_reminders", re.compile(r"^(?:what|which) reminders (?:do i have|are (?:set|pending|active))$")),
+    ("get_features", re.compile(r"^(?:what can you do|what (?:all )?can you help (?:me )?with|what are your (?:features|commands|capabilities)|(?:show|list|tell)(?: me)? your (?:features|commands|capabilities)|help|features|commands|what do you do|how can you help(?: me)?)$")),
+    ("get_bot_identity", re.compile(r"^(?:who|what) (?:are|r) (?:you|u)$|^who (?:made|created|built|developed|programmed) (?:you|u|this bot)$|^who is your (?:creator|developer|maker|owner)$|^what is your name$")),
+    ("get_weather", re.compile(r"^(?:(?:what(?:'s| is)|how(?:'s| is)|show(?: me)?|tell me|get(?: me)?) )?(?:the )?(?:current )?(?:weather|temperature|forecast|weather forecast)(?: like)? (?:in|at|for) (?P<location>[a-z][a-z .'-]*?)(?: today| now| right now| currently)?$")),
+    ("get_weather", re.compile(r"^(?P<city>[a-z][a-z .'-]*?) (?:weather|temperature)(?: today| now)?$")),
+    ("youtube_search", re.compile(r"^(?:search|find|play|show|get)(?: me)?(?: a| the)? (?P<query>.+?) (?:on|from|in) youtube$")),
+    ("youtube_search", re.compile(r"^(?:search )?youtube(?: search)?(?: for)? (?P<query>.+)$")),
+    ("drive_search_file", re.compile(rf"^(?:find|search(?: for)?|look for|locate|where is){_FILE_WORDS} (?P<query>.+?) {_DRIVE}$")),
+    ("drive_search_file", re.compile(r"^search (?:my )?(?:google )?drive for (?P<query>.+)$")),
+    ("drive_analyze_file", re.compile(rf"^(?:summari[sz]e|analy[sz]e|review|read){_FILE_WORDS} (?P<filename>.+?) {_DRIVE}(?: and summari[sz]e it)?$")),
+    ("export_expenses", re.compile(r"^(?:export|download|send(?: me)?|get(?: me)?|give me)(?: all)?(?: of)? my expenses?(?: (?:report|history|list|data))?(?: (?:as|in|to) (?:an? )?(?P<format>csv|excel|xlsx)(?: file)?)?$")),
+    ("get_expense_summary", re.compile(r"^(?:how much (?:did i|have i|i have|i) (?:spend|spent)|(?:show(?: me)? |what(?:'s| is| are) )?(?:my )?(?:total )?(?:spending|expense summary|expenses summary))(?: on (?P<term>[a-z][a-z ]*?))?(?: at (?P<place>[a-z][a-z '&-]*?))?(?: (?P<period>today|yesterday|this week|last week|this month|last month|this year|so far))?$")),
+    ("convert_currency", re.compile(rf"^(?:convert |change |how much is |what is |what's )?(?P<amount>\d[\d,]*(?:\.\d+)?) ?(?P<from_currency>{_CURRENCY}) (?:to|in|into) (?P<to_currency>{_CURRENCY})$")),
+]
+
+_EXPENSE_PREFIX = re.compile(r"^(?:i )?(?:spent|paid) ")
+_EXPENSE_SEGMENT = re.compile(r"^(?:rs\.? ?|₹ ?|inr ?)?(?P<cost>\d+(?:\.\d+)?)(?: ?(?:rs|rupees|inr|₹))? (?:on|for) (?P<item>[a-z][a-z0-9 '&-]*?)(?: (?:at|from) (?P<place>[a-z][a-z0-9 '&-]*?))?$")
+# Relative dates and times need the LLM to resolve into a timestamp.
+_TIME_WORDS = re.compile(r"\b(?:yesterday|today|tonight|tomorrow|ago|last|morning|afternoon|evening|night|monday|tuesday|wednesday|thursday|friday|saturday|sunday|\d{1,2}(?::\d{2})? ?(?:am|pm))\b")
+# Words that never make up a place name or a search query on their own ("weather in my city",
+# "search youtube for", "find time in my drive"); entities made only of these go to the LLM.
+_FILLER_WORDS = {
+    "a", "an", "the", "me", "my", "i", "you", "your", "our", "it", "is", "are", "was", "be", "will", "this", "that",
+    "for", "of", "in", "on", "at", "to", "and", "or", "show", "tell", "get", "give", "what", "whats", "how", "like",
+    "here", "there", "now", "current", "currently", "outside", "local", "city", "town", "area", "place", "home",
+    "time", "something", "anything", "stuff", "file", "files", "video", "videos", "down", "up", "not", "working",
+    "week", "weekend", "next", "later", "soon",
+}
+# The model's intents only read data; a message asking to change something always goes to the LLM.
+_DESTRUCTIVE_WORDS = re.compile(r"\b(?:delete|remove|cancel|clear|stop|erase|drop|disable|turn off|unsubscribe|reset|edit|change|update)\b")
+# "<word> weather" is only read as a place when the word is a known city; "nice weather" is small talk.
+KNOWN_CITIES = {
+    "agra", "ahmedabad", "amritsar", "bangalore", "bengaluru", "bhopal", "bhubaneswar", "chandigarh", "chennai",
+    "coimbatore", "dehradun", "delhi", "new delhi", "goa", "guntur", "gurgaon", "gurugram", "guwahati", "hyderabad",
+    "indore", "jaipur", "jammu", "kanpur", "kochi", "kolkata", "kozhikode", "lucknow", "ludhiana", "madurai",
+    "mangalore", "mumbai", "mysore", "mysuru", "nagpur", "nashik", "nellore", "noida", "patna", "pondicherry", "pune",
+    "raipur", "rajahmundry", "ranchi", "shimla", "srinagar", "surat", "thane", "thiruvananthapuram", "tirupati",
+    "trichy", "udaipur", "vadodara", "varanasi", "vijayawada", "visakhapatnam", "vizag", "warangal",
+    "dubai", "london", "new york", "singapore", "tokyo", "paris", "sydney", "toronto",
+}
+_QUERY_LEADING_VERBS = {"is", "are", "was", "isn't", "not", "has", "have", "keeps", "won't", "doesn't", "down", "app"}
+
+
+def _normalize(text):
+    text = text.strip().lower()
+    text = re.sub(r"\s+", " ", text)
+    return text.rstrip("?!. ")
+
+
+def _parse_expenses(text):
+    if not _EXPENSE_PREFIX.match(text) or _TIME_WORDS.search(text):
+        return None
+    body = _EXPENSE_PREFIX.sub("", text)
+    segments = re.split(r",? and (?=(?:rs\.? ?|₹ ?|inr ?)?\d)|, (?=(?:rs\.? ?|₹ ?|inr ?)?\d)", body)
+    timestamp = datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y-%m-%d %H:%M:%S')
+    expenses = []
+    for segment in segments:
+        match = _EXPENSE_SEGMENT.match(segment.strip())
+        if not match:
+            return None
+        expenses.append({
+            "cost": float(match.group("cost")),
+            "item": match.group("item").strip(),
+            "place": match.group("place").strip() if match.group("place") else None,
+            "timestamp": timestamp
+        })
+    return expenses
+
+
+def _period_dates(period):
+    """Resolves "this week", "last month"... into ('YYYY-MM-DD', 'YYYY-MM-DD') inclusive; None means this month so far."""
+    today = datetime.now(pytz.timezone('Asia/Kolkata')).date()
+    if period == "today":
+        start, end = today, today
+    elif period == "yesterday":
+        start = end = today - timedelta(days=1)
+    elif period == "this week":
+        start, end = today - timedelta(days=today.weekday()), today
+    elif period == "last week":
+        start = today - timedelta(days=today.weekday() + 7)
+        end = start + timedelta(days=6)
+    elif period == "last month":
+        end = today.replace(day=1) - timedelta(days=1)
+        start = end.replace(day=1)
+    elif period == "this year":
+        start, end = today.replace(month=1, day=1), today
+    else:
+        start, end = today.replace(day=1), today
+    return start.isoformat(), end.isoformat()
+
+
+def _is_place_name(value):
+    words = value.split()
+    return 0 < len(words) <= 3 and not _TIME_WORDS.search(value) and not any(word in _FILLER_WORDS for word in words)
+
+
+def _is_search_query(value):
+    words = value.split()
+    return bool(words) and words[0] not in _QUERY_LEADING_VERBS and any(word not in _FILLER_WORDS for word in words)
+
+
+def _currency_code(value):
+    code = CURRENCY_WORDS.get(value, value.upper())
+    return code if code in ISO_CURRENCY_CODES else None
+
+
+def _entities_from_match(intent, match):
+    """Returns the entities for a rule match, or None if they don't validate (the message then goes to the LLM)."""
+    groups = {key: value.strip() for key, value in match.groupdict().items() if value}
+    if intent == "get_weather":
+        if "city" in groups:   # "<word> weather"
+            return {"location": groups["city"].title()} if groups["city"] in KNOWN_CITIES else None
+        if not _is_place_name(groups["location"]):
+            return None
+        return {"location": groups["location"].title()}
+    if intent == "convert_currency":
+        from_currency, to_currency = _currency_code(groups["from_currency"]), _currency_code(groups["to_currency"])
+        if not from_currency or not to_currency:
+            return None
+        return [{"amount": float(groups["amount"].replace(",", "")), "from_currency": from_currency, "to_currency": to_currency}]
+    if intent in ("youtube_search", "drive_search_file", "drive_analyze_file"):
+        if not all(_is_search_query(value) for value in groups.values()):
+            return None
+    if intent == "get_expense_summary":
+        start_date, end_date = _period_dates(groups.get("period"))
+        return {"category": groups.get("term"), "place": groups.get("place"), "start_date": start_date, "end_date": end_date}
+    if intent == "export_expenses":
+        return {"format": "csv" if groups.get("format") == "csv" else "excel"}
+    return groups
+
+
+def classify_intent_locally(text, threshold=CONFIDENCE_THRESHOLD):
+    """
+    Returns a router-style result ({"intent", "entities", "confidence", "source"}) when the
+    message can be handled without the LLM, otherwise None.
+    """
+    if not text:
+        return None
+    normalized = _normalize(text)
+    if not normalized or len(normalized) > MAX_LOCAL_TEXT_LENGTH or "\n" in normalized:
+        return None
+
+    expenses = _parse_expenses(normalized)
+    if expenses:
+        return {"intent": "log_expense", "entities": expenses, "confidence": 0.99, "source": "rules"}
+
+    for intent, pattern in _RULES:
+        match = pattern.match(normalized)
+        if match:
+            entities = _entities_from_match(intent, match)
+            if entities is None:
+                return None   # The phrasing matched but the entities didn't validate; let the LLM read it
+            return {"intent": intent, "entities": entities, "confidence": 0.99, "source": "rules"}
+
+    if _DESTRUCTIVE_WORDS.search(normalized):
+        return None
+    words = re.findall(r"[a-z0-9']+", normalized)
+    if not words or len(words) > 8 or sum(word in _model.vocabulary for word in words) / len(words) < MIN_VOCABULARY_COVERAGE:
+        return None   # Words the model has never seen make its probabilities meaningless
+    probabilities = _model.predict_proba(normalized)
+    (intent, confidence), (_, runner_up) = sorted(probabilities.items(), key=lambda item: item[1], reverse=True)[:2]
+    if intent in ENTITY_FREE_INTENTS and confidence >= threshold and math.log(confidence / max(runner_up, 1e-300)) >= MIN_LOG_MARGIN:
+        return {"intent": intent, "entities": {}, "confidence": round(confidence, 3), "source": "model"}
+    return None
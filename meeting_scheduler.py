@@ -1,5 +1,5 @@
 # meeting_scheduler.py
-from googleapiclient.discovery import build
+from google_services import get_service
 from datetime import datetime, time, timedelta
 import pytz
 import logging
@@ -15,7 +15,7 @@ def find_common_free_time(credentials_list, duration_minutes, start_search_dt, e
         return None
         
     try:
-        service = build('calendar', 'v3', credentials=credentials_list[0])
+        service = get_service('calendar', 'v3', credentials_list[0])
         
         attendees = [{'id': creds.email_address} for creds in credentials_list]
         
@@ -91,7 +91,7 @@ def create_meeting_event(organizer_creds, attendees_emails, start_time, end_time
     Creates a Google Calendar event with a Meet link and invites attendees.
     """
     try:
-        service = build('calendar', 'v3', credentials=organizer_creds)
+        service = get_service('calendar', 'v3', organizer_creds)
         
         event = {
             'summary': topic,
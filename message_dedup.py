@@ -0,0 +1,80 @@
+# message_dedup.py
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+# --- Configuration ---
+DEDUP_TTL_SECONDS = 24 * 60 * 60   # Meta stops retrying a delivery well within a day
+LRU_MAX_SIZE = 10000
+
+
+class MessageDeduplicator:
+    """
+    Drops repeated webhook deliveries of the same WhatsApp message.
+
+    An in-process LRU answers the common case without a database round-trip, and a
+    Mongo collection with a TTL index makes the check hold across workers and processes.
+    """
+
+    def __init__(self, collection, ttl_seconds=DEDUP_TTL_SECONDS, max_size=LRU_MAX_SIZE):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self.collection.create_index("created_at", expireAfterSeconds=ttl_seconds)
+
+    def _seen_recently(self, message_id):
+        with self._lock:
+            seen_at = self._seen.get(message_id)
+            if seen_at is None:
+                return False
+            if time.monotonic() - seen_at > self.ttl_seconds:
+                del self._seen[message_id]
+                return False
+            self._seen.move_to_end(message_id)
+            return True
+
+    def _remember(self, message_id):
+        with self._lock:
+            self._seen[message_id] = time.monotonic()
+            self._seen.move_to_end(message_id)
+            while len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+
+    def is_duplicate(self, message_id):
+        """
+        Returns True if this message ID was already claimed, otherwise claims it and returns False.
+        Call `release` if processing the message then fails, so a redelivery isn't dropped.
+        """
+        if not message_id:
+            return False
+        if self._seen_recently(message_id):
+            return True
+
+        try:
+            self.collection.insert_one({"_id": message_id, "created_at": datetime.now(timezone.utc)})
+            duplicate = False
+        except DuplicateKeyError:
+            duplicate = True
+        except Exception as e:
+            # If Mongo is unavailable, fall back to processing rather than dropping real messages.
+            print(f"Message dedup store error for {message_id}: {e}")
+            duplicate = False
+
+        self._remember(message_id)
+        return duplicate
+
+    def release(self, message_id):
+        """Gives up the claim on a message ID so its next delivery is processed."""
+        if not message_id:
+            return
+        with self._lock:
+            self._seen.pop(message_id, None)
+        try:
+            self.collection.delete_one({"_id": message_id})
+        except Exception as e:
+            print(f"Message dedup store error releasing {message_id}: {e}")
@@ -3,17 +3,40 @@ import requests
 import os
 import time
 
+from http_session import create_pooled_session
+
 ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
 PHONE_NUMBER_ID = os.getenv("PHONE_NUMBER_ID")
 API_VERSION = "v19.0"
+GRAPH_BASE_URL = f"https://graph.facebook.com/{API_VERSION}"
+MESSAGES_URL = f"{GRAPH_BASE_URL}/{PHONE_NUMBER_ID}/messages"
+TEXT_MESSAGE_LIMIT = 4096  # Maximum length of a WhatsApp text message body
+
+# --- Shared Graph API connection pool ---
+GRAPH_POOL_SIZE = int(os.getenv("GRAPH_POOL_SIZE", 20))
+GRAPH_TIMEOUT = float(os.getenv("GRAPH_TIMEOUT", 10))
+GRAPH_MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", 3))
+
+graph_session = create_pooled_session(
+    pool_size=GRAPH_POOL_SIZE,
+    retries=GRAPH_MAX_RETRIES,
+    headers={"Authorization": f"Bearer {ACCESS_TOKEN}"}
+)
+# No transport-level retries: callers using it (the broadcast engine) own retries and rate limiting.
+unretried_graph_session = create_pooled_session(
+    pool_size=GRAPH_POOL_SIZE,
+    retries=0,
+    headers={"Authorization": f"Bearer {ACCESS_TOKEN}"}
+)
+
+def _post_message(data, session=graph_session):
+    """Posts a message payload to the Graph API over a shared keep-alive session."""
+    response = session.post(MESSAGES_URL, json=data, timeout=GRAPH_TIMEOUT)
+    response.raise_for_status()
+    return response
 
 def send_message(to, message):
     """Sends a standard text message."""
-    url = f"https://graph.facebook.com/{API_VERSION}/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
     data = {
         "messaging_product": "whatsapp",
         "to": to,
@@ -21,19 +44,17 @@ def send_message(to, message):
         "text": {"body": message, "preview_url": True}
     }
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=10)
-        response.raise_for_status()
+        _post_message(data)
     except requests.exceptions.RequestException as e:
         print(f"Failed to send message to {to}: {e}")
 
 
-def send_template_message(to, daily_briefing_v3, components=[]):
-    """Sends a pre-approved template message."""
-    url = f"https://graph.facebook.com/{API_VERSION}/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
+def send_template_message(to, daily_briefing_v3, components=[], raise_errors=False):
+    """
+    Sends a pre-approved template message. Returns True on success. With raise_errors the
+    request is sent exactly once, with no transport-level retries, and a failure raises instead
+    of returning False, so the caller can decide whether and when to retry.
+    """
     template_data = {
         "name": daily_briefing_v3,
         "language": {"code": "en_US"}
@@ -48,20 +69,17 @@ def send_template_message(to, daily_briefing_v3, components=[]):
         "template": template_data
     }
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=10)
-        response.raise_for_status()
+        response = _post_message(data, unretried_graph_session if raise_errors else graph_session)
         print(f"Template '{daily_briefing_v3}' sent to {to}. Status: {response.status_code}")
+        return True
     except requests.exceptions.RequestException as e:
-        print(f"Failed to send template message to {to}: {e.response.text if e.response else e}")
+        print(f"Failed to send template message to {to}: {e.response.text if e.response is not None else e}")
+        if raise_errors:
+            raise
+        return False
 
 def send_interactive_menu(to, name):
     """Sends the main interactive list menu."""
-    url = f"https://graph.facebook.com/{API_VERSION}/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    
     welcome_text = f"👋 Welcome back, *{name}*!\n\nHow can I assist you today? You can also type commands like `.reminders` to see your reminders."
 
     data = {
@@ -89,19 +107,12 @@ def send_interactive_menu(to, name):
         }
     }
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=10)
-        response.raise_for_status()
+        _post_message(data)
     except requests.exceptions.RequestException as e:
         print(f"Failed to send interactive menu to {to}: {e.response.text if e.response else e}")
 
 def send_reminders_list(to, reminders):
     """Sends an interactive list of reminders with a delete button for each."""
-    url = f"https://graph.facebook.com/{API_VERSION}/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-
     if not reminders:
         send_message(to, "You have no active reminders set.")
         return
@@ -130,18 +141,12 @@ def send_reminders_list(to, reminders):
         }
     }
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=10)
-        response.raise_for_status()
+        _post_message(data)
     except requests.exceptions.RequestException as e:
         print(f"Failed to send reminders list to {to}: {e.response.text if e.response else e}")
 
 def send_delete_confirmation(to, job_id, task_name):
     """Sends a yes/no confirmation message for deleting a reminder."""
-    url = f"https://graph.facebook.com/{API_VERSION}/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
     data = {
         "messaging_product": "whatsapp",
         "to": to,
@@ -172,18 +177,12 @@ def send_delete_confirmation(to, job_id, task_name):
         }
     }
     try:
-        requests.post(url, headers=headers, json=data, timeout=10).raise_for_status()
+        _post_message(data)
     except requests.exceptions.RequestException as e:
         print(f"Failed to send delete confirmation to {to}: {e.response.text if e.response else e}")
 
 def send_meeting_proposal(to, proposed_time, session_id):
     """Sends a yes/no confirmation for a proposed meeting time."""
-    url = f"https://graph.facebook.com/{API_VERSION}/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    
     formatted_time = proposed_time.strftime('%A, %b %d at %I:%M %p')
     
     data = {
@@ -216,18 +215,13 @@ def send_meeting_proposal(to, proposed_time, session_id):
         }
     }
     try:
-        requests.post(url, headers=headers, json=data, timeout=10).raise_for_status()
+        _post_message(data)
     except requests.exceptions.RequestException as e:
         print(f"Failed to send meeting proposal to {to}: {e.response.text if e.response else e}")
 
 
 def send_conversion_menu(to):
     """Sends an interactive LIST menu for file conversions."""
-    url = f"https://graph.facebook.com/{API_VERSION}/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
     data = {
         "messaging_product": "whatsapp",
         "to": to,
@@ -254,17 +248,12 @@ def send_conversion_menu(to):
         }
     }
     try:
-        requests.post(url, headers=headers, json=data, timeout=10).raise_for_status()
+        _post_message(data)
     except requests.exceptions.RequestException as e:
         print(f"Failed to send conversion menu to {to}: {e.response.text if e.response else e}")
 
 def send_google_drive_menu(to):
     """Sends the interactive Google Drive menu."""
-    url = f"https://graph.facebook.com/{API_VERSION}/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
     data = {
         "messaging_product": "whatsapp",
         "to": to,
@@ -290,6 +279,6 @@ def send_google_drive_menu(to):
         }
     }
     try:
-        requests.post(url, headers=headers, json=data, timeout=10).raise_for_status()
+        _post_message(data)
     except requests.exceptions.RequestException as e:
         print(f"Failed to send Google Drive menu to {to}: {e.response.text if e.response else e}")
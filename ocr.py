@@ -0,0 +1,185 @@
+# ocr.py
+"""
+OCR for scanned PDFs and images.
+
+PDF pages are rasterized one at a time with PyMuPDF at OCR_DPI; pages that already have a
+text layer are read directly instead. Tesseract runs in the shared process pool, and
+results are cached by a hash of the page image, so re-sent scans are not OCR'd again.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz  # PyMuPDF, used to rasterize PDF pages
+import pytesseract
+from PIL import Image, ImageSequence
+
+from process_pool import get_process_pool, reset_process_pool
+
+# --- Configuration ---
+OCR_DPI = int(os.environ.get("OCR_DPI", 200))   # 200-300 suits most scans; higher is slower with little gain
+OCR_LANGUAGES = os.environ.get("OCR_LANGUAGES", "eng")
+OCR_CACHE_SIZE = int(os.environ.get("OCR_CACHE_SIZE", 512))  # Pages
+TEXT_LAYER_MIN_CHARS = 25   # A page with at least this much embedded text is not OCR'd
+OCR_PAGES_AHEAD = 8         # Pages rendered and queued ahead of the one being returned
+HASH_BLOCK_SIZE = 1024 * 1024
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def detect_input_type(file_path):
+    """Returns "pdf" or "image" based on the file's contents rather than its name or MIME type."""
+    with open(file_path, "rb") as f:
+        header = f.read(5)
+    return "pdf" if header == b"%PDF-" else "image"
+
+
+def _cache_get(key):
+    with _cache_lock:
+        text = _cache.get(key)
+        if text is not None:
+            _cache.move_to_end(key)
+        return text
+
+
+def _cache_set(key, text):
+    with _cache_lock:
+        _cache[key] = text
+        _cache.move_to_end(key)
+        while len(_cache) > OCR_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _submit(func, *args):
+    """Submits a task to the shared process pool, replacing the pool if it is broken. Returns (pool, future)."""
+    pool = get_process_pool()
+    try:
+        return pool, pool.submit(func, *args)
+    except BrokenProcessPool:
+        reset_process_pool(pool)
+        pool = get_process_pool()
+        return pool, pool.submit(func, *args)
+
+
+def _result(task, func, *args):
+    """
+    Waits for a task from `_submit`. If its worker was killed (out of memory, a tesseract
+    crash), the pool is replaced and the task run once more before giving up.
+    """
+    pool, future = task
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        print("OCR process pool failed; retrying on a fresh pool.")
+        reset_process_pool(pool)
+        pool, future = _submit(func, *args)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            reset_process_pool(pool)   # Leave a working pool for the next caller
+            raise
+
+
+def _ocr_png(png_bytes, languages):
+    """Process-pool task: OCRs one rendered page."""
+    with Image.open(io.BytesIO(png_bytes)) as image:
+        return pytesseract.image_to_string(image, lang=languages)
+
+
+def _ocr_image_frames(file_path, languages):
+    """Process-pool task: OCRs every frame of an image file (multi-page TIFFs have several)."""
+    with Image.open(file_path) as image:
+        texts = []
+        for frame in ImageSequence.Iterator(image):
+            frame = frame.convert("RGB") if frame.mode not in ("RGB", "L") else frame
+            texts.append(pytesseract.image_to_string(frame, lang=languages))
+        return "\n".join(texts)
+
+
+def _iter_pdf_page_jobs(file_path, dpi, max_pages):
+    """Yields, per page, either ("text", text) or ("ocr", cache_key, png_bytes), rendering one page at a time."""
+    with fitz.open(file_path) as doc:
+        page_limit = min(doc.page_count, max_pages) if max_pages else doc.page_count
+        for i in range(page_limit):
+            page = doc[i]
+            text = page.get_text()
+            if len(text.strip()) >= TEXT_LAYER_MIN_CHARS:
+                yield ("text", text)
+                continue
+            pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            key = hashlib.sha256(pixmap.samples).hexdigest() + f":{dpi}:{OCR_LANGUAGES}"
+            yield ("ocr", key, pixmap.tobytes("png"))
+
+
+def iter_ocr_pdf_pages(file_path, dpi=OCR_DPI, max_pages=None):
+    """
+    Yields (page_number, text) for each page of a PDF in order, OCR'ing only pages
+    without a text layer. Several pages are OCR'd in parallel ahead of the consumer.
+    """
+    pending = deque()
+    jobs = _iter_pdf_page_jobs(file_path, dpi, max_pages)
+    page_number = 0
+    try:
+        for job in jobs:
+            page_number += 1
+            if job[0] == "text":
+                pending.append((page_number, None, job[1], None))
+            else:
+                _, key, png_bytes = job
+                cached = _cache_get(key)
+                pending.append((page_number, key, cached if cached is not None else _submit(_ocr_png, png_bytes, OCR_LANGUAGES), png_bytes))
+            while len(pending) > OCR_PAGES_AHEAD:
+                yield _resolve(pending.popleft())
+        while pending:
+            yield _resolve(pending.popleft())
+    finally:
+        jobs.close()
+        for _, _, result, _ in pending:
+            if not isinstance(result, str):
+                result[1].cancel()
+
+
+def _resolve(entry):
+    page_number, key, result, png_bytes = entry
+    if isinstance(result, str):
+        return page_number, result
+    text = _result(result, _ocr_png, png_bytes, OCR_LANGUAGES)
+    _cache_set(key, text)
+    return page_number, text
+
+
+def ocr_image(file_path):
+    """OCRs an image file (any format Pillow can open)."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    key = digest.hexdigest() + f":{OCR_LANGUAGES}"
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+    text = _result(_submit(_ocr_image_frames, file_path, OCR_LANGUAGES), _ocr_image_frames, file_path, OCR_LANGUAGES)
+    _cache_set(key, text)
+    return text
+
+
+def ocr_file(file_path, dpi=OCR_DPI, max_pages=None, max_chars=None):
+    """OCRs a PDF or image and returns its text, stopping once `max_chars` characters are read."""
+    if detect_input_type(file_path) == "image":
+        text = ocr_image(file_path)
+        return text[:max_chars] if max_chars else text
+
+    texts, total_chars = [], 0
+    pages = iter_ocr_pdf_pages(file_path, dpi=dpi, max_pages=max_pages)
+    for _, text in pages:
+        texts.append(text)
+        total_chars += len(text)
+        if max_chars and total_chars >= max_chars:
+            pages.close()
+            break
+    text = "\n".join(texts)
+    return text[:max_chars] if max_chars else text
@@ -0,0 +1,48 @@
+# process_pool.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Configuration ---
+DOCUMENT_WORKERS = int(os.environ.get("DOCUMENT_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Workers are forked: "spawn" and "forkserver" both re-run the main script (app.py, with its
+# Mongo client and scheduler) in every worker. Forking copies a process's locks but not its
+# threads, so app.py starts the workers before the Mongo client, scheduler or any worker
+# thread exists; they only run self-contained extraction functions.
+_context = multiprocessing.get_context("fork")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Returns the shared process pool for CPU-heavy document work (text extraction, OCR)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=DOCUMENT_WORKERS, mp_context=_context)
+        return _pool
+
+
+def start_process_pool():
+    """Forks every worker now, while the process is still single-threaded. Call once at start-up."""
+    pool = get_process_pool()
+    for future in [pool.submit(os.getpid) for _ in range(DOCUMENT_WORKERS)]:
+        future.result()
+
+
+def reset_process_pool(pool=None):
+    """
+    Discards a broken pool (e.g. a worker was killed) so the next call starts a fresh one.
+    The replacement is forked from the running, multi-threaded app; that only happens after
+    a worker crash, so it is kept rare rather than avoided.
+    If `pool` is given, the shared pool is only discarded if it is still that pool, so a
+    replacement another thread already started is left alone.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and (pool is None or pool is _pool):
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
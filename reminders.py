@@ -1,40 +1,125 @@
 # reminders.py
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dateutil import parser as date_parser
 from dateutil.relativedelta import relativedelta
 import pytz
+from apscheduler.events import (EVENT_JOB_ADDED, EVENT_JOB_MODIFIED, EVENT_JOB_SUBMITTED, EVENT_JOB_REMOVED,
+                                EVENT_ALL_JOBS_REMOVED)
+from apscheduler.jobstores.base import JobLookupError
+from pymongo import ASCENDING
 from messaging import send_template_message
 from google_calendar_integration import create_google_calendar_event
 import re
 import time
 
-def get_all_reminders(user, scheduler):
-    """
-    Fetches all scheduled jobs for a specific user and returns a structured list of dictionaries.
+REMINDER_PREFIX = "reminder_"
+
+
+def _reminder_entry(job):
+    """The index document for a reminder job, or None if the job isn't a reminder."""
+    if not job.id.startswith(REMINDER_PREFIX):
+        return None
+    try:
+        user, task = job.args[0], job.args[2][0]['parameters'][0]['text']
+    except (IndexError, KeyError, TypeError):
+        return None
+    return {
+        "user_id": user,
+        "task": task,
+        "trigger": "cron" if type(job.trigger).__name__ == 'CronTrigger' else "date",
+        "next_run": job.next_run_time,
+        "indexed_at": datetime.now(timezone.utc)
+    }
+
+
+class ReminderIndex:
     """
-    user_jobs = [job for job in scheduler.get_jobs() if job.id.startswith(f"reminder_{user}")]
+    A per-user index of reminder jobs (task, trigger type, next run), kept in sync with the
+    scheduler through its event listeners.
 
-    if not user_jobs:
-        return []
+    Looking up a user's reminders with scheduler.get_jobs() loads and unpickles every job in
+    the job store; this is a single indexed query instead.
+    """
 
+    def __init__(self, collection):
+        self.collection = collection
+        self.collection.create_index([("user_id", ASCENDING), ("next_run", ASCENDING)])
+
+    def attach(self, scheduler):
+        """Registers the listeners that keep the index in step with `scheduler`'s reminder jobs."""
+        def on_event(event):
+            if event.code == EVENT_ALL_JOBS_REMOVED:
+                self.collection.delete_many({})
+            elif event.job_id.startswith(REMINDER_PREFIX):
+                if event.code == EVENT_JOB_REMOVED:
+                    self.collection.delete_one({"_id": event.job_id})
+                else:
+                    # Added, edited, or just run (a recurring reminder now has a new next run).
+                    self.refresh(scheduler, event.job_id)
+        scheduler.add_listener(on_event, EVENT_JOB_ADDED | EVENT_JOB_MODIFIED | EVENT_JOB_SUBMITTED | EVENT_JOB_REMOVED | EVENT_ALL_JOBS_REMOVED)
+
+    def refresh(self, scheduler, job_id):
+        job = scheduler.get_job(job_id)
+        entry = _reminder_entry(job) if job else None
+        if entry:
+            self.collection.replace_one({"_id": job_id}, entry, upsert=True)
+        else:
+            self.collection.delete_one({"_id": job_id})
+
+    def sync(self, scheduler):
+        """
+        Rebuilds the index from the job store (reminders created before the index existed, or
+        changed while no listener was attached). Returns the number of reminders indexed.
+
+        Only entries written before the sync started are dropped when their job is missing from
+        the snapshot; a reminder added meanwhile was indexed by the listener and is kept.
+        """
+        started = datetime.now(timezone.utc)
+        job_ids = []
+        for job in scheduler.get_jobs():
+            entry = _reminder_entry(job)
+            if entry:
+                self.collection.replace_one({"_id": job.id}, entry, upsert=True)
+                job_ids.append(job.id)
+        self.collection.delete_many({
+            "_id": {"$nin": job_ids},
+            "$or": [{"indexed_at": {"$lt": started}}, {"indexed_at": {"$exists": False}}]
+        })
+        return len(job_ids)
+
+    def for_user(self, user):
+        return list(self.collection.find({"user_id": user}).sort("next_run", ASCENDING))
+
+    def delete_user(self, user, scheduler):
+        """Removes all of a user's reminder jobs. Returns how many there were."""
+        entries = list(self.collection.find({"user_id": user}, {"_id": 1}))
+        for entry in entries:
+            try:
+                scheduler.remove_job(entry["_id"])
+            except JobLookupError:
+                self.collection.delete_one({"_id": entry["_id"]})
+        return len(entries)
+
+
+def get_all_reminders(user, reminder_index):
+    """
+    Fetches all of a user's reminders from the reminder index and returns a structured list of dictionaries.
+    """
     tz = pytz.timezone('Asia/Kolkata')
     reminders_list = []
 
-    for job in user_jobs:
-        try:
-            task = job.args[2][0]['parameters'][0]['text']
-            next_run = job.next_run_time.astimezone(tz).strftime('%a, %b %d at %I:%M %p')
-            
-            is_recurring = "Recurring" if hasattr(job.trigger, 'start_date') or type(job.trigger).__name__ == 'CronTrigger' else "One-Time"
-
-            reminders_list.append({
-                "id": job.id,
-                "task": task,
-                "next_run": next_run,
-                "type": is_recurring
-            })
-        except (IndexError, KeyError, AttributeError):
+    for entry in reminder_index.for_user(user):
+        next_run = entry.get("next_run")
+        if next_run is None:
             continue
+        if next_run.tzinfo is None:  # PyMongo returns naive UTC datetimes by default
+            next_run = pytz.utc.localize(next_run)
+        reminders_list.append({
+            "id": entry["_id"],
+            "task": entry["task"],
+            "next_run": next_run.astimezone(tz).strftime('%a, %b %d at %I:%M %p'),
+            "type": "Recurring" if entry.get("trigger") == "cron" else "One-Time"
+        })
 
     return reminders_list
 
@@ -0,0 +1,289 @@
+# response_cache.py
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import types
+import zlib
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime, timezone
+from functools import wraps
+
+from pymongo import ASCENDING
+
+# --- Configuration ---
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+L1_MAX_ENTRIES = 2000
+SEMANTIC_MAX_ENTRIES = 500      # Per function; the similarity search is a linear scan over these
+SEMANTIC_VECTOR_SIZE = 2 ** 18
+
+
+def template_version(fn):
+    """
+    Hashes a function's bytecode and constants (which include its prompt text, model
+    parameters and temperature), so editing the prompt changes the version and old
+    cache entries are no longer matched.
+    """
+    digest = hashlib.sha1()
+
+    def feed(code):
+        digest.update(code.co_code)
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                feed(const)
+            else:
+                digest.update(repr(const).encode("utf-8"))
+
+    feed(fn.__code__)
+    # Models are module-level settings; include their current values so switching models invalidates too.
+    for name in fn.__code__.co_names:
+        if name.startswith("GROK_MODEL"):
+            digest.update(f"{name}={fn.__globals__.get(name)}".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def normalize_text(text):
+    return re.sub(r"\s+", " ", str(text)).strip()
+
+
+def text_vector(text):
+    """
+    A hashed bag of word and character-trigram features, L2-normalized. Cosine similarity
+    between these catches rewordings and typos without an embedding model or API call.
+    """
+    text = normalize_text(text).lower()
+    features = Counter(re.findall(r"[a-z0-9']+", text))
+    padded = f" {text} "
+    features.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    vector = Counter()
+    for feature, count in features.items():
+        vector[zlib.crc32(feature.encode("utf-8")) % SEMANTIC_VECTOR_SIZE] += count
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {index: value / norm for index, value in vector.items()}
+
+
+def cosine_similarity(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+
+class ResponseCache:
+    """
+    Caches the results of deterministic LLM calls.
+
+    Exact tier: keyed on the function, its template version and the normalized arguments.
+    Semantic tier (opt-in per function): returns the result for a previous input whose
+    text is similar enough. Both tiers keep an in-memory LRU (L1) in front of a Mongo
+    collection (L2) whose TTL index expires old entries.
+    """
+
+    def __init__(self, max_entries=L1_MAX_ENTRIES, semantic_max_entries=SEMANTIC_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.semantic_max_entries = semantic_max_entries
+        self.collection = None
+        self._entries = OrderedDict()           # key -> (expires_at, value)
+        self._semantic = defaultdict(OrderedDict)  # namespace -> key -> (expires_at, vector, value)
+        self._semantic_loaded = set()
+        self._lock = threading.Lock()
+        self._stats = defaultdict(Counter)
+        self._local = threading.local()
+
+    def configure(self, collection):
+        """Attaches the Mongo L2 store. Without it the cache is memory-only."""
+        collection.create_index("expires_at", expireAfterSeconds=0)
+        collection.create_index([("namespace", ASCENDING), ("created_at", ASCENDING)])
+        self.collection = collection
+
+    # --- Call outcome tracking (fed by the Grok client's response hook) ---
+    def record_call(self, succeeded):
+        if getattr(self._local, "active", False):
+            self._local.calls += 1
+            self._local.failed = self._local.failed or not succeeded
+
+    def record_failure(self):
+        """Marks the current call as failed, e.g. when the API replied but the reply was unusable."""
+        if getattr(self._local, "active", False):
+            self._local.failed = True
+
+    def _count(self, name, field):
+        with self._lock:
+            self._stats[name][field] += 1
+
+    # --- L1 ---
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _l1_set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _semantic_set(self, namespace, key, vector, value, expires_at):
+        with self._lock:
+            entries = self._semantic[namespace]
+            entries[key] = (expires_at, vector, value)
+            entries.move_to_end(key)
+            while len(entries) > self.semantic_max_entries:
+                entries.popitem(last=False)
+
+    # --- L2 ---
+    def _l2_get(self, key):
+        if self.collection is None:
+            return None
+        try:
+            doc = self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}, {"value": 1, "expires_at": 1})
+        except Exception as e:
+            print(f"Response cache read error: {e}")
+            return None
+        if not doc:
+            return None
+        expires_at = doc["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return expires_at.timestamp(), doc["value"]
+
+    def _l2_set(self, key, namespace, value, expires_at, vector=None):
+        if self.collection is None:
+            return
+        doc = {
+            "namespace": namespace,
+            "value": value,
+            "created_at": datetime.now(timezone.utc),
+            "expires_at": datetime.fromtimestamp(expires_at, timezone.utc)
+        }
+        if vector is not None:
+            doc["vector"] = {str(index): weight for index, weight in vector.items()}
+        try:
+            self.collection.replace_one({"_id": key}, doc, upsert=True)
+        except Exception as e:
+            print(f"Response cache write error: {e}")
+
+    def _load_semantic(self, namespace):
+        """Warms the semantic L1 for a namespace from the newest L2 entries, once per process."""
+        with self._lock:
+            if namespace in self._semantic_loaded:
+                return
+            self._semantic_loaded.add(namespace)
+        if self.collection is None:
+            return
+        try:
+            docs = list(self.collection.find(
+                {"namespace": namespace, "vector": {"$exists": True}, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+            ).sort("created_at", -1).limit(self.semantic_max_entries))
+        except Exception as e:
+            print(f"Response cache warm-up error: {e}")
+            return
+        for doc in reversed(docs):
+            expires_at = doc["expires_at"]
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            vector = {int(index): weight for index, weight in doc["vector"].items()}
+            self._semantic_set(namespace, doc["_id"], vector, doc["value"], expires_at.timestamp())
+
+    def _semantic_get(self, namespace, vector, threshold):
+        self._load_semantic(namespace)
+        now = time.time()
+        best_key, best_score, best_value = None, threshold, None
+        with self._lock:
+            entries = self._semantic[namespace]
+            for key, (expires_at, stored_vector, value) in list(entries.items()):
+                if expires_at < now:
+                    del entries[key]
+                    continue
+                score = cosine_similarity(vector, stored_vector)
+                if score >= best_score:
+                    best_key, best_score, best_value = key, score, value
+            if best_key is not None:
+                entries.move_to_end(best_key)
+        return best_value if best_key is not None else None
+
+    # --- Decorator ---
+    def cached(self, name, ttl=DEFAULT_TTL_SECONDS, key_func=None, semantic_threshold=None, should_cache=None):
+        """
+        Caches a function's return value.
+
+        `key_func(*args)` returns the normalized text the cache is keyed on (default: all
+        arguments, whitespace-collapsed). Only results produced by successful API calls are
+        stored; the wrapped function calls `record_failure()` when it falls back on a reply
+        it couldn't use, and `should_cache(result)` can veto results only valid right now.
+        Set `semantic_threshold` (cosine similarity, 0-1) to also match reworded inputs.
+        """
+        def decorator(fn):
+            namespace = f"{name}:{template_version(fn)}"
+
+            @wraps(fn)
+            def wrapper(*args):
+                if key_func:
+                    key_text = key_func(*args)
+                else:
+                    key_text = json.dumps([normalize_text(a) if isinstance(a, str) else a for a in args], sort_keys=True, default=str)
+                key = f"{namespace}:{hashlib.sha256(key_text.encode('utf-8')).hexdigest()}"
+                self._count(name, "requests")
+
+                entry = self._l1_get(key)
+                if entry is not None:
+                    self._count(name, "exact_hits")
+                    return entry[1]
+                entry = self._l2_get(key)
+                if entry is not None:
+                    self._count(name, "exact_hits")
+                    self._l1_set(key, entry[1], entry[0])
+                    return entry[1]
+
+                vector = text_vector(key_text) if semantic_threshold else None
+                if vector:
+                    value = self._semantic_get(namespace, vector, semantic_threshold)
+                    if value is not None:
+                        self._count(name, "semantic_hits")
+                        return value
+
+                self._count(name, "misses")
+                self._local.active, self._local.calls, self._local.failed = True, 0, False
+                try:
+                    result = fn(*args)
+                    produced_by_api = self._local.calls > 0 and not self._local.failed
+                finally:
+                    self._local.active = False
+
+                if result is not None and produced_by_api and (should_cache is None or should_cache(result)):
+                    expires_at = time.time() + ttl
+                    self._l1_set(key, result, expires_at)
+                    if vector:
+                        self._semantic_set(namespace, key, vector, result, expires_at)
+                    self._l2_set(key, namespace, result, expires_at, vector)
+                    self._count(name, "stores")
+                return result
+
+            return wrapper
+        return decorator
+
+    def get_stats(self):
+        stats = {}
+        with self._lock:
+            snapshot = {name: Counter(counts) for name, counts in self._stats.items()}
+        for name, counts in snapshot.items():
+            hits = counts["exact_hits"] + counts["semantic_hits"]
+            stats[name] = dict(counts, hit_ratio=round(hits / counts["requests"], 3) if counts["requests"] else 0.0)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._semantic.clear()
+            self._semantic_loaded.clear()
+        if self.collection is not None:
+            self.collection.delete_many({})
+
@@ -0,0 +1,86 @@
+# sender_lanes.py
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+
+
+class _Lane:
+    """A single FIFO worker thread plus its counters."""
+
+    def __init__(self, index):
+        self.index = index
+        self.tasks = queue.Queue()
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+        self.busy_since = None
+        self.thread = threading.Thread(target=self._run, name=f"sender-lane-{index}", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            future, func, args, kwargs, enqueued_at = self.tasks.get()
+            wait = time.monotonic() - enqueued_at
+            with self.lock:
+                self.processed += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+                self.last_wait = wait
+                self.busy_since = time.monotonic()
+            try:
+                if future.set_running_or_notify_cancel():
+                    future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    self.busy_since = None
+                self.tasks.task_done()
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "lane": self.index,
+                "depth": self.tasks.qsize(),
+                "busy_for_seconds": round(time.monotonic() - self.busy_since, 3) if self.busy_since else 0.0,
+                "processed": self.processed,
+                "avg_wait_seconds": round(self.total_wait / self.processed, 4) if self.processed else 0.0,
+                "max_wait_seconds": round(self.max_wait, 4),
+                "last_wait_seconds": round(self.last_wait, 4)
+            }
+
+
+class SenderLaneDispatcher:
+    """
+    Runs work on a fixed set of single-threaded lanes chosen by hashing the sender's number.
+
+    Every message from one sender lands on the same lane, so a user's messages (and their
+    reads and writes of the session document) happen strictly in order, while different
+    users are spread across lanes and run in parallel.
+    """
+
+    def __init__(self, num_lanes):
+        self.lanes = [_Lane(i) for i in range(max(1, num_lanes))]
+
+    def lane_for(self, sender_number):
+        # crc32 is stable across processes and restarts, unlike the built-in hash().
+        return zlib.crc32(str(sender_number).encode("utf-8")) % len(self.lanes)
+
+    def dispatch(self, sender_number, func, *args, **kwargs):
+        """Queues `func(*args, **kwargs)` on the sender's lane and returns a Future for its result."""
+        future = Future()
+        lane = self.lanes[self.lane_for(sender_number)]
+        lane.tasks.put((future, func, args, kwargs, time.monotonic()))
+        return future
+
+    def get_metrics(self):
+        lanes = [lane.metrics() for lane in self.lanes]
+        return {
+            "lanes": lanes,
+            "total_depth": sum(lane["depth"] for lane in lanes),
+            "max_wait_seconds": max(lane["max_wait_seconds"] for lane in lanes)
+        }
@@ -5,14 +5,18 @@ import os
 from datetime import datetime
 import random
 
+# --- Configuration ---
+REQUEST_TIMEOUT = 10  # Seconds; a hung upstream must not hold up the briefing
+
 def get_indian_festival_today():
     """
     Checks for a major Indian festival on the current date using a live API.
+    Returns the festival's name, "" if there is none (or no API key), or None if the lookup failed.
     """
     api_key = os.environ.get("HOLIDAY_API_KEY")
     if not api_key:
         print("Holiday API key not found. Skipping festival check.")
-        return None
+        return ""
 
     try:
         now = datetime.now()
@@ -20,12 +24,12 @@ def get_indian_festival_today():
         
         url = f"https://holidays.abstractapi.com/v1/?api_key={api_key}&country={country}&year={now.year}&month={now.month}&day={now.day}"
         
-        response = requests.get(url)
+        response = requests.get(url, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         holidays = response.json()
 
         if not holidays:
-            return None
+            return ""
 
         # Prioritize returning a religious or national holiday if one exists
         for holiday in holidays:
@@ -45,24 +49,24 @@ def get_indian_festival_today():
 
 
 def get_daily_quote():
-    """Fetches a random quote from the ZenQuotes API."""
+    """Fetches a random quote from the ZenQuotes API. Returns (quote, author), or (None, None) on failure."""
     try:
-        response = requests.get("https://zenquotes.io/api/random")
+        response = requests.get("https://zenquotes.io/api/random", timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         data = response.json()[0]
         return data['q'], data['a']
     except Exception as e:
         print(f"Error fetching daily quote: {e}")
-        return "The best way to predict the future is to create it.", "Peter Drucker"
+        return None, None
 
 def get_on_this_day_in_history():
-    """Fetches a few historical events for the current day."""
+    """Fetches a few historical events for the current day. Returns None on failure."""
     try:
         now = datetime.now()
         month = now.month
         day = now.day
         url = f"https://today.zenquotes.io/api/{month}/{day}"
-        response = requests.get(url)
+        response = requests.get(url, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         events = data.get("data", {}).get("Events", [])
@@ -71,7 +75,7 @@ def get_on_this_day_in_history():
         return events
     except Exception as e:
         print(f"On This Day in History error: {e}")
-        return [{"text": "Could not retrieve a historical fact for today."}]
+        return None
 
 def get_raw_weather_data(city="Vijayawada"):
     """Fetches raw weather data from OpenWeatherMap."""
@@ -80,7 +84,7 @@ def get_raw_weather_data(city="Vijayawada"):
         return None
     try:
         url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
-        response = requests.get(url)
+        response = requests.get(url, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -0,0 +1,125 @@
+# webhook_queue.py
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING, ReturnDocument
+
+# --- Configuration ---
+LEASE_SECONDS = 300      # How long a worker may hold a payload before it is handed to another worker
+MAX_ATTEMPTS = 5         # Payloads that keep failing are parked as "failed" for inspection
+RETRY_DELAY_SECONDS = 5
+POLL_INTERVAL = 1.0
+
+
+def is_valid_webhook_payload(data):
+    """Cheap structural check that a POST body looks like a WhatsApp webhook delivery."""
+    if not isinstance(data, dict):
+        return False
+    if data.get("object") != "whatsapp_business_account":
+        return False
+    return isinstance(data.get("entry"), list)
+
+
+class WebhookQueue:
+    """
+    A durable, Mongo-backed work queue for raw webhook payloads.
+
+    Each document's `available_at` is either the time it was enqueued (status "pending")
+    or the end of the current worker's lease (status "processing"), so payloads held by
+    a worker that crashed are picked up again once the lease runs out.
+    """
+
+    def __init__(self, collection, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._wakeup = threading.Event()
+        self._workers = []
+        self.collection.create_index([("status", ASCENDING), ("available_at", ASCENDING)])
+
+    def enqueue(self, payload):
+        """Stores a payload for later processing and returns its queue ID."""
+        now = datetime.now(timezone.utc)
+        result = self.collection.insert_one({
+            "payload": payload,
+            "status": "pending",
+            "attempts": 0,
+            "enqueued_at": now,
+            "available_at": now
+        })
+        self._wakeup.set()
+        return result.inserted_id
+
+    def claim(self, worker_id):
+        """Atomically leases the oldest available payload, or returns None if the queue is empty."""
+        now = datetime.now(timezone.utc)
+        # A payload whose lease ran out on its last attempt most likely crashed its worker; park it
+        # instead of handing it out again.
+        self.collection.update_many(
+            {"status": "processing", "available_at": {"$lte": now}, "attempts": {"$gte": self.max_attempts}},
+            {"$set": {"status": "failed", "error": "lease expired on the last attempt"}}
+        )
+        return self.collection.find_one_and_update(
+            {
+                "$or": [{"status": "pending"}, {"status": "processing", "attempts": {"$lt": self.max_attempts}}],
+                "available_at": {"$lte": now}
+            },
+            {
+                "$set": {
+                    "status": "processing",
+                    "worker": worker_id,
+                    "available_at": now + timedelta(seconds=self.lease_seconds)
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("available_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def ack(self, job):
+        """Removes a successfully processed payload from the queue."""
+        self.collection.delete_one({"_id": job["_id"]})
+
+    def fail(self, job, error):
+        """Schedules a failed payload for another attempt, or parks it after too many failures."""
+        if job.get("attempts", 0) >= self.max_attempts:
+            update = {"status": "failed", "error": str(error)}
+        else:
+            retry_at = datetime.now(timezone.utc) + timedelta(seconds=RETRY_DELAY_SECONDS * job.get("attempts", 1))
+            update = {"status": "pending", "available_at": retry_at, "error": str(error)}
+        self.collection.update_one({"_id": job["_id"]}, {"$set": update})
+
+    def pending_count(self):
+        return self.collection.count_documents({"status": {"$in": ["pending", "processing"]}})
+
+    def start_workers(self, handler, num_workers):
+        """Starts daemon threads that drain the queue by calling `handler(payload)`."""
+        for i in range(num_workers):
+            worker_id = f"{uuid.uuid4().hex[:8]}-{i}"
+            thread = threading.Thread(target=self._worker_loop, args=(worker_id, handler), name=f"webhook-worker-{i}", daemon=True)
+            thread.start()
+            self._workers.append(thread)
+        print(f"Started {num_workers} webhook queue worker(s).")
+
+    def _worker_loop(self, worker_id, handler):
+        while True:
+            try:
+                job = self.claim(worker_id)
+            except Exception as e:
+                print(f"❌ Webhook queue claim error: {e}")
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            if not job:
+                self._wakeup.wait(POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+
+            try:
+                handler(job["payload"])
+                self.ack(job)
+            except Exception as e:
+                print(f"❌ Webhook queue job {job['_id']} failed (attempt {job.get('attempts')}): {e}")
+                self.fail(job, e)
@@ -1,6 +1,6 @@
 # youtube_search.py
 
-from googleapiclient.discovery import build
+from google_services import get_service
 from googleapiclient.errors import HttpError
 
 def search_youtube_for_video(credentials, query):
@@ -9,7 +9,7 @@ def search_youtube_for_video(credentials, query):
     """
     try:
         # Build the YouTube API service object
-        youtube_service = build('youtube', 'v3', credentials=credentials)
+        youtube_service = get_service('youtube', 'v3', credentials)
 
         # Call the search.list method to retrieve results
         search_response = youtube_service.search().list(